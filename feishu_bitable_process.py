@@ -1,14 +1,21 @@
 '''飞书多维表格数据处理脚本（适配GitHub Actions）'''
 import os
 import json
-from datetime import datetime
-import lark_oapi as lark
-from lark_oapi.api.bitable.v1 import *
-from lark_oapi.api.drive.v1 import *
-import requests
-import pyexcel
-import pandas as pd
-import io
+import logging
+from feishu_metrics import 指标
+from feishu_log import 获取日志器, 逐行日志
+from feishu_snapshot import 读取快照, 保存快照, 解析文件令牌
+from feishu_history import 历史库路径, 追加监测记录
+from feishu_dates import 监测日期列转变
+from feishu_pipeline import 流水线
+from feishu_download import 下载为字节
+from feishu_memory import 溢出字典
+from feishu_excel import 打开工作簿, 识别表格格式, 选择引擎, 引擎可用, 格式不符异常
+from feishu_upload import 上传素材, 上传失败
+from feishu_schema import 校验记录列表
+from feishu_runtime import 飞书接口地址, 获取飞书客户端, 解析行ID列表, 建立记录缓存, 并发处理行, 输出处理结果
+
+日志 = 获取日志器("bitable")
 
 # ====================== 环境变量配置（从GitHub Actions环境读取） ======================
 # 从环境变量读取核心配置（需在GitHub仓库Secrets/Workflow中配置）
@@ -17,6 +24,7 @@ APP_SECRET = os.getenv("FEISHU_APP_SECRET")
 DWBG_TOKEN = os.getenv("DWBG_TOKEN")
 DWBG_TABLE_ID = os.getenv("DWBG_TABLE_ID")
 ROW_ID = os.getenv("ROW_ID")
+ROW_IDS = os.getenv("ROW_IDS")  # 多行模式：JSON数组或逗号分隔的行ID列表
 
 # 校验必要环境变量是否存在
 def validate_environment():
@@ -30,22 +38,25 @@ def validate_environment():
         missing_vars.append("DWBG_TOKEN")
     if not DWBG_TABLE_ID:
         missing_vars.append("DWBG_TABLE_ID")
-    if not ROW_ID:
-        missing_vars.append("ROW_ID")
+    if not 解析行ID列表(ROW_IDS, ROW_ID):
+        missing_vars.append("ROW_ID/ROW_IDS")
     
     if missing_vars:
         raise Exception(f"❌ 缺少必要环境变量：{', '.join(missing_vars)}\n请检查GitHub Actions的Secrets/Payload配置")
 
 '''飞书多维表格核心函数'''
+@指标.计时("获取令牌")
 def 获取访问令牌(APP_ID, APP_SECRET):
     """获取飞书租户访问令牌"""
-    url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal/"
+    import requests
+    url = f"{飞书接口地址}/open-apis/auth/v3/tenant_access_token/internal/"
     headers = {"Content-Type": "application/json"}
     data = {
         "app_id": APP_ID,
         "app_secret": APP_SECRET
     }
     try:
+        指标.计数("API调用次数")
         response = requests.post(url, headers=headers, json=data, timeout=10)
         response.raise_for_status()  # 抛出HTTP错误
         response_data = response.json()
@@ -61,67 +72,33 @@ def 获取访问令牌(APP_ID, APP_SECRET):
 
 def 飞书上传素材(文件路径, DWBG_TOKEN, 应用ID, 应用密匙):
     """使用飞书官方SDK上传文件到多维表格（保留函数，兼容原有逻辑）"""
+    # 超过20MB的文件自动改用分片上传（feishu_upload）
     if not os.path.exists(文件路径):
         print(f"错误：文件不存在 - {文件路径}")
         return None
     if not os.path.isfile(文件路径):
         print(f"错误：不是有效的文件 - {文件路径}")
         return None
-    
     file_name = os.path.basename(文件路径)
     file_size = os.path.getsize(文件路径)
     print(f"准备上传文件: {file_name} (大小: {file_size} bytes)")
-    
-    if file_size > 20 * 1024 * 1024:
-        print(f"错误：文件过大，超过20MB限制")
-        return None
-    
-    client = lark.Client.builder() \
-        .app_id(应用ID) \
-        .app_secret(应用密匙) \
-        .log_level(lark.LogLevel.DEBUG) \
-        .build()
-    
     try:
-        with open(文件路径, "rb") as file:
-            request: UploadAllMediaRequest = UploadAllMediaRequest.builder() \
-                .request_body(UploadAllMediaRequestBody.builder()
-                              .file_name(file_name)
-                              .parent_type("bitable_file")
-                              .parent_node(DWBG_TOKEN)
-                              .size(str(file_size))
-                              .file(file)
-                              .build()) \
-                .build()
-
-            response: UploadAllMediaResponse = client.drive.v1.media.upload_all(request)
-
-            if not response.success():
-                error_msg = f"文件上传失败 - 代码: {response.code}, 消息: {response.msg}, 日志ID: {response.get_log_id()}"
-                print(error_msg)
-                if response.raw and response.raw.content:
-                    try:
-                        resp_content = json.loads(response.raw.content)
-                        print("详细响应内容:")
-                        print(json.dumps(resp_content, indent=4, ensure_ascii=False))
-                    except:
-                        print("响应内容解析失败:", response.raw.content)
-                return None
-            else:
-                print("文件上传成功!")
-                print("返回数据:", lark.JSON.marshal(response.data, indent=4))
-                return response.data.file_token
+        file_token = 上传素材(应用ID, 应用密匙, 文件路径, DWBG_TOKEN)
+    except 上传失败 as e:
+        print(str(e))
+        return None
     except Exception as e:
         print(f"上传过程发生错误: {str(e)}")
         return None
+    print(f"文件上传成功! file_token: {file_token}")
+    return file_token
 
+@指标.计时("记录写入")
 def 新增飞书表格(应用ID, 应用密匙, DWBG_TOKEN, DWBG_TABLE_ID, 上传数据结构):
     """新增飞书多维表格记录（保留函数，兼容原有逻辑）"""
-    client = lark.Client.builder() \
-        .app_id(应用ID) \
-        .app_secret(应用密匙) \
-        .log_level(lark.LogLevel.DEBUG) \
-        .build()
+    import lark_oapi as lark
+    from lark_oapi.api.bitable.v1 import AppTableRecord, CreateAppTableRecordRequest, CreateAppTableRecordResponse
+    client = 获取飞书客户端(应用ID, 应用密匙)
 
     request: CreateAppTableRecordRequest = CreateAppTableRecordRequest.builder() \
         .app_token(DWBG_TOKEN) \
@@ -131,22 +108,23 @@ def 新增飞书表格(应用ID, 应用密匙, DWBG_TOKEN, DWBG_TABLE_ID, 上传
                       .build()) \
         .build()
 
+    指标.计数("API调用次数")
     response: CreateAppTableRecordResponse = client.bitable.v1.app_table_record.create(request)
 
     if not response.success():
-        lark.logger.error(
+        日志.error(
             f"client.bitable.v1.app_table_record.create failed, code: {response.code}, msg: {response.msg}, log_id: {response.get_log_id()}, resp: \n{json.dumps(json.loads(response.raw.content), indent=4, ensure_ascii=False)}")
         return
 
-    lark.logger.info(lark.JSON.marshal(response.data, indent=4))
+    指标.计数("写入记录数")
+    日志.debug(lark.JSON.marshal(response.data, indent=4))
 
+@指标.计时("记录写入")
 def 更新飞书表格(应用ID, 应用密匙, DWBG_TOKEN, DWBG_TABLE_ID, 行ID, 上传数据结构):
     """更新飞书多维表格指定行数据（增强错误日志）"""
-    client = lark.Client.builder() \
-        .app_id(应用ID) \
-        .app_secret(应用密匙) \
-        .log_level(lark.LogLevel.DEBUG) \
-        .build()
+    import lark_oapi as lark
+    from lark_oapi.api.bitable.v1 import AppTableRecord, UpdateAppTableRecordRequest, UpdateAppTableRecordResponse
+    client = 获取飞书客户端(应用ID, 应用密匙)
 
     request: UpdateAppTableRecordRequest = UpdateAppTableRecordRequest.builder() \
         .app_token(DWBG_TOKEN) \
@@ -157,6 +135,7 @@ def 更新飞书表格(应用ID, 应用密匙, DWBG_TOKEN, DWBG_TABLE_ID, 行ID,
                       .build()) \
         .build()
 
+    指标.计数("API调用次数")
     response: UpdateAppTableRecordResponse = client.bitable.v1.app_table_record.update(request)
 
     if not response.success():
@@ -167,19 +146,23 @@ def 更新飞书表格(应用ID, 应用密匙, DWBG_TOKEN, DWBG_TABLE_ID, 行ID,
                 error_detail += f"\n详细响应: {json.dumps(resp_json, indent=2, ensure_ascii=False)}"
             except:
                 error_detail += f"\n响应内容: {response.raw.content}"
-        lark.logger.error(error_detail)
+        日志.error(error_detail)
         raise Exception(error_detail)  # 抛出异常，让脚本终止并提示错误
     else:
-        print(f"✅ 行ID [{行ID}] 更新成功，更新字段: {list(上传数据结构.keys())}")
+        指标.计数("写入记录数")
+        print(f"✅ 行ID [{行ID}] 更新成功，更新{len(上传数据结构)}个字段")
+        日志.debug(f"更新字段: {list(上传数据结构.keys())}")
 
+@指标.计时("记录查询")
 def 获取多维表格内容(tenant_access_token, app_token, table_id):
     """获取多维表格所有记录（增强错误处理）"""
+    import requests
     all_records = []
     page_token = ''
     has_more = True
 
     while has_more:
-        url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{app_token}/tables/{table_id}/records/search"
+        url = f"{飞书接口地址}/open-apis/bitable/v1/apps/{app_token}/tables/{table_id}/records/search"
         payload = json.dumps({
             "page_token": page_token,
             "page_size": 100
@@ -190,6 +173,7 @@ def 获取多维表格内容(tenant_access_token, app_token, table_id):
         }
 
         try:
+            指标.计数("API调用次数")
             response = requests.post(url, headers=headers, data=payload, timeout=10)
             response.raise_for_status()
             result = response.json()
@@ -217,21 +201,25 @@ def 获取多维表格内容(tenant_access_token, app_token, table_id):
 
     return all_records
 
-def 获取多维表格中附件的链接(访问令牌, DWBG_TOKEN, DWBG_TABLE_ID, 行ID=None, 附件字段名="上传附件"):
-    """提取多维表格指定行的Excel附件原始URL"""
+@指标.计时("记录查询")
+def 获取多维表格中附件的链接(访问令牌, DWBG_TOKEN, DWBG_TABLE_ID, 行ID=None, 附件字段名="上传附件", 记录缓存=None):
+    """提取多维表格指定行的Excel附件原始URL（传入记录缓存时直接查缓存）"""
+    import requests
     if not 行ID:
         raise ValueError("❌ 行ID不能为空，请传入目标行的record_id")
+    if 记录缓存 is not None:
+        return 提取记录附件(记录缓存.get(str(行ID)), 行ID, 附件字段名)
 
-    url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{DWBG_TOKEN}/tables/{DWBG_TABLE_ID}/records/search"
+    url = f"{飞书接口地址}/open-apis/bitable/v1/apps/{DWBG_TOKEN}/tables/{DWBG_TABLE_ID}/records/search"
     headers = {
         "Authorization": f"Bearer {访问令牌}",
         "Content-Type": "application/json"
     }
     request_data = {"page_size": 100, "page_token": ""}
-    all_attachments = []
 
     while True:
         try:
+            指标.计数("API调用次数")
             resp = requests.post(url, headers=headers, json=request_data, timeout=15)
             resp.raise_for_status()
             result = resp.json()
@@ -249,24 +237,31 @@ def 获取多维表格中附件的链接(访问令牌, DWBG_TOKEN, DWBG_TABLE_ID
                 break
 
         if target_record:
-            fields = target_record.get("fields", {})
-            attachments = fields.get(附件字段名, [])
-            if not attachments:
-                raise Exception(f"❌ 行ID [{行ID}] 的「{附件字段名}」列无附件")
-
-            # 筛选Excel格式附件
-            for att in attachments:
-                att_url = att.get("url")
-                att_name = att.get("name", "")
-                if att_url and att_name.endswith((".xlsx", ".xls")):
-                    print(f"✅ 行ID [{行ID}] 提取到Excel附件: {att_name} | URL前50位: {att_url[:50]}...")
-                    all_attachments.append((att_url, att_name))
-            break
+            return 提取记录附件(target_record, 行ID, 附件字段名)
 
         if not result["data"].get("has_more"):
             break
         request_data["page_token"] = result["data"]["page_token"]
 
+    return 提取记录附件(None, 行ID, 附件字段名)
+
+def 提取记录附件(target_record, 行ID, 附件字段名):
+    """从单条记录中筛选Excel附件，返回[(url, name), ...]"""
+    all_attachments = []
+    if target_record:
+        fields = target_record.get("fields", {})
+        attachments = fields.get(附件字段名, [])
+        if not attachments:
+            raise Exception(f"❌ 行ID [{行ID}] 的「{附件字段名}」列无附件")
+
+        # 筛选Excel格式附件
+        for att in attachments:
+            att_url = att.get("url")
+            att_name = att.get("name", "")
+            if att_url and att_name.endswith((".xlsx", ".xls")):
+                print(f"✅ 行ID [{行ID}] 提取到Excel附件: {att_name} | URL前50位: {att_url[:50]}...")
+                all_attachments.append((att_url, att_name))
+
     if not all_attachments:
         raise Exception(f"❌ 行ID [{行ID}] 的「{附件字段名}」列未找到Excel附件")
 
@@ -274,69 +269,42 @@ def 获取多维表格中附件的链接(访问令牌, DWBG_TOKEN, DWBG_TABLE_ID
 
 def 在线解析表格文件(访问令牌, 文件临时链接, 文件名称):
     """在线解析多Sheet的Excel文件（过滤指定Sheet + 跳过空Sheet）"""
-    headers = {
-        "Authorization": f"Bearer {访问令牌}",
-        "User-Agent": "Mozilla/5.0 (Linux; x86_64) AppleWebKit/537.36"
-    }
-
-    # 分块读取Excel二进制流（适配大文件）
-    resp = requests.get(文件临时链接, headers=headers, timeout=300, stream=True)
-    resp.raise_for_status()
-    excel_content = b""
-    for chunk in resp.iter_content(chunk_size=1024*1024):
-        excel_content += chunk
+    import pandas as pd
+    # 与其他下载路径一致：大文件分段并发下载、断点续传
+    with 指标.阶段("附件下载"):
+        excel_content = 下载为字节(访问令牌, 文件临时链接)
 
     try:
-        excel_file = io.BytesIO(excel_content)
-        # 获取所有Sheet名称
-        if 文件名称.endswith(".xls"):
-            import xlrd
-            workbook = xlrd.open_workbook(file_contents=excel_content)
-            sheet_names = workbook.sheet_names()
-        else:
-            from openpyxl import load_workbook
-            workbook = load_workbook(excel_file, read_only=True)
-            sheet_names = workbook.sheetnames
-
-        print(f"✅ 检测到Excel包含 {len(sheet_names)} 个Sheet: {sheet_names}")
-
-        # 过滤指定关键词的Sheet
-        FILTER_KEYWORDS = ["监测数据", "正式数据", "IQA检测"]
-        filtered_sheets = [
-            name for name in sheet_names
-            if any(kw in name for kw in FILTER_KEYWORDS)
-        ]
-        print(f"✅ 过滤后需解析的Sheet: {filtered_sheets}")
-
-        if not filtered_sheets:
-            raise Exception(f"❌ 无符合过滤条件的Sheet（关键词：{FILTER_KEYWORDS}）")
-
-        # 遍历过滤后的Sheet，跳过空Sheet
-        all_sheets_data = []
-        for sheet_name in filtered_sheets:
-            if 文件名称.endswith(".xls"):
-                df_sheet = pd.read_excel(
-                    excel_file,
-                    engine="xlrd",
-                    sheet_name=sheet_name
-                )
-            else:
-                excel_file.seek(0)
-                df_sheet = pd.read_excel(
-                    excel_file,
-                    engine="openpyxl",
-                    sheet_name=sheet_name
-                )
-
-            df_sheet = df_sheet.fillna("")
-
-            if len(df_sheet) == 0:
-                print(f"⚠️ 跳过空Sheet: {sheet_name}（0行数据）")
-                continue
+        # 工作簿只打开一次，Sheet名称与各Sheet数据都从同一个句柄读取，避免每读一个Sheet重新解析整个文件
+        with 打开工作簿(excel_content, 文件名称) as excel_file:
+            sheet_names = excel_file.工作表名称
+            print(f"✅ 检测到Excel包含 {len(sheet_names)} 个Sheet: {sheet_names}")
+
+            # 过滤指定关键词的Sheet
+            FILTER_KEYWORDS = ["监测数据", "正式数据", "IQA检测"]
+            filtered_sheets = [
+                name for name in sheet_names
+                if any(kw in name for kw in FILTER_KEYWORDS)
+            ]
+            print(f"✅ 过滤后需解析的Sheet: {filtered_sheets}")
 
-            df_sheet["所属Sheet"] = sheet_name
-            print(f"  - 解析Sheet [{sheet_name}]: {len(df_sheet)}行 × {len(df_sheet.columns)}列")
-            all_sheets_data.append(df_sheet)
+            if not filtered_sheets:
+                raise Exception(f"❌ 无符合过滤条件的Sheet（关键词：{FILTER_KEYWORDS}）")
+
+            # 遍历过滤后的Sheet，跳过空Sheet
+            all_sheets_data = []
+            with 指标.阶段("表格解析"):
+                for sheet_name in filtered_sheets:
+                    df_sheet = excel_file.读取(sheet_name).fillna("")
+                    指标.计数("解析Sheet数")
+
+                    if len(df_sheet) == 0:
+                        print(f"⚠️ 跳过空Sheet: {sheet_name}（0行数据）")
+                        continue
+
+                    df_sheet["所属Sheet"] = sheet_name
+                    print(f"  - 解析Sheet [{sheet_name}]: {len(df_sheet)}行 × {len(df_sheet.columns)}列")
+                    all_sheets_data.append(df_sheet)
 
         if not all_sheets_data:
             raise Exception("❌ 过滤后所有Sheet均为空，无数据可解析")
@@ -347,60 +315,46 @@ def 在线解析表格文件(访问令牌, 文件临时链接, 文件名称):
         return df_merged
 
     except ImportError as e:
-        raise Exception(f"缺少Excel解析依赖: {str(e)}，请安装 xlrd/openpyxl")
+        raise Exception(f"缺少Excel解析依赖: {str(e)}，请安装 xlrd/openpyxl（或 python-calamine）")
     except Exception as e:
         raise Exception(f"多Sheet解析失败: {str(e)}")
 
-def 在线解析表格为二维数据(访问令牌, 文件临时链接, 文件名称):
-    """在线解析Excel为{工作表名: 二维列表}字典（无需落地文件）"""
-    headers = {
-        "Authorization": f"Bearer {访问令牌}",
-        "User-Agent": "Mozilla/5.0 (Linux; x86_64) AppleWebKit/537.36"
-    }
+def 下载附件内容(访问令牌, 文件临时链接, 文件名称):
+    """下载附件到内存（大文件分段并发下载、断点续传），失败返回None"""
+    import io
     try:
-        resp = requests.get(文件临时链接, headers=headers, timeout=300, stream=True)
-        resp.raise_for_status()
-        excel_content = io.BytesIO()
-        for chunk in resp.iter_content(chunk_size=1024*1024):
-            if chunk:
-                excel_content.write(chunk)
-        excel_content.seek(0)
+        with 指标.阶段("附件下载"):
+            excel_content = io.BytesIO(下载为字节(访问令牌, 文件临时链接))
         print(f"✅ 成功下载在线附件: {文件名称}")
+        return excel_content
     except Exception as e:
         print(f"❌ 下载在线附件失败: {str(e)}")
         return None
 
-    # 优先用pyexcel解析
-    try:
-        工作表字典 = {}
-        book = pyexcel.get_book(
-            file_type=文件名称.split('.')[-1],
-            file_content=excel_content.getvalue()
-        )
-
-        for sheet_name in book.sheet_names():
-            二维列表 = book[sheet_name].rows()
-            二维列表 = [[cell if cell is not None else "" for cell in row] for row in 二维列表]
-            工作表字典[sheet_name] = 二维列表
-
-        print(f"✅ pyexcel解析完成，共{len(工作表字典)}个Sheet")
-        return 工作表字典
-    except Exception as e:
-        print(f"⚠️ pyexcel解析失败，降级用pandas: {str(e)}")
-        excel_content.seek(0)
-
-    # pandas降级解析
-    try:
-        工作表字典 = {}
-        excel_file = pd.ExcelFile(excel_content)
+def 在线解析表格为二维数据(访问令牌, 文件临时链接, 文件名称):
+    """在线解析Excel为{工作表名: 二维列表}字典（无需落地文件）"""
+    # 已有解析快照（SNAPSHOT_DIR）时直接读取，跳过下载与解析
+    快照 = 读取快照(文件临时链接, "bitable")
+    if 快照 is not None:
+        return 快照
+    excel_content = 下载附件内容(访问令牌, 文件临时链接, 文件名称)
+    if excel_content is None:
+        return None
+    return 解析附件内容(excel_content, 文件临时链接, 文件名称)
 
-        for sheet_name in excel_file.sheet_names:
-            engine = "xlrd" if 文件名称.lower().endswith('.xls') else "openpyxl"
-            df = pd.read_excel(excel_file, sheet_name=sheet_name, engine=engine)
+def _解析工作簿(excel_content, 文件名称, 引擎):
+    import pandas as pd
+    # 内存紧张时已解析的工作表溢出到磁盘
+    工作表字典 = 溢出字典()
+    with 打开工作簿(excel_content, 文件名称, 引擎) as excel_file:
+        for sheet_name in excel_file.工作表名称:
+            df = excel_file.读取(sheet_name)
 
             header_row = df.columns.tolist()
             data_rows = df.values.tolist()
+            del df
             二维列表 = [header_row] + data_rows
+            del data_rows
 
             # 统一处理空值和numpy类型
             二维列表 = [
@@ -413,27 +367,42 @@ def 在线解析表格为二维数据(访问令牌, 文件临时链接, 文件
                 for row in 二维列表
             ]
             工作表字典[sheet_name] = 二维列表
-
-        print(f"✅ pandas解析完成，共{len(工作表字典)}个Sheet")
-        return 工作表字典
-    except Exception as e:
-        print(f"❌ pandas解析失败: {str(e)}")
-        return None
-
-def 日期单元格转变(批次):
-    """统一日期格式转换"""
-    if isinstance(批次, datetime):
-        return 批次.strftime("%Y-%m-%d")
-    elif isinstance(批次, str):
-        try:
-            return 批次[:4] + "-" + 批次[5:7] + "-" + 批次[8:10]
-        except:
-            return "格式错误"
+    return 工作表字典
+
+def 解析附件内容(excel_content, 文件临时链接, 文件名称):
+    """
+    解析已下载的附件，成功后写入快照
+    按文件头选择引擎（见 feishu_excel：xls/xlsx 用 calamine 或 xlrd/openpyxl，无法识别的容器如csv 用 pyexcel）；
+    首选引擎抛出"格式不符"类异常或缺少依赖时才换另一个引擎重试（计入 解析降级次数），其他异常直接视为解析失败
+    """
+    格式 = 识别表格格式(excel_content.getbuffer())
+    扩展名 = 文件名称.rsplit('.', 1)[-1].lower()
+    首选引擎 = 选择引擎(格式)
+    if 首选引擎 != "pyexcel":
+        备选引擎 = "pyexcel"
     else:
+        备选引擎 = "calamine" if 引擎可用("calamine") else "openpyxl"
+    if 格式 is not None and 扩展名 != 格式:
+        print(f"⚠️ 附件扩展名与内容不符: {文件名称} 实际为{格式}")
+
+    引擎列表 = [首选引擎, 备选引擎]
+    for 序号, 引擎 in enumerate(引擎列表):
         try:
-            return datetime.fromtimestamp(批次).strftime("%Y%m%d")
-        except:
-            return "不支持的格式"
+            with 指标.阶段("表格解析"):
+                工作表字典 = _解析工作簿(excel_content, 文件名称, 引擎)
+        except Exception as e:
+            # 缺少解析依赖同样换另一个引擎
+            if 序号 + 1 < len(引擎列表) and isinstance(e, (ImportError, *格式不符异常(引擎))):
+                print(f"⚠️ {引擎}无法解析 {文件名称}，改用{引擎列表[序号 + 1]}: {str(e)}")
+                指标.计数("解析降级次数")
+                continue
+            print(f"❌ {引擎}解析失败: {str(e)}")
+            return None
+        指标.计数("解析Sheet数", len(工作表字典))
+        print(f"✅ {引擎}解析完成，共{len(工作表字典)}个Sheet")
+        保存快照(文件临时链接, 文件名称, "bitable", 工作表字典)
+        return 工作表字典
+    return None
 
 def 判断品项(内容):
     """根据内容匹配产品品项"""
@@ -524,149 +493,199 @@ def 判断品项(内容):
 
 # ====================== 核心业务逻辑 ======================
 def main():
-    """主执行函数（适配GitHub Actions）"""
+    """主执行函数（适配GitHub Actions，支持 ROW_IDS 多行模式）"""
     # 1. 校验环境变量
     print("🔍 开始校验环境变量...")
     validate_environment()
     print("✅ 环境变量校验通过")
 
-    # 2. 获取飞书访问令牌
+    # 2. 获取飞书访问令牌（多行共享）
     print("\n🔍 开始获取飞书访问令牌...")
     try:
         访问令牌 = 获取访问令牌(APP_ID, APP_SECRET)
     except Exception as e:
         raise Exception(f"获取访问令牌失败: {str(e)}")
 
+    行ID列表 = 解析行ID列表(ROW_IDS, ROW_ID)
+    if len(行ID列表) == 1:
+        处理单行(访问令牌, APP_ID, APP_SECRET, DWBG_TOKEN, DWBG_TABLE_ID, 行ID列表[0])
+    else:
+        # 多行模式：整表只读取一次，各行共享记录缓存
+        记录缓存 = 建立记录缓存(获取多维表格内容(访问令牌, DWBG_TOKEN, DWBG_TABLE_ID))
+        处理结果 = 并发处理行(
+            lambda 行ID: 处理单行(访问令牌, APP_ID, APP_SECRET, DWBG_TOKEN, DWBG_TABLE_ID, 行ID, 记录缓存),
+            行ID列表
+        )
+        if 输出处理结果(处理结果):
+            raise Exception("存在处理失败的行，请查看上方日志")
+
+    # 执行完成
+    print("\n🎉 所有数据处理完成！")
+
+def 处理单行(访问令牌, APP_ID, APP_SECRET, DWBG_TOKEN, DWBG_TABLE_ID, ROW_ID, 记录缓存=None):
+    """处理单个行ID：汇总附件中的监测数据并回写偏差/翅类中值"""
     # 3. 获取多维表格附件链接
     print(f"\n🔍 开始提取行ID [{ROW_ID}] 的附件链接...")
     try:
-        获取信息 = 获取多维表格中附件的链接(访问令牌, DWBG_TOKEN, DWBG_TABLE_ID, ROW_ID, "上传附件")
+        获取信息 = 获取多维表格中附件的链接(访问令牌, DWBG_TOKEN, DWBG_TABLE_ID, ROW_ID, "上传附件", 记录缓存)
     except Exception as e:
         raise Exception(f"获取附件链接失败: {str(e)}")
 
-    # 4. 解析Excel并构建数据字典
+    # 4. 下载 → 解析 → 筛选 流水线：前一个附件筛选时，后一个附件已在下载/解析
     print("\n🔍 开始解析Excel附件并提取数据...")
     数据字典 = {}
-    for 列表元素_元组 in 获取信息:
-        文件临时链接 = 列表元素_元组[0]
-        文件名称 = 列表元素_元组[1]
-        print(f"\n📄 处理附件: {文件名称}")
-        print(f"🔗 附件链接: {文件临时链接[:50]}...")
-
-        # 解析Excel为二维数据
-        读取数据字典 = 在线解析表格为二维数据(访问令牌, 文件临时链接, 文件名称)
-        if not 读取数据字典:
-            raise Exception(f"附件 {文件名称} 解析失败，返回空数据")
-
-        # 处理"监测数据"工作表
-        if "监测数据" in 读取数据字典:
-            print(f"📊 开始处理「监测数据」工作表...")
-            工作表内容 = 读取数据字典["监测数据"]
-            取值字典 = 数据字典.setdefault("监测数据", {})
-
-            for 行数, 一行内容 in enumerate(工作表内容):
-                # 跳过表头和空行（行数>1 且 第14列（索引13）有值）
-                if 行数 > 1 and 一行内容[13]:
-                    # 匹配工厂名称
-                    工厂名称 = 新检查工厂字典.get(一行内容[1])
-                    # 匹配产品品项
-                    产品品项 = 判断品项(一行内容[3])
-
-                    # 跳过无法匹配的工厂/品项
-                    if not 产品品项 or not 工厂名称:
-                        print(f"⚠️ 行数{行数} - 工厂/品项匹配失败: 工厂={一行内容[1]}, 品项={一行内容[3]}，跳过")
-                        continue
 
-                    # 提取核心字段
-                    工艺品类 = 一行内容[2]
-                    模块 = 一行内容[4]
-                    工序 = 一行内容[5]
-                    控制组 = 一行内容[6]
-                    控制点 = 一行内容[7]
-                    检测时间 = 日期单元格转变(一行内容[9])
-                    状态 = 一行内容[13]
-                    检测值 = 一行内容[14]
-                    控制标准 = 一行内容[15]
-
-                    # 筛选条件：生产过程监测 → 原料鸡肉 → 产品品质检查
-                    if 模块 == "生产过程监测" and 工艺品类 == "原料鸡肉" and 工序 == "产品品质检查":
-                        # 构建嵌套数据字典
-                        取值列表 = 取值字典.setdefault(工厂名称, {}) \
-                                            .setdefault(检测时间[:10], {}) \
-                                            .setdefault(产品品项, {}) \
-                                            .setdefault(状态, {}) \
-                                            .setdefault(str(控制组), {}) \
-                                            .setdefault(str(控制点), [])
-                        取值列表.append(检测值)
+    def 下载阶段(附件列表):
+        for 文件临时链接, 文件名称 in 附件列表:
+            print(f"\n📄 处理附件: {文件名称}")
+            print(f"🔗 附件链接: {文件临时链接[:50]}...")
+            # 已有解析快照（SNAPSHOT_DIR）时直接读取，跳过下载与解析
+            快照 = 读取快照(文件临时链接, "bitable")
+            if 快照 is not None:
+                yield 文件临时链接, 文件名称, 快照, None
+                continue
+            excel_content = 下载附件内容(访问令牌, 文件临时链接, 文件名称)
+            if excel_content is None:
+                raise Exception(f"附件 {文件名称} 解析失败，返回空数据")
+            yield 文件临时链接, 文件名称, None, excel_content
+
+    def 解析阶段(附件列表):
+        for 文件临时链接, 文件名称, 快照, excel_content in 附件列表:
+            # 解析Excel为二维数据
+            读取数据字典 = 快照 if 快照 is not None else 解析附件内容(excel_content, 文件临时链接, 文件名称)
+            if not 读取数据字典:
+                raise Exception(f"附件 {文件名称} 解析失败，返回空数据")
+            yield 文件临时链接, 文件名称, 读取数据字典
+
+    def 筛选阶段(附件列表):
+        for 文件临时链接, 文件名称, 读取数据字典 in 附件列表:
+            # 设置 HISTORY_DB 时同时收集本附件的监测记录，追加到历史库
+            历史记录列表 = [] if 历史库路径() else None
+            with 指标.阶段("监测数据筛选"):
+                # 处理"监测数据"工作表
+                if "监测数据" in 读取数据字典:
+                    print(f"📊 开始处理「监测数据」工作表...")
+                    工作表内容 = 读取数据字典["监测数据"]
+                    取值字典 = 数据字典.setdefault("监测数据", {})
+
+                    # 先筛出工厂/品项可匹配的行，检测时间整列批量转换
+                    候选行列表 = []
+                    for 行数, 一行内容 in enumerate(工作表内容):
+                        # 跳过表头和空行（行数>1 且 第14列（索引13）有值）
+                        if 行数 > 1 and 一行内容[13]:
+                            # 匹配工厂名称
+                            工厂名称 = 新检查工厂字典.get(一行内容[1])
+                            # 匹配产品品项
+                            产品品项 = 判断品项(一行内容[3])
+
+                            # 跳过无法匹配的工厂/品项
+                            if not 产品品项 or not 工厂名称:
+                                逐行日志(日志, "工厂/品项匹配失败",
+                                       f"⚠️ 行数{行数} - 工厂/品项匹配失败: 工厂={一行内容[1]}, 品项={一行内容[3]}，跳过",
+                                       logging.WARNING)
+                                continue
+                            候选行列表.append((一行内容, 工厂名称, 产品品项))
+                    检测时间列表 = 监测日期列转变([一行内容[9] for 一行内容, _, _ in 候选行列表])
+
+                    for (一行内容, 工厂名称, 产品品项), 检测时间 in zip(候选行列表, 检测时间列表):
+                        # 提取核心字段
+                        工艺品类 = 一行内容[2]
+                        模块 = 一行内容[4]
+                        工序 = 一行内容[5]
+                        控制组 = 一行内容[6]
+                        控制点 = 一行内容[7]
+                        状态 = 一行内容[13]
+                        检测值 = 一行内容[14]
+                        控制标准 = 一行内容[15]
+
+                        # 筛选条件：生产过程监测 → 原料鸡肉 → 产品品质检查
+                        if 模块 == "生产过程监测" and 工艺品类 == "原料鸡肉" and 工序 == "产品品质检查":
+                            # 构建嵌套数据字典
+                            取值列表 = 取值字典.setdefault(工厂名称, {}) \
+                                                .setdefault(检测时间[:10], {}) \
+                                                .setdefault(产品品项, {}) \
+                                                .setdefault(状态, {}) \
+                                                .setdefault(str(控制组), {}) \
+                                                .setdefault(str(控制点), [])
+                            取值列表.append(检测值)
+                            指标.计数("提取行数")
+                            if 历史记录列表 is not None:
+                                历史记录列表.append((工厂名称, 检测时间[:10], 产品品项, 状态, 控制组, 控制点, 检测值))
+            if 历史记录列表:
+                try:
+                    追加监测记录(解析文件令牌(文件临时链接), 文件名称, ROW_ID, 历史记录列表)
+                except Exception as e:
+                    # 历史库写入失败不影响本次汇总与表格更新
+                    print(f"⚠️ 写入历史库失败: {str(e)}")
+            yield 文件名称
+
+    流水线("监测数据") \
+        .阶段("下载", 下载阶段) \
+        .阶段("解析", 解析阶段) \
+        .阶段("筛选", 筛选阶段) \
+        .运行(获取信息)
 
     # 5. 构建偏差统计汇总字典和翅类中值统计汇总字典
     print("\n🔍 开始统计偏差和翅类中值数据...")
-    偏差统计汇总字典 = {}
-    翅类中值统计汇总字典 = {}
-
-    for 项, 嵌入字典 in 数据字典.items():
-        for 工厂名称, 嵌入字典2 in 嵌入字典.items():
-            for 监测时间, 嵌入字典3 in 嵌入字典2.items():
-                for 产品品项, 嵌入字典4 in 嵌入字典3.items():
-                    偏差明细列表 = []
-                    # 统计不合格偏差
-                    for 状态, 嵌入字典5 in 嵌入字典4.items():
-                        if 状态 == "不合格":
-                            for 控制组, 嵌入字典6 in 嵌入字典5.items():
-                                for 控制点, 录入值 in 嵌入字典6.items():
-                                    偏差明细列表.append(str(控制点))
-                    
-                    # 构建偏差信息
-                    偏差信息 = "、".join(偏差明细列表) if 偏差明细列表 else ""
-                    偏差统计汇总字典.setdefault(工厂名称, {}).setdefault(监测时间, {}).setdefault(产品品项, 偏差信息)
-
-                    # 统计翅类单枚重量
-                    if "翅中" in 产品品项 or "翅根" in 产品品项:
+    with 指标.阶段("数据汇总"):
+        偏差统计汇总字典 = {}
+        翅类中值统计汇总字典 = {}
+
+        for 项, 嵌入字典 in 数据字典.items():
+            for 工厂名称, 嵌入字典2 in 嵌入字典.items():
+                for 监测时间, 嵌入字典3 in 嵌入字典2.items():
+                    for 产品品项, 嵌入字典4 in 嵌入字典3.items():
+                        偏差明细列表 = []
+                        # 统计不合格偏差
                         for 状态, 嵌入字典5 in 嵌入字典4.items():
-                            for 控制组, 嵌入字典6 in 嵌入字典5.items():
-                                for 控制点, 录入值 in 嵌入字典6.items():
-                                    if "单枚重量" in 控制点:
-                                        监测值 = "、".join(录入值).replace(",", "、")
-                                        翅类中值统计汇总字典.setdefault(工厂名称, {}).setdefault(监测时间, {}).setdefault(产品品项, 监测值)
-
-    # 6. 更新偏差数据到飞书表格
-    print("\n🔍 开始更新偏差数据到飞书表格...")
-    for 工厂名称, 嵌入字典2 in 偏差统计汇总字典.items():
-        上传数据结构2 = {}
-        一个工厂的数据 = []
-        for 监测时间, 嵌入字典3 in 嵌入字典2.items():
-            for 产品品项, 偏差信息 in 嵌入字典3.items():
-                一个工厂的数据.append(f"{监测时间}*{工厂名称}*{产品品项}*{偏差信息}")
-        
-        if 一个工厂的数据:
-            偏差合并信息 = ",".join(一个工厂的数据)
-            字段名 = f"{工厂名称}（偏差）"
-            上传数据结构2[字段名] = 偏差合并信息
-        
-        if 上传数据结构2:
-            print(f"📤 准备更新[{工厂名称}]偏差数据: {字段名} = {偏差合并信息[:50]}...")
-            更新飞书表格(APP_ID, APP_SECRET, DWBG_TOKEN, DWBG_TABLE_ID, ROW_ID, 上传数据结构2)
-
-    # 7. 更新翅类中值数据到飞书表格
-    print("\n🔍 开始更新翅类中值数据到飞书表格...")
-    for 工厂名称, 嵌入字典2 in 翅类中值统计汇总字典.items():
-        上传数据结构2 = {}
-        一个工厂的数据 = []
-        for 监测时间, 嵌入字典3 in 嵌入字典2.items():
-            for 产品品项, 录入值 in 嵌入字典3.items():
-                一个工厂的数据.append(f"{监测时间}*{工厂名称}*{产品品项}*{录入值}")
-        
-        if 一个工厂的数据:
-            翅类中值合并信息 = ",".join(一个工厂的数据)
-            字段名 = f"{工厂名称}（翅类中值）"
-            上传数据结构2[字段名] = 翅类中值合并信息
-        
-        if 上传数据结构2:
-            print(f"📤 准备更新[{工厂名称}]翅类中值数据: {字段名} = {翅类中值合并信息[:50]}...")
+                            if 状态 == "不合格":
+                                for 控制组, 嵌入字典6 in 嵌入字典5.items():
+                                    for 控制点, 录入值 in 嵌入字典6.items():
+                                        偏差明细列表.append(str(控制点))
+                    
+                        # 构建偏差信息
+                        偏差信息 = "、".join(偏差明细列表) if 偏差明细列表 else ""
+                        偏差统计汇总字典.setdefault(工厂名称, {}).setdefault(监测时间, {}).setdefault(产品品项, 偏差信息)
+
+                        # 统计翅类单枚重量
+                        if "翅中" in 产品品项 or "翅根" in 产品品项:
+                            for 状态, 嵌入字典5 in 嵌入字典4.items():
+                                for 控制组, 嵌入字典6 in 嵌入字典5.items():
+                                    for 控制点, 录入值 in 嵌入字典6.items():
+                                        if "单枚重量" in 控制点:
+                                            监测值 = "、".join(录入值).replace(",", "、")
+                                            翅类中值统计汇总字典.setdefault(工厂名称, {}).setdefault(监测时间, {}).setdefault(产品品项, 监测值)
+
+    # 6. 偏差与翅类中值数据合并为一次更新写入飞书表格
+    print("\n🔍 开始更新偏差数据和翅类中值数据到飞书表格...")
+    各工厂上传数据 = []
+    for 统计汇总字典, 字段后缀 in ((偏差统计汇总字典, "偏差"), (翅类中值统计汇总字典, "翅类中值")):
+        for 工厂名称, 嵌入字典2 in 统计汇总字典.items():
+            一个工厂的数据 = []
+            for 监测时间, 嵌入字典3 in 嵌入字典2.items():
+                for 产品品项, 录入值 in 嵌入字典3.items():
+                    一个工厂的数据.append(f"{监测时间}*{工厂名称}*{产品品项}*{录入值}")
+
+            if 一个工厂的数据:
+                合并信息 = ",".join(一个工厂的数据)
+                字段名 = f"{工厂名称}（{字段后缀}）"
+                print(f"📤 准备更新[{工厂名称}]{字段后缀}数据: {字段名} = {合并信息[:50]}...")
+                各工厂上传数据.append({字段名: 合并信息})
+
+    if 各工厂上传数据:
+        # 按主表字段结构校验各工厂的字段（如主表缺少该工厂的列），未通过的工厂不提交，其余工厂照常合并更新
+        校验结果 = 校验记录列表(获取飞书客户端(APP_ID, APP_SECRET), DWBG_TOKEN, DWBG_TABLE_ID, 各工厂上传数据)
+        各工厂上传数据 = [一个工厂 for 一个工厂 in 校验结果 if 一个工厂 is not None]
+
+    if 各工厂上传数据:
+        上传数据结构2 = {字段名: 值 for 一个工厂 in 各工厂上传数据 for 字段名, 值 in 一个工厂.items()}
+        try:
             更新飞书表格(APP_ID, APP_SECRET, DWBG_TOKEN, DWBG_TABLE_ID, ROW_ID, 上传数据结构2)
-
-    # 8. 执行完成
-    print("\n🎉 所有数据处理完成！")
+        except Exception as e:
+            # 合并更新失败（如个别字段不存在）时逐个工厂更新，失败的工厂仍抛出异常
+            print(f"⚠️ 合并更新失败，改为逐个工厂更新: {str(e)[:200]}")
+            for 一个工厂 in 各工厂上传数据:
+                更新飞书表格(APP_ID, APP_SECRET, DWBG_TOKEN, DWBG_TABLE_ID, ROW_ID, 一个工厂)
 
 # ====================== 脚本入口 ======================
 if __name__ == "__main__":
@@ -675,3 +694,5 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"\n❌ 脚本执行失败: {str(e)}")
         exit(1)  # 退出码非0，标记GitHub Actions任务失败
+    finally:
+        指标.输出汇总("feishu_bitable_process")
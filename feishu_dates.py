@@ -0,0 +1,208 @@
+'''日期解析公共模块（各脚本的时间戳/日期格式转换，结果缓存 + 按列识别格式的批量转换）
+
+各脚本原有函数的时区处理不同，这里分别保留：
+- QSA转换时间戳：任意输入先转字符串解析，结果 +timezone_offset 小时
+- 单重转换时间戳：字符串结果 -timezone_offset 小时，datetime 直接取 timestamp()
+- QSA日期单元格转变 / 监测日期单元格转变：分别对应 QSA 与监测数据脚本的 日期单元格转变
+'''
+import functools
+from datetime import datetime
+
+# QSA脚本支持的日期格式（按顺序尝试，之后再尝试ISO格式）
+QSA日期格式 = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y-%m-%d",
+    "%Y/%m/%d",
+    "%Y年%m月%d日",
+    "%Y年%m月%d日 %H:%M:%S"
+]
+
+# 单重脚本支持的日期格式
+单重日期格式 = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y/%m/%d %H:%M:%S"
+]
+
+# 列键 → 已识别的日期格式（同一列的值格式一致，只识别一次）
+_列格式缓存 = {}
+
+def _解析日期文本(文本, 格式列表):
+    """按格式列表依次尝试，最后尝试ISO格式；全部失败返回None"""
+    for fmt in 格式列表:
+        try:
+            return datetime.strptime(文本, fmt)
+        except ValueError:
+            continue
+    try:
+        return datetime.fromisoformat(文本.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+@functools.lru_cache(maxsize=65536)
+def _QSA文本转时间戳(文本, timezone_offset):
+    dt = _解析日期文本(文本, QSA日期格式)
+    if dt is None:
+        raise ValueError(f"无法解析日期字符串: {文本}，支持格式：{QSA日期格式}")
+    return int((dt.timestamp() + timezone_offset * 3600) * 1000)
+
+@functools.lru_cache(maxsize=65536)
+def _单重文本转时间戳(文本, timezone_offset):
+    dt = _解析日期文本(文本, 单重日期格式)
+    if dt is None:
+        raise ValueError(f"无法解析日期字符串: {文本}")
+    return int((dt.timestamp() - timezone_offset * 3600) * 1000)
+
+def QSA转换时间戳(input_var, timezone_offset=8):
+    """
+    将输入变量转换为毫秒级时间戳（QSA脚本）
+    输入统一转为字符串后解析，datetime 按其字符串形式解析
+    """
+    if not input_var or str(input_var).strip() == "":
+        raise ValueError("输入值为空，无法转换时间戳")
+    return _QSA文本转时间戳(str(input_var).strip(), timezone_offset)
+
+def 单重转换时间戳(input_var, timezone_offset=8):
+    """转换为毫秒级时间戳（单重脚本）"""
+    if isinstance(input_var, str):
+        return _单重文本转时间戳(input_var, timezone_offset)
+    elif isinstance(input_var, datetime):
+        # 不缓存：pandas.Timestamp 与 datetime 相等但 timestamp() 的时区语义不同
+        return int(input_var.timestamp() * 1000)
+    else:
+        raise TypeError(f"不支持的类型: {type(input_var)}. 只支持字符串或datetime对象")
+
+def _识别列格式(文本列表, 格式列表, 列键=None):
+    """用第一个能解析的样本识别列格式，按列键缓存"""
+    if 列键 is not None and 列键 in _列格式缓存:
+        return _列格式缓存[列键]
+    for 文本 in 文本列表:
+        for fmt in 格式列表:
+            try:
+                datetime.strptime(文本, fmt)
+            except ValueError:
+                continue
+            if 列键 is not None:
+                _列格式缓存[列键] = fmt
+            return fmt
+    return None
+
+def _批量解析文本(文本列表, 格式列表, 列键=None):
+    """
+    按识别出的列格式批量解析（pandas 向量化），返回 {文本: datetime}
+    只保留按该格式格式化后与原文本完全一致的结果，保证与 strptime 逐个解析相同；其余文本由调用方逐个解析
+    """
+    fmt = _识别列格式(文本列表, 格式列表, 列键)
+    if not fmt or not 文本列表:
+        return {}
+    import pandas as pd
+    解析结果 = pd.to_datetime(pd.Series(文本列表, dtype=object), format=fmt, errors="coerce")
+    结果 = {}
+    for 文本, 时间 in zip(文本列表, 解析结果):
+        if pd.isna(时间):
+            continue
+        dt = 时间.to_pydatetime()
+        if dt.strftime(fmt) == 文本:
+            结果[文本] = dt
+    return 结果
+
+def QSA转换时间戳列(值列表, timezone_offset=8, 列键=None, 失败值=None):
+    """
+    QSA转换时间戳 的批量版本，结果与逐个调用一致；无法转换的位置为 失败值
+    :param 列键: 列标识（如 ("QSA", "计划完成期限")），用于缓存该列识别出的格式
+    """
+    文本列表 = [str(值).strip() if 值 and str(值).strip() != "" else None for 值 in 值列表]
+    唯一文本 = list(dict.fromkeys(文本 for 文本 in 文本列表 if 文本))
+    已解析 = _批量解析文本(唯一文本, QSA日期格式, 列键)
+    映射 = {}
+    for 文本 in 唯一文本:
+        dt = 已解析.get(文本)
+        if dt is not None:
+            映射[文本] = int((dt.timestamp() + timezone_offset * 3600) * 1000)
+            continue
+        try:
+            映射[文本] = _QSA文本转时间戳(文本, timezone_offset)
+        except ValueError:
+            映射[文本] = 失败值
+    return [映射[文本] if 文本 else 失败值 for 文本 in 文本列表]
+
+def 单重转换时间戳列(值列表, timezone_offset=8, 列键=None, 失败值=None):
+    """单重转换时间戳 的批量版本，结果与逐个调用一致；无法转换的位置为 失败值"""
+    唯一文本 = list(dict.fromkeys(值 for 值 in 值列表 if isinstance(值, str)))
+    已解析 = _批量解析文本(唯一文本, 单重日期格式, 列键)
+    映射 = {}
+    for 文本 in 唯一文本:
+        dt = 已解析.get(文本)
+        if dt is not None:
+            映射[文本] = int((dt.timestamp() - timezone_offset * 3600) * 1000)
+            continue
+        try:
+            映射[文本] = _单重文本转时间戳(文本, timezone_offset)
+        except ValueError:
+            映射[文本] = 失败值
+    结果 = []
+    for 值 in 值列表:
+        if isinstance(值, str):
+            结果.append(映射[值])
+        elif isinstance(值, datetime):
+            结果.append(int(值.timestamp() * 1000))
+        else:
+            结果.append(失败值)
+    return 结果
+
+def QSA日期单元格转变(批次):
+    """将日期单元格内容转换为YYYY-MM-DD格式（QSA脚本）"""
+    if not 批次:
+        return ""
+
+    if isinstance(批次, datetime):
+        return 批次.strftime("%Y-%m-%d")
+    elif isinstance(批次, str):
+        批次_clean = 批次.strip()
+        try:
+            # 优先截取YYYY-MM-DD部分
+            if len(批次_clean) >= 10:
+                return 批次_clean[:10]
+            else:
+                # 尝试解析
+                dt = datetime.strptime(批次_clean, "%Y-%m-%d")
+                return dt.strftime("%Y-%m-%d")
+        except:
+            return "格式错误"
+    else:
+        try:
+            return datetime.fromtimestamp(批次).strftime("%Y-%m-%d")
+        except:
+            return "不支持的格式"
+
+def 监测日期单元格转变(批次):
+    """统一日期格式转换（监测数据脚本）"""
+    if isinstance(批次, datetime):
+        return 批次.strftime("%Y-%m-%d")
+    elif isinstance(批次, str):
+        try:
+            return 批次[:4] + "-" + 批次[5:7] + "-" + 批次[8:10]
+        except:
+            return "格式错误"
+    else:
+        try:
+            return datetime.fromtimestamp(批次).strftime("%Y%m%d")
+        except:
+            return "不支持的格式"
+
+def 监测日期列转变(值列表):
+    """
+    监测日期单元格转变 的批量版本，结果与逐个调用一致
+    解析时日期单元格已转为文本（见 feishu_bitable_process._解析工作簿），同一列的日期大量重复，按唯一值缓存逐个转换
+    """
+    结果 = []
+    缓存 = {}
+    for 值 in 值列表:
+        try:
+            if 值 not in 缓存:
+                缓存[值] = 监测日期单元格转变(值)
+            结果.append(缓存[值])
+        except TypeError:
+            # 不可哈希的值不缓存
+            结果.append(监测日期单元格转变(值))
+    return 结果
@@ -0,0 +1,173 @@
+'''附件下载（支持 Range 时大文件按字节区间并发下载，中断后从已下载位置续传；不支持时退回单连接流式下载）
+
+流程：
+1. 首个请求带 Range 取第一段（DOWNLOAD_CHUNK_SIZE，默认4MB）：206 表示支持分段并得到文件大小，
+   小文件一次请求即下载完成；200 表示不支持，直接流式读取该响应
+2. 文件不小于 DOWNLOAD_RANGE_THRESHOLD（默认8MB）时其余部分按分段大小切分，
+   最多 DOWNLOAD_CONCURRENCY（默认4）个区间并发下载，写入预分配大小的目标文件
+3. 每个区间失败时从已写入的位置继续请求剩余部分；完成后校验各区间实际写入的字节数之和等于文件大小
+'''
+import os
+import re
+import time
+import threading
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from feishu_metrics import 指标
+
+默认分段阈值 = 8 * 1024 * 1024
+默认分段大小 = 4 * 1024 * 1024
+默认下载并发数 = 4
+
+# 单个区间（或单连接下载）的重试次数
+下载重试次数 = 3
+
+# 单次请求的连接/读取超时（秒）：读取超时针对两次收到数据的间隔，而不是整个下载
+连接超时秒 = 10
+读取超时秒 = 60
+
+class 下载失败(Exception):
+    """附件下载失败（重试后仍失败或大小校验不通过）"""
+
+def _读取整数环境变量(名称, 默认值):
+    try:
+        return max(1, int(os.getenv(名称, 默认值)))
+    except ValueError:
+        return 默认值
+
+def _请求头(访问令牌, 附加头=None):
+    请求头 = {"Authorization": f"Bearer {访问令牌}"}
+    请求头.update(附加头 or {})
+    return 请求头
+
+def _解析总大小(响应):
+    """从 Content-Range: bytes 0-0/12345（空文件返回416: bytes */0）中取出总大小"""
+    匹配 = re.match(r"bytes\s+(?:\d+-\d+|\*)/(\d+)", 响应.headers.get("Content-Range", ""))
+    return int(匹配.group(1)) if 匹配 else None
+
+def _流式写入(响应, 文件):
+    """把响应体顺序写入文件，返回写入的字节数"""
+    已写入 = 0
+    for 块 in 响应.iter_content(chunk_size=64 * 1024):
+        if 块:
+            文件.write(块)
+            已写入 += len(块)
+    return 已写入
+
+def _下载区间(会话, 链接, 访问令牌, 文件, 文件锁, 开始, 结束, 首个响应=None):
+    """
+    下载 [开始, 结束] 字节区间（首个响应为探测得到的该区间响应时直接读取），失败时从已写入位置续传
+    :return: 该区间实际写入的字节数
+    """
+    当前 = 开始
+    for 第几次 in range(下载重试次数):
+        try:
+            if 首个响应 is None:
+                指标.计数("API调用次数")
+                首个响应 = 会话.get(链接, headers=_请求头(访问令牌, {"Range": f"bytes={当前}-{结束}"}),
+                                stream=True, timeout=(连接超时秒, 读取超时秒))
+            with 首个响应 as 响应:
+                if 响应.status_code != 206:
+                    raise 下载失败(f"区间请求返回 {响应.status_code}")
+                # 逐块更新 当前，连接中断时从已写入的位置续传
+                for 块 in 响应.iter_content(chunk_size=64 * 1024):
+                    if not 块:
+                        continue
+                    with 文件锁:
+                        文件.seek(当前)
+                        文件.write(块)
+                    当前 += len(块)
+            if 当前 > 结束:
+                return 当前 - 开始
+            raise 下载失败(f"区间 {开始}-{结束} 提前结束于 {当前}")
+        except Exception as e:
+            首个响应 = None
+            if 第几次 + 1 >= 下载重试次数:
+                raise 下载失败(f"区间 {开始}-{结束} 下载失败: {str(e)}")
+            print(f"⚠️ 区间 {开始}-{结束} 中断（已下载至 {当前}），续传: {str(e)}")
+            指标.计数("下载重试次数")
+            time.sleep(min(2 ** 第几次, 8))
+
+def _单连接下载(会话, 链接, 访问令牌, 目标路径, 首个响应=None):
+    """不支持分段时整体下载（首个响应为探测得到的200响应时直接读取），失败重新下载"""
+    for 第几次 in range(下载重试次数):
+        try:
+            if 首个响应 is None:
+                指标.计数("API调用次数")
+                首个响应 = 会话.get(链接, headers=_请求头(访问令牌), stream=True, timeout=(连接超时秒, 读取超时秒))
+            with 首个响应 as 响应:
+                响应.raise_for_status()
+                预期大小 = 响应.headers.get("Content-Length")
+                with open(目标路径, "wb") as 文件:
+                    已写入 = _流式写入(响应, 文件)
+            if 预期大小 is not None and 已写入 != int(预期大小):
+                raise 下载失败(f"大小不一致: 预期 {预期大小}，实际 {已写入}")
+            return 已写入
+        except Exception as e:
+            首个响应 = None
+            if 第几次 + 1 >= 下载重试次数:
+                raise 下载失败(f"下载失败: {str(e)}")
+            print(f"⚠️ 下载中断，重新下载: {str(e)}")
+            指标.计数("下载重试次数")
+            time.sleep(min(2 ** 第几次, 8))
+
+def 下载到文件(访问令牌, 文件临时链接, 目标路径):
+    """下载附件到目标路径，返回文件大小；失败抛出 下载失败"""
+    import requests
+    分段阈值 = _读取整数环境变量("DOWNLOAD_RANGE_THRESHOLD", 默认分段阈值)
+    分段大小 = _读取整数环境变量("DOWNLOAD_CHUNK_SIZE", 默认分段大小)
+    并发数 = _读取整数环境变量("DOWNLOAD_CONCURRENCY", 默认下载并发数)
+    with requests.Session() as 会话:
+        # 首个请求取第一段，同时探测是否支持 Range
+        try:
+            指标.计数("API调用次数")
+            首个响应 = 会话.get(文件临时链接, headers=_请求头(访问令牌, {"Range": f"bytes=0-{分段大小 - 1}"}),
+                             stream=True, timeout=(连接超时秒, 读取超时秒))
+        except requests.exceptions.RequestException as e:
+            raise 下载失败(f"下载失败: {str(e)}")
+        总大小 = _解析总大小(首个响应) if 首个响应.status_code in (206, 416) else None
+        if 总大小 is None:
+            # 不支持 Range（或返回异常），按单连接读取该响应本身
+            文件大小 = _单连接下载(会话, 文件临时链接, 访问令牌, 目标路径, 首个响应)
+            指标.计数("下载字节数", 文件大小)
+            return 文件大小
+
+        if 总大小 == 0:
+            首个响应.close()
+            区间列表 = []
+        elif 总大小 <= 分段大小:
+            区间列表 = [(0, 总大小 - 1)]
+        elif 总大小 < 分段阈值:
+            区间列表 = [(0, 分段大小 - 1), (分段大小, 总大小 - 1)]
+        else:
+            区间列表 = [(开始, min(开始 + 分段大小, 总大小) - 1) for 开始 in range(0, 总大小, 分段大小)]
+            指标.计数("分段下载数", len(区间列表))
+            print(f"📥 分段下载: {总大小} bytes，{len(区间列表)} 段，并发 {min(并发数, len(区间列表))}")
+        文件锁 = threading.Lock()
+        with open(目标路径, "wb") as 文件:
+            # 预分配文件大小，各区间写入各自位置
+            文件.truncate(总大小)
+            已写入 = 0
+            if len(区间列表) == 1:
+                已写入 = _下载区间(会话, 文件临时链接, 访问令牌, 文件, 文件锁, *区间列表[0], 首个响应)
+            elif 区间列表:
+                with ThreadPoolExecutor(max_workers=min(并发数, len(区间列表)), thread_name_prefix="分段下载") as 线程池:
+                    任务列表 = [
+                        线程池.submit(_下载区间, 会话, 文件临时链接, 访问令牌, 文件, 文件锁, 开始, 结束,
+                                   首个响应 if 序号 == 0 else None)
+                        for 序号, (开始, 结束) in enumerate(区间列表)
+                    ]
+                    已写入 = sum(任务.result() for 任务 in 任务列表)
+    # 文件已预分配为 总大小，文件大小无法反映缺失的区间，按各区间实际写入的字节数校验
+    if 已写入 != 总大小:
+        raise 下载失败(f"大小校验失败: 预期 {总大小}，实际写入 {已写入}")
+    指标.计数("下载字节数", 总大小)
+    return 总大小
+
+def 下载为字节(访问令牌, 文件临时链接):
+    """下载附件并返回内容（经临时文件中转，分段下载时无需在内存中拼接）"""
+    with tempfile.TemporaryDirectory() as 临时目录:
+        路径 = os.path.join(临时目录, "attachment")
+        下载到文件(访问令牌, 文件临时链接, 路径)
+        with open(路径, "rb") as f:
+            return f.read()
@@ -0,0 +1,165 @@
+'''Excel 读取后端（环境变量 EXCEL_ENGINE 选择：auto | calamine | openpyxl | xlrd | pyexcel，默认 auto）
+
+- auto：按文件头选择。xlsx/xls 优先 calamine（可选依赖 python-calamine，Rust 实现），
+  未安装时 xlsx 用 openpyxl（read_only），xls 用 xlrd；其他格式（如csv）用 pyexcel
+- calamine/openpyxl/xlrd 经 pandas 读取；pyexcel 读出的行同样经 pandas TextParser 推断类型，
+  各引擎返回的 DataFrame 逐单元格一致（tools/excel_engine_benchmark.py 校验）
+- 指定的引擎未安装或不支持该格式时提示一次并改用 auto
+
+用法：
+    with 打开工作簿(文件内容, 文件名称) as 工作簿:
+        for 名称 in 工作簿.工作表名称:
+            df = 工作簿.读取(名称, header=None)
+'''
+import io
+import os
+import importlib.util
+
+# 表格容器的文件头：OLE2（.xls）与 ZIP（.xlsx 等 OOXML）
+OLE2文件头 = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+ZIP文件头 = b"PK\x03\x04"
+
+# 引擎 → (依赖模块, 支持的格式)；格式 None 表示无法按文件头识别的内容
+引擎配置 = {
+    "calamine": ("python_calamine", ("xlsx", "xls")),
+    "openpyxl": ("openpyxl", ("xlsx",)),
+    "xlrd": ("xlrd", ("xls",)),
+    "pyexcel": ("pyexcel", ("xlsx", "xls", None)),
+}
+
+_已提示 = set()
+
+def 识别表格格式(内容):
+    """按文件头识别容器类型：OLE2 返回"xls"，ZIP 返回"xlsx"，其他（如csv）返回None"""
+    文件头 = bytes(内容[:8])
+    if 文件头.startswith(OLE2文件头):
+        return "xls"
+    if 文件头.startswith(ZIP文件头):
+        return "xlsx"
+    return None
+
+def 引擎可用(引擎):
+    # 只查找模块不导入，避免拖慢入口脚本导入
+    return 引擎 in 引擎配置 and importlib.util.find_spec(引擎配置[引擎][0]) is not None
+
+def _提示一次(消息):
+    if 消息 not in _已提示:
+        _已提示.add(消息)
+        print(消息)
+
+def 选择引擎(格式, 引擎=None):
+    """
+    :param 格式: 识别表格格式() 的结果
+    :param 引擎: 指定引擎，None 时读取 EXCEL_ENGINE
+    """
+    引擎 = (引擎 or os.getenv("EXCEL_ENGINE") or "auto").strip().lower()
+    if 引擎 != "auto":
+        if 引擎 not in 引擎配置:
+            _提示一次(f"⚠️ 未知的 EXCEL_ENGINE: {引擎}，改用自动选择（可选: auto/{'/'.join(引擎配置)}）")
+        elif not 引擎可用(引擎):
+            _提示一次(f"⚠️ Excel引擎 {引擎} 未安装（需要 {引擎配置[引擎][0]}），改用自动选择")
+        elif 格式 not in 引擎配置[引擎][1]:
+            _提示一次(f"⚠️ Excel引擎 {引擎} 不支持 {格式 or '未知'} 格式，改用自动选择")
+        else:
+            return 引擎
+    if 格式 is None:
+        return "pyexcel"
+    if 引擎可用("calamine"):
+        return "calamine"
+    return "xlrd" if 格式 == "xls" else "openpyxl"
+
+def 格式不符异常(引擎):
+    """引擎无法识别文件内容（或缺少格式插件）时抛出的异常，调用方可据此换引擎重试"""
+    import csv
+    import zipfile
+    异常列表 = [zipfile.BadZipFile, KeyError, ValueError, UnicodeDecodeError, csv.Error]
+    if 引擎 == "calamine":
+        try:
+            from python_calamine import CalamineError
+            异常列表.append(CalamineError)
+        except ImportError:
+            pass
+    elif 引擎 == "xlrd":
+        try:
+            from xlrd import XLRDError
+            异常列表.append(XLRDError)
+        except ImportError:
+            pass
+    elif 引擎 == "openpyxl":
+        try:
+            from openpyxl.utils.exceptions import InvalidFileException
+            异常列表.append(InvalidFileException)
+        except ImportError:
+            pass
+    elif 引擎 == "pyexcel":
+        try:
+            from pyexcel_io.exceptions import NoSupportingPluginFound, SupportingPluginAvailableButNotInstalled
+            异常列表 += [NoSupportingPluginFound, SupportingPluginAvailableButNotInstalled]
+        except ImportError:
+            pass
+    return tuple(异常列表)
+
+class 工作簿:
+    """
+    打开一次工作簿，按需读取各工作表
+    :param 来源: 文件路径、bytes 或 BytesIO
+    :param 文件名称: 用于 pyexcel 判断文件类型（来源为路径时可省略）
+    :param 引擎: 指定引擎，None 时按 EXCEL_ENGINE / 文件头选择
+    """
+
+    def __init__(self, 来源, 文件名称=None, 引擎=None):
+        if isinstance(来源, (bytes, bytearray)):
+            来源 = io.BytesIO(来源)
+        if isinstance(来源, str):
+            文件名称 = 文件名称 or 来源
+            with open(来源, "rb") as f:
+                文件头 = f.read(8)
+        else:
+            来源.seek(0)
+            文件头 = 来源.read(8)
+            来源.seek(0)
+        self.格式 = 识别表格格式(文件头)
+        self.引擎 = 选择引擎(self.格式, 引擎)
+        self._来源 = 来源
+        self._文件名称 = 文件名称 or ""
+        self._excel = None
+        self._book = None
+        if self.引擎 == "pyexcel":
+            import pyexcel
+            扩展名 = self.格式 or self._文件名称.rsplit(".", 1)[-1].lower()
+            if isinstance(来源, str):
+                self._book = pyexcel.get_book(file_name=来源)
+            else:
+                self._book = pyexcel.get_book(file_type=扩展名, file_content=来源.getvalue())
+        else:
+            import pandas as pd
+            self._excel = pd.ExcelFile(来源, engine=self.引擎)
+
+    @property
+    def 工作表名称(self):
+        if self._book is not None:
+            return list(self._book.sheet_names())
+        return list(self._excel.sheet_names)
+
+    def 读取(self, 名称, header=0):
+        """读取一个工作表为 DataFrame（header 含义同 pandas.read_excel）"""
+        if self._book is None:
+            return self._excel.parse(名称, header=header)
+        from pandas.io.parsers import TextParser
+        with TextParser(list(self._book[名称].rows()), header=header) as 解析器:
+            return 解析器.read()
+
+    def 关闭(self):
+        if self._excel is not None:
+            self._excel.close()
+            self._excel = None
+        self._book = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *异常信息):
+        self.关闭()
+
+def 打开工作簿(来源, 文件名称=None, 引擎=None):
+    return 工作簿(来源, 文件名称, 引擎)
@@ -0,0 +1,181 @@
+'''监测数据历史库（SQLite，设置环境变量 HISTORY_DB 为数据库文件路径后启用）
+
+- feishu_bitable_process 每解析一个附件，把筛选出的监测记录（工厂、日期、品项、状态、控制组、控制点、检测值）追加到 监测记录 表
+- 附件按 file_token 去重：同一附件重跑不会重复计入
+- 监测汇总 表按 日/周/月 × 工厂 × 品项 × 控制点 维护记录数、不合格数、数值合计/平方和/最值，
+  新附件导入时只把该附件的记录按 UPSERT 累加到对应周期，跨周期查询不需要重新扫描历史记录
+- 周以周一为开始日期，月以当月1日为开始日期
+- 在 GitHub Actions 中运行时需自行持久化数据库文件（如 actions/cache），常驻 Worker 可直接使用本地路径
+'''
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from feishu_metrics import 指标
+
+# 周期 → 周期开始日期的 SQLite 表达式（日期列为 YYYY-MM-DD）
+周期表达式 = {
+    "日": "日期",
+    "周": "date(日期, 'weekday 0', '-6 days')",
+    "月": "strftime('%Y-%m-01', 日期)",
+}
+
+建表语句 = """
+CREATE TABLE IF NOT EXISTS 附件 (
+    file_token TEXT PRIMARY KEY,
+    文件名称 TEXT,
+    行ID TEXT,
+    记录数 INTEGER NOT NULL,
+    导入时间 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS 监测记录 (
+    file_token TEXT NOT NULL,
+    序号 INTEGER NOT NULL,
+    工厂 TEXT NOT NULL,
+    日期 TEXT NOT NULL,
+    产品品项 TEXT NOT NULL,
+    状态 TEXT,
+    控制组 TEXT,
+    控制点 TEXT NOT NULL,
+    检测值 TEXT,
+    数值 REAL,
+    PRIMARY KEY (file_token, 序号)
+);
+CREATE INDEX IF NOT EXISTS 监测记录_工厂日期 ON 监测记录 (工厂, 日期);
+CREATE TABLE IF NOT EXISTS 监测汇总 (
+    周期 TEXT NOT NULL,
+    周期开始 TEXT NOT NULL,
+    工厂 TEXT NOT NULL,
+    产品品项 TEXT NOT NULL,
+    控制点 TEXT NOT NULL,
+    记录数 INTEGER NOT NULL,
+    不合格数 INTEGER NOT NULL,
+    数值个数 INTEGER NOT NULL,
+    数值合计 REAL NOT NULL,
+    数值平方和 REAL NOT NULL,
+    最小值 REAL,
+    最大值 REAL,
+    PRIMARY KEY (周期, 周期开始, 工厂, 产品品项, 控制点)
+);
+"""
+
+# 把一个附件的记录按周期累加到汇总表（最值取并集，SQLite 的 min/max 遇到 NULL 返回 NULL，先 coalesce）
+累加汇总语句 = """
+INSERT INTO 监测汇总
+SELECT ?, {周期开始}, 工厂, 产品品项, 控制点,
+       count(*), sum(状态 = '不合格'), count(数值), total(数值), total(数值 * 数值), min(数值), max(数值)
+FROM 监测记录 WHERE file_token = ?
+GROUP BY 2, 工厂, 产品品项, 控制点
+ON CONFLICT (周期, 周期开始, 工厂, 产品品项, 控制点) DO UPDATE SET
+    记录数 = 记录数 + excluded.记录数,
+    不合格数 = 不合格数 + excluded.不合格数,
+    数值个数 = 数值个数 + excluded.数值个数,
+    数值合计 = 数值合计 + excluded.数值合计,
+    数值平方和 = 数值平方和 + excluded.数值平方和,
+    最小值 = min(coalesce(最小值, excluded.最小值), coalesce(excluded.最小值, 最小值)),
+    最大值 = max(coalesce(最大值, excluded.最大值), coalesce(excluded.最大值, 最大值))
+"""
+
+# 多行线程共用一个数据库文件，写入串行
+_写入锁 = threading.Lock()
+
+def 历史库路径():
+    """返回历史库路径（环境变量 HISTORY_DB），未设置时返回None"""
+    路径 = (os.getenv("HISTORY_DB") or "").strip()
+    return 路径 or None
+
+def 转换数值(检测值):
+    """检测值为单个数字时返回float，否则（空值、多个取值、文本）返回None"""
+    try:
+        return float(str(检测值).strip())
+    except (TypeError, ValueError):
+        return None
+
+def 规范日期(日期):
+    """YYYY-MM-DD 或 YYYYMMDD → YYYY-MM-DD，其他（如"格式错误"）返回None"""
+    匹配 = re.fullmatch(r"(\d{4})-?(\d{2})-?(\d{2})", str(日期 or "").strip())
+    return "-".join(匹配.groups()) if 匹配 else None
+
+def 打开历史库(路径=None):
+    连接 = sqlite3.connect(路径 or 历史库路径(), timeout=30)
+    连接.execute("PRAGMA journal_mode=WAL")
+    连接.executescript(建表语句)
+    return 连接
+
+def 追加监测记录(file_token, 文件名称, 行ID, 记录列表, 路径=None):
+    """
+    追加一个附件的监测记录并累加日/周/月汇总（同一事务）
+    :param 记录列表: [(工厂, 日期YYYY-MM-DD, 产品品项, 状态, 控制组, 控制点, 检测值), ...]
+    :return: 新增的记录数；附件已导入过时返回0
+    """
+    路径 = 路径 or 历史库路径()
+    if not 路径:
+        return 0
+    有效记录 = []
+    for 工厂, 日期, *其他 in 记录列表:
+        日期 = 规范日期(日期)
+        if 日期:
+            有效记录.append((工厂, 日期, *其他))
+    if len(有效记录) < len(记录列表):
+        print(f"⚠️ {len(记录列表) - len(有效记录)} 条监测记录的检测时间无法识别，不计入历史库")
+    记录列表 = 有效记录
+    with 指标.阶段("历史写入"), _写入锁:
+        连接 = 打开历史库(路径)
+        try:
+            with 连接:
+                已导入 = 连接.execute("SELECT 1 FROM 附件 WHERE file_token = ?", (file_token,)).fetchone()
+                if 已导入:
+                    print(f"ℹ️ 附件已在历史库中，跳过: {文件名称}")
+                    return 0
+                连接.execute("INSERT INTO 附件 VALUES (?, ?, ?, ?, ?)",
+                           (file_token, 文件名称, 行ID, len(记录列表), datetime.now().isoformat(timespec="seconds")))
+                连接.executemany(
+                    "INSERT INTO 监测记录 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((file_token, 序号, 工厂, 日期, 产品品项, 状态, str(控制组), str(控制点), str(检测值), 转换数值(检测值))
+                     for 序号, (工厂, 日期, 产品品项, 状态, 控制组, 控制点, 检测值) in enumerate(记录列表))
+                )
+                for 周期, 表达式 in 周期表达式.items():
+                    连接.execute(累加汇总语句.format(周期开始=表达式), (周期, file_token))
+        finally:
+            连接.close()
+    指标.计数("历史新增记录数", len(记录列表))
+    print(f"🗄️ 已追加 {len(记录列表)} 条监测记录到历史库: {文件名称}")
+    return len(记录列表)
+
+def 查询汇总(周期="月", 工厂=None, 开始日期=None, 结束日期=None, 路径=None):
+    """
+    查询汇总表，返回 [{"周期开始", "工厂", "产品品项", "控制点", "记录数", "不合格数", "不合格率", "均值", "标准差", "最小值", "最大值"}, ...]
+    """
+    if 周期 not in 周期表达式:
+        raise ValueError(f"不支持的周期: {周期}，可选: {list(周期表达式)}")
+    条件 = ["周期 = ?"]
+    参数 = [周期]
+    if 工厂:
+        条件.append("工厂 = ?")
+        参数.append(工厂)
+    if 开始日期:
+        条件.append("周期开始 >= ?")
+        参数.append(开始日期)
+    if 结束日期:
+        条件.append("周期开始 <= ?")
+        参数.append(结束日期)
+    连接 = 打开历史库(路径)
+    try:
+        行列表 = 连接.execute(
+            "SELECT 周期开始, 工厂, 产品品项, 控制点, 记录数, 不合格数, 数值个数, 数值合计, 数值平方和, 最小值, 最大值 "
+            f"FROM 监测汇总 WHERE {' AND '.join(条件)} ORDER BY 周期开始, 工厂, 产品品项, 控制点", 参数
+        ).fetchall()
+    finally:
+        连接.close()
+    结果 = []
+    for 周期开始, 工厂名称, 产品品项, 控制点, 记录数, 不合格数, 数值个数, 合计, 平方和, 最小值, 最大值 in 行列表:
+        均值 = 合计 / 数值个数 if 数值个数 else None
+        结果.append({
+            "周期开始": 周期开始, "工厂": 工厂名称, "产品品项": 产品品项, "控制点": 控制点,
+            "记录数": 记录数, "不合格数": 不合格数, "不合格率": round(不合格数 / 记录数, 4) if 记录数 else None,
+            "均值": 均值,
+            "标准差": max(0.0, 平方和 / 数值个数 - 均值 * 均值) ** 0.5 if 数值个数 else None,
+            "最小值": 最小值, "最大值": 最大值,
+        })
+    return 结果
@@ -0,0 +1,120 @@
+'''结构化日志（LOG_LEVEL 设置级别，默认INFO；LOG_FORMAT=json 时每行输出一个JSON对象，默认text与原有输出样式一致）
+
+- 日志经 QueueHandler 交给后台线程写出，业务线程不等待日志IO；进程退出时写完剩余日志
+  （与脚本中仍直接 print 的输出之间可能有少量先后错位）
+- 逐行消息（每条写入数据、每个失分点等）用 逐行日志() 按类别采样：每类前 LOG_SAMPLE_FIRST 条（默认5）全部输出，
+  之后每 LOG_SAMPLE_EVERY 条（默认100）输出1条，运行结束时汇总各类别省略的条数；LOG_LEVEL=DEBUG 时不采样
+- 只采样 INFO/DEBUG 级别：WARNING 及以上（匹配失败、转换失败等数据被丢弃或字段不填的逐行提示）全部输出，
+  附带的上下文（记录内容等）完整输出
+- 飞书SDK的日志级别跟随 LOG_LEVEL 但不低于 WARNING，只有 LOG_LEVEL=DEBUG 时才输出SDK的请求/响应详情
+'''
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import threading
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+
+默认采样前几条 = 5
+默认采样间隔 = 100
+
+_配置锁 = threading.Lock()
+_监听器 = None
+_采样锁 = threading.Lock()
+_采样总数 = Counter()
+_采样输出数 = Counter()
+
+def 获取日志级别():
+    级别 = logging.getLevelName((os.getenv("LOG_LEVEL") or "INFO").strip().upper())
+    return 级别 if isinstance(级别, int) else logging.INFO
+
+def _读取整数环境变量(名称, 默认值):
+    try:
+        return max(1, int(os.getenv(名称, 默认值)))
+    except ValueError:
+        return 默认值
+
+class 文本格式(logging.Formatter):
+    """只输出消息本身（与 print 一致），带上下文时追加在后面"""
+
+    def format(self, record):
+        消息 = record.getMessage()
+        上下文 = getattr(record, "上下文", None)
+        if 上下文:
+            消息 += " | " + json.dumps(上下文, ensure_ascii=False, default=str)
+        if record.exc_info:
+            消息 += "\n" + self.formatException(record.exc_info)
+        return 消息
+
+class JSON格式(logging.Formatter):
+    def format(self, record):
+        数据 = {
+            "时间": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "级别": record.levelname,
+            "模块": record.name,
+            "线程": record.threadName,
+            "消息": record.getMessage(),
+        }
+        数据.update(getattr(record, "上下文", None) or {})
+        if record.exc_info:
+            数据["异常"] = self.formatException(record.exc_info)
+        return json.dumps(数据, ensure_ascii=False, default=str)
+
+def _配置():
+    global _监听器
+    with _配置锁:
+        if _监听器 is not None:
+            return
+        输出 = logging.StreamHandler(sys.stdout)
+        输出.setFormatter(JSON格式() if os.getenv("LOG_FORMAT", "text").strip().lower() == "json" else 文本格式())
+        日志队列 = queue.SimpleQueue()
+        根日志器 = logging.getLogger("feishu")
+        根日志器.setLevel(获取日志级别())
+        根日志器.addHandler(QueueHandler(日志队列))
+        根日志器.propagate = False
+        _监听器 = QueueListener(日志队列, 输出)
+        _监听器.start()
+        atexit.register(_结束)
+
+def _结束():
+    global _监听器
+    省略 = {类别: 总数 - _采样输出数[类别] for 类别, 总数 in _采样总数.items() if 总数 > _采样输出数[类别]}
+    if 省略:
+        logging.getLogger("feishu").info("📉 逐行日志已采样: " + "，".join(
+            f"{类别} 共{_采样总数[类别]}条，省略{条数}条" for 类别, 条数 in 省略.items()))
+    if _监听器 is not None:
+        _监听器.stop()
+        _监听器 = None
+
+def 获取日志器(名称=None):
+    """返回 feishu 命名空间下的日志器（首次调用时配置队列输出）"""
+    _配置()
+    return logging.getLogger(f"feishu.{名称}" if 名称 else "feishu")
+
+def 逐行日志(日志器, 类别, 消息, 级别=logging.INFO, **上下文):
+    """
+    按类别采样输出逐行消息；上下文作为结构化字段附带（json格式下为独立字段）
+    :return: 本条是否输出
+    """
+    if not 日志器.isEnabledFor(级别):
+        return False
+    # 数据被丢弃的提示（WARNING 及以上）是唯一的记录，不采样
+    if 级别 < logging.WARNING and 日志器.getEffectiveLevel() > logging.DEBUG:
+        前几条 = _读取整数环境变量("LOG_SAMPLE_FIRST", 默认采样前几条)
+        间隔 = _读取整数环境变量("LOG_SAMPLE_EVERY", 默认采样间隔)
+        with _采样锁:
+            _采样总数[类别] += 1
+            序号 = _采样总数[类别]
+            if 序号 > 前几条 and (序号 - 前几条) % 间隔:
+                return False
+            _采样输出数[类别] += 1
+    日志器.log(级别, 消息, extra={"上下文": 上下文} if 上下文 else None)
+    return True
+
+def 获取SDK日志级别():
+    """飞书SDK客户端的日志级别"""
+    import lark_oapi as lark
+    return lark.LogLevel.DEBUG if 获取日志级别() <= logging.DEBUG else lark.LogLevel.WARNING
@@ -0,0 +1,183 @@
+'''内存预算与峰值监控（MAX_MEMORY_MB 启用内存上限模式，MEMORY_PROFILE=1 记录 Python 分配峰值）
+
+- 内存监控：后台线程定时采样 RSS（MEMORY_PROFILE=1 时另加 tracemalloc 当前分配量），记入采样时所有进行中的阶段，
+  运行汇总中按阶段输出峰值（采样间隔 MEMORY_SAMPLE_MS，默认20ms，短于采样间隔的尖峰可能漏记）
+- 内存上限模式：RSS 超过预算的80%时，解析出的工作表改为序列化到临时目录（溢出字典），
+  流水线阶段间只保留1项，减少同时驻留的中间数据
+'''
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import tracemalloc
+import weakref
+import itertools
+from collections import Counter
+from collections.abc import MutableMapping
+
+# RSS 达到预算的该比例即视为内存紧张
+内存预警比例 = 0.8
+
+默认采样毫秒 = 20
+
+def 获取内存预算():
+    """返回内存预算字节数（环境变量 MAX_MEMORY_MB），未设置时返回None"""
+    try:
+        预算MB = float(os.getenv("MAX_MEMORY_MB") or 0)
+    except ValueError:
+        return None
+    return int(预算MB * 1024 * 1024) if 预算MB > 0 else None
+
+def 内存监控已启用():
+    return 获取内存预算() is not None or 跟踪Python分配()
+
+def 跟踪Python分配():
+    # tracemalloc 会明显拖慢导入与解析并额外占用内存，只在 MEMORY_PROFILE=1 时开启
+    return os.getenv("MEMORY_PROFILE", "0") not in ("", "0")
+
+def 当前RSS():
+    """当前进程常驻内存（字节），无法读取时返回0"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # 非Linux平台退回历史峰值（macOS单位为字节，Linux为KB）
+        峰值 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return 峰值 if os.uname().sysname == "Darwin" else 峰值 * 1024
+    except (ImportError, OSError, AttributeError):
+        return 0
+
+def 内存紧张(预留字节=0):
+    """已设置预算且 当前RSS+预留字节 超过预算的80%"""
+    预算 = 获取内存预算()
+    return 预算 is not None and 当前RSS() + 预留字节 > 预算 * 内存预警比例
+
+class 内存监控:
+    """按阶段记录 RSS 与 Python 分配量（tracemalloc）的采样峰值"""
+
+    def __init__(self, 采样间隔秒=None, 跟踪分配=None):
+        if 采样间隔秒 is None:
+            try:
+                采样间隔秒 = max(1, int(os.getenv("MEMORY_SAMPLE_MS", 默认采样毫秒))) / 1000
+            except ValueError:
+                采样间隔秒 = 默认采样毫秒 / 1000
+        self._锁 = threading.Lock()
+        self._活跃阶段 = Counter()
+        self._峰值 = {}
+        self._全程峰值 = [0, 0]
+        self._采样间隔秒 = 采样间隔秒
+        self._停止 = threading.Event()
+        if 跟踪分配 is None:
+            跟踪分配 = 跟踪Python分配()
+        if 跟踪分配 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        threading.Thread(target=self._循环采样, name="内存采样", daemon=True).start()
+
+    def _采样(self):
+        rss = 当前RSS()
+        已分配 = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        with self._锁:
+            self._全程峰值 = [max(self._全程峰值[0], rss), max(self._全程峰值[1], 已分配)]
+            for 名称 in self._活跃阶段:
+                峰值 = self._峰值.setdefault(名称, [0, 0])
+                峰值[0] = max(峰值[0], rss)
+                峰值[1] = max(峰值[1], 已分配)
+
+    def _循环采样(self):
+        while not self._停止.wait(self._采样间隔秒):
+            self._采样()
+
+    def 进入(self, 名称):
+        with self._锁:
+            self._活跃阶段[名称] += 1
+        self._采样()
+
+    def 退出(self, 名称):
+        self._采样()
+        with self._锁:
+            self._活跃阶段[名称] -= 1
+            if self._活跃阶段[名称] <= 0:
+                del self._活跃阶段[名称]
+
+    def 汇总(self):
+        self._采样()
+        with self._锁:
+            结果 = {
+                名称: {"RSS峰值MB": round(rss / 1048576, 1), "Python分配峰值MB": round(已分配 / 1048576, 1)}
+                for 名称, (rss, 已分配) in self._峰值.items()
+            }
+            结果["全程"] = {
+                "RSS峰值MB": round(self._全程峰值[0] / 1048576, 1),
+                "Python分配峰值MB": round(max(self._全程峰值[1], tracemalloc.get_traced_memory()[1]
+                                               if tracemalloc.is_tracing() else 0) / 1048576, 1),
+            }
+        预算 = 获取内存预算()
+        if 预算:
+            结果["全程"]["预算MB"] = round(预算 / 1048576, 1)
+        return 结果
+
+class 溢出字典(MutableMapping):
+    """
+    保持插入顺序的 {工作表名: 二维列表}；写入时若内存紧张，值序列化到临时目录，读取时再加载
+    未设置内存预算时与普通字典相同
+    """
+
+    def __init__(self, 初始数据=None):
+        self._内存 = {}
+        self._顺序 = {}
+        self._目录 = None
+        self._清理 = None
+        self._文件序号 = itertools.count()
+        if 初始数据:
+            self.update(初始数据)
+
+    def _溢出路径(self):
+        if self._目录 is None:
+            self._目录 = tempfile.mkdtemp(prefix="feishu_spill_")
+            self._清理 = weakref.finalize(self, shutil.rmtree, self._目录, True)
+        return os.path.join(self._目录, f"{next(self._文件序号)}.pkl")
+
+    def __setitem__(self, 键, 值):
+        旧路径 = self._顺序.get(键)
+        if isinstance(旧路径, str):
+            os.remove(旧路径)
+        if 内存紧张():
+            from feishu_metrics import 指标
+            路径 = self._溢出路径()
+            with open(路径, "wb") as f:
+                pickle.dump(值, f, protocol=pickle.HIGHEST_PROTOCOL)
+            self._内存.pop(键, None)
+            self._顺序[键] = 路径
+            指标.计数("溢出工作表数")
+        else:
+            self._内存[键] = 值
+            self._顺序[键] = None
+
+    def __getitem__(self, 键):
+        路径 = self._顺序[键]
+        if 路径 is None:
+            return self._内存[键]
+        with open(路径, "rb") as f:
+            return pickle.load(f)
+
+    def __delitem__(self, 键):
+        路径 = self._顺序.pop(键)
+        if 路径 is None:
+            del self._内存[键]
+        else:
+            os.remove(路径)
+
+    def __iter__(self):
+        return iter(self._顺序)
+
+    def __len__(self):
+        return len(self._顺序)
+
+    def 关闭(self):
+        """删除溢出的临时文件"""
+        if self._清理 is not None:
+            self._清理()
@@ -0,0 +1,133 @@
+'''运行指标统计（分阶段计时 + 计数器 + 可选的分阶段内存峰值，运行结束输出JSON汇总）'''
+import os
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from feishu_memory import 内存监控已启用, 内存监控
+
+class 运行指标:
+    """线程安全的分阶段计时器与计数器"""
+
+    def __init__(self):
+        self._锁 = threading.Lock()
+        self._开始时间 = time.perf_counter()
+        self.阶段统计 = {}
+        self.计数器 = {}
+        # 设置 MAX_MEMORY_MB 或 MEMORY_PROFILE=1 时记录各阶段内存峰值
+        self._内存监控 = None
+        if 内存监控已启用():
+            self._内存监控 = 内存监控()
+
+    @contextmanager
+    def 阶段(self, 名称):
+        """统计一个阶段的耗时：with 指标.阶段("附件下载"): ..."""
+        开始 = time.perf_counter()
+        if self._内存监控:
+            self._内存监控.进入(名称)
+        try:
+            yield
+        finally:
+            self.记录耗时(名称, time.perf_counter() - 开始)
+            if self._内存监控:
+                self._内存监控.退出(名称)
+
+    def 计时(self, 名称):
+        """函数装饰器形式的阶段计时"""
+        def 装饰器(函数):
+            @functools.wraps(函数)
+            def 包装(*args, **kwargs):
+                with self.阶段(名称):
+                    return 函数(*args, **kwargs)
+            return 包装
+        return 装饰器
+
+    def 记录耗时(self, 名称, 耗时秒):
+        with self._锁:
+            统计 = self.阶段统计.setdefault(名称, {"次数": 0, "总耗时秒": 0.0, "最大耗时秒": 0.0})
+            统计["次数"] += 1
+            统计["总耗时秒"] += 耗时秒
+            统计["最大耗时秒"] = max(统计["最大耗时秒"], 耗时秒)
+
+    def 计数(self, 名称, 数量=1):
+        """累加计数器（下载字节数、解析Sheet数、写入记录数、API调用次数等）"""
+        with self._锁:
+            self.计数器[名称] = self.计数器.get(名称, 0) + 数量
+
+    def 汇总(self, 脚本名称="", 重置=False):
+        """返回可JSON序列化的汇总字典；重置=True 时在同一把锁内清空计时与计数（常驻Worker按事件输出）"""
+        内存 = self._内存监控.汇总() if self._内存监控 else None
+        with self._锁:
+            汇总数据 = {
+                "脚本": 脚本名称,
+                "总耗时秒": round(time.perf_counter() - self._开始时间, 4),
+                "阶段": {
+                    名称: {
+                        "次数": 统计["次数"],
+                        "总耗时秒": round(统计["总耗时秒"], 4),
+                        "最大耗时秒": round(统计["最大耗时秒"], 4),
+                    }
+                    for 名称, 统计 in self.阶段统计.items()
+                },
+                "计数": dict(self.计数器),
+            }
+            if 重置:
+                self._开始时间 = time.perf_counter()
+                self.阶段统计 = {}
+                self.计数器 = {}
+        if 内存:
+            汇总数据["内存"] = 内存
+        return 汇总数据
+
+    def 输出汇总(self, 脚本名称="", 重置=False):
+        """
+        打印JSON汇总（重置=True 时输出后清空，见 汇总），并按环境变量追加输出：
+        - METRICS_FILE：汇总JSON写入指定文件
+        - GITHUB_STEP_SUMMARY：追加Markdown表格到Actions运行摘要（METRICS_STEP_SUMMARY=0 时关闭）
+        """
+        汇总数据 = self.汇总(脚本名称, 重置)
+        汇总文本 = json.dumps(汇总数据, ensure_ascii=False)
+        print(f"\n📈 运行指标: {汇总文本}")
+
+        指标文件 = os.getenv("METRICS_FILE")
+        if 指标文件:
+            try:
+                with open(指标文件, "w", encoding="utf-8") as f:
+                    f.write(汇总文本)
+            except OSError as e:
+                print(f"⚠️ 写入指标文件失败: {str(e)}")
+
+        摘要文件 = os.getenv("GITHUB_STEP_SUMMARY")
+        if 摘要文件 and os.getenv("METRICS_STEP_SUMMARY", "1") != "0":
+            try:
+                with open(摘要文件, "a", encoding="utf-8") as f:
+                    f.write(转换为Markdown(汇总数据))
+            except OSError as e:
+                print(f"⚠️ 写入运行摘要失败: {str(e)}")
+        return 汇总数据
+
+def 转换为Markdown(汇总数据):
+    """将汇总字典转换为运行摘要用的Markdown"""
+    行列表 = [
+        f"### 📈 {汇总数据['脚本']} 运行指标（总耗时 {汇总数据['总耗时秒']:.2f}s）",
+        "",
+        "| 阶段 | 次数 | 总耗时(s) | 最大耗时(s) |",
+        "| --- | ---: | ---: | ---: |",
+    ]
+    for 名称, 统计 in 汇总数据["阶段"].items():
+        行列表.append(f"| {名称} | {统计['次数']} | {统计['总耗时秒']:.3f} | {统计['最大耗时秒']:.3f} |")
+    if 汇总数据["计数"]:
+        行列表 += ["", "| 计数项 | 值 |", "| --- | ---: |"]
+        for 名称, 值 in 汇总数据["计数"].items():
+            行列表.append(f"| {名称} | {值} |")
+    if 汇总数据.get("内存"):
+        行列表 += ["", "| 阶段 | RSS峰值(MB) | Python分配峰值(MB) |", "| --- | ---: | ---: |"]
+        for 名称, 峰值 in 汇总数据["内存"].items():
+            行列表.append(f"| {名称} | {峰值['RSS峰值MB']} | {峰值['Python分配峰值MB']} |")
+    行列表 += ["", "<details><summary>JSON</summary>", "", "```json",
+             json.dumps(汇总数据, ensure_ascii=False, indent=2), "```", "", "</details>", "", ""]
+    return "\n".join(行列表)
+
+# 进程级全局指标（多行模式下各线程共享）
+指标 = 运行指标()
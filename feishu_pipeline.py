@@ -0,0 +1,155 @@
+'''分阶段流水线（各阶段独立线程，阶段间有界队列：下游处理慢时上游阻塞，形成背压）'''
+import os
+import time
+import queue
+import threading
+from feishu_metrics import 指标
+from feishu_memory import 获取内存预算
+
+# 阶段间队列容量（可通过环境变量 PIPELINE_QUEUE_SIZE 覆盖，设置 MAX_MEMORY_MB 时固定为1）
+默认队列容量 = 4
+
+_结束标记 = object()
+
+class 流水线已停止(BaseException):
+    """其他阶段出错，本阶段停止（继承 BaseException，避免被阶段函数中的 except Exception 吞掉）"""
+
+def 获取队列容量():
+    # 内存上限模式下阶段间只保留1项，减少同时驻留的附件内容
+    if 获取内存预算() is not None:
+        return 1
+    try:
+        return max(1, int(os.getenv("PIPELINE_QUEUE_SIZE", 默认队列容量)))
+    except ValueError:
+        return 默认队列容量
+
+class 阶段输入:
+    """阶段的输入迭代器，从上游队列取数据；暂无数据() 可供分批写入时判断是否立即提交"""
+
+    def __init__(self, 队列, 停止事件):
+        self._队列 = 队列
+        self._停止事件 = 停止事件
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            if self._停止事件.is_set():
+                raise 流水线已停止()
+            try:
+                项 = self._队列.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if 项 is _结束标记:
+                raise StopIteration
+            return 项
+
+    def 暂无数据(self):
+        return self._队列.empty()
+
+def 分批(输入, 批大小, 展开=False):
+    """
+    按批输出：凑满 批大小 或上游暂时没有新数据时立即提交当前批，
+    下游快时小批及时写入，下游慢时自动攒成大批
+    :param 展开: 上游每项为列表（如一个工作表的全部数据行）时展开后计数
+    """
+    批 = []
+    for 项 in 输入:
+        if 展开:
+            批.extend(项)
+        else:
+            批.append(项)
+        if len(批) >= 批大小 or (isinstance(输入, 阶段输入) and 输入.暂无数据()):
+            yield 批
+            批 = []
+    if 批:
+        yield 批
+
+class 流水线:
+    """
+    用法：
+        结果 = 流水线("单重数据").阶段("下载", 下载函数).阶段("解析", 解析函数).运行(附件列表)
+    阶段函数接收上一阶段的输出迭代器，返回（yield）本阶段的输出；每个阶段一个线程，保持输入顺序
+    """
+
+    def __init__(self, 名称="流水线", 队列容量=None):
+        self.名称 = 名称
+        self.队列容量 = 队列容量 or 获取队列容量()
+        self._阶段列表 = []
+
+    def 阶段(self, 名称, 处理函数):
+        self._阶段列表.append((名称, 处理函数))
+        return self
+
+    def 运行(self, 输入列表):
+        """运行流水线，返回最后一个阶段的全部输出（列表）；任一阶段异常时停止全部阶段并抛出该异常"""
+        if not self._阶段列表:
+            return list(输入列表)
+        停止事件 = threading.Event()
+        队列列表 = [queue.Queue(maxsize=self.队列容量) for _ in range(len(self._阶段列表) + 1)]
+        错误列表 = []
+
+        def 放入(队列, 项):
+            # 队列满时阻塞（背压），同时响应停止事件，避免其他阶段出错后死锁
+            while not 停止事件.is_set():
+                try:
+                    队列.put(项, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+            raise 流水线已停止()
+
+        def 输入线程():
+            try:
+                for 项 in 输入列表:
+                    放入(队列列表[0], 项)
+                放入(队列列表[0], _结束标记)
+            except 流水线已停止:
+                pass
+
+        def 阶段线程(序号, 阶段名称, 处理函数):
+            耗时 = 0.0
+            try:
+                输出迭代器 = iter(处理函数(阶段输入(队列列表[序号], 停止事件)))
+                while True:
+                    开始 = time.perf_counter()
+                    try:
+                        项 = next(输出迭代器)
+                    except StopIteration:
+                        break
+                    finally:
+                        耗时 += time.perf_counter() - 开始
+                    放入(队列列表[序号 + 1], 项)
+                放入(队列列表[序号 + 1], _结束标记)
+            except 流水线已停止:
+                pass
+            except BaseException as e:
+                错误列表.append(e)
+                停止事件.set()
+            finally:
+                # 含等待上游数据的时间
+                指标.记录耗时(f"{self.名称}·{阶段名称}", 耗时)
+
+        线程列表 = [threading.Thread(target=输入线程, name=f"{self.名称}-输入", daemon=True)]
+        for 序号, (阶段名称, 处理函数) in enumerate(self._阶段列表):
+            线程列表.append(threading.Thread(
+                target=阶段线程, args=(序号, 阶段名称, 处理函数),
+                name=f"{self.名称}-{阶段名称}", daemon=True
+            ))
+        for 线程 in 线程列表:
+            线程.start()
+
+        结果 = []
+        try:
+            for 项 in 阶段输入(队列列表[-1], 停止事件):
+                结果.append(项)
+        except 流水线已停止:
+            pass
+        finally:
+            停止事件.set()
+            for 线程 in 线程列表:
+                线程.join()
+        if 错误列表:
+            raise 错误列表[0]
+        return 结果
@@ -0,0 +1,161 @@
+'''飞书脚本公共运行时（多行调度、客户端复用、记录缓存）'''
+import os
+import json
+import time
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from feishu_log import 获取SDK日志级别
+
+# 飞书开放平台地址（可通过环境变量 FEISHU_BASE_URL 指向本地模拟服务）
+飞书接口地址 = os.getenv("FEISHU_BASE_URL", "https://open.feishu.cn").rstrip("/")
+
+# 默认并发数（可通过环境变量 MAX_WORKERS 覆盖）
+默认并发数 = 4
+
+# tenant_access_token 有效期2小时，提前刷新
+令牌有效秒数 = 5400
+
+_客户端缓存 = {}
+_客户端锁 = threading.Lock()
+_令牌缓存 = {}
+_令牌锁 = threading.Lock()
+_进程池 = None
+_进程池锁 = threading.Lock()
+
+def 解析行ID列表(ROW_IDS=None, ROW_ID=None):
+    """
+    解析触发事件中的行ID列表
+    :param ROW_IDS: client_payload.ROW_IDS，支持JSON数组或逗号/换行分隔的字符串
+    :param ROW_ID: client_payload.ROW_ID，单行模式（兼容原有触发方式）
+    :return: 去重后保持原顺序的行ID列表
+    """
+    行ID列表 = []
+    ROW_IDS = (ROW_IDS or "").strip()
+    # toJson(null) 在工作流中会得到字符串 "null"
+    if ROW_IDS and ROW_IDS != "null":
+        try:
+            解析结果 = json.loads(ROW_IDS)
+        except ValueError:
+            解析结果 = ROW_IDS
+        if isinstance(解析结果, str):
+            解析结果 = 解析结果.replace("\n", ",").split(",")
+        if not isinstance(解析结果, list):
+            raise ValueError(f"❌ ROW_IDS格式错误，应为数组或逗号分隔字符串: {ROW_IDS}")
+        行ID列表.extend(str(行ID).strip() for 行ID in 解析结果)
+    if ROW_ID and str(ROW_ID).strip():
+        行ID列表.append(str(ROW_ID).strip())
+    return list(dict.fromkeys(行ID for 行ID in 行ID列表 if 行ID))
+
+def 获取并发数(行数=None):
+    """读取并发上限（环境变量 MAX_WORKERS），不超过待处理行数"""
+    try:
+        并发数 = int(os.getenv("MAX_WORKERS", 默认并发数))
+    except ValueError:
+        并发数 = 默认并发数
+    并发数 = max(1, 并发数)
+    if 行数:
+        并发数 = min(并发数, 行数)
+    return 并发数
+
+def 获取进程数():
+    """读取进程池大小（环境变量 MAX_PROCESSES），默认使用当前进程可用的全部CPU核"""
+    try:
+        可用核数 = len(os.sched_getaffinity(0))
+    except AttributeError:
+        可用核数 = os.cpu_count() or 1
+    try:
+        return max(1, int(os.getenv("MAX_PROCESSES", 可用核数)))
+    except ValueError:
+        return 可用核数
+
+def 获取进程池():
+    """
+    按需创建进程级共享的进程池（多行线程、常驻Worker共用）
+    使用 spawn 方式启动子进程，避免在多线程进程中 fork 导致死锁
+    """
+    global _进程池
+    with _进程池锁:
+        if _进程池 is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            _进程池 = ProcessPoolExecutor(
+                max_workers=获取进程数(),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _进程池
+
+def 获取飞书客户端(应用ID, 应用密匙):
+    """按应用ID复用飞书SDK客户端（线程安全，客户端内部自行管理令牌）"""
+    import lark_oapi as lark
+    with _客户端锁:
+        client = _客户端缓存.get(应用ID)
+        if client is None:
+            client = lark.Client.builder() \
+                .app_id(应用ID) \
+                .app_secret(应用密匙) \
+                .domain(飞书接口地址) \
+                .log_level(获取SDK日志级别()) \
+                .build()
+            _客户端缓存[应用ID] = client
+        return client
+
+def 获取缓存访问令牌(获取函数, 应用ID, 应用密匙):
+    """
+    带有效期的访问令牌缓存，常驻进程内多次调用只在过期后重新获取
+    :param 获取函数: 各脚本的 获取访问令牌(APP_ID, APP_SECRET)
+    :return: tenant_access_token
+    """
+    with _令牌锁:
+        缓存项 = _令牌缓存.get(应用ID)
+        if 缓存项 and 缓存项[1] > time.monotonic():
+            return 缓存项[0]
+        访问令牌 = 获取函数(应用ID, 应用密匙)
+        _令牌缓存[应用ID] = (访问令牌, time.monotonic() + 令牌有效秒数)
+        return 访问令牌
+
+def 建立记录缓存(记录列表):
+    """将多维表格记录列表转换为 {record_id: record} 索引，供多行共享"""
+    记录缓存 = {}
+    for record in 记录列表:
+        record_id = (record.get("record_id") or "").strip()
+        if record_id:
+            记录缓存[record_id] = record
+    return 记录缓存
+
+def 并发处理行(处理函数, 行ID列表, 最大并发=None):
+    """
+    使用有界线程池并发处理多行，单行失败不影响其他行
+    :param 处理函数: 接收行ID的函数，抛出异常即视为该行失败
+    :param 行ID列表: 待处理的行ID列表
+    :param 最大并发: 线程池大小，默认读取 MAX_WORKERS
+    :return: 按输入顺序排列的 [{"行ID", "成功", "错误"}, ...]
+    """
+    def 执行(行ID):
+        try:
+            处理函数(行ID)
+            return {"行ID": 行ID, "成功": True, "错误": ""}
+        except Exception as e:
+            print(f"❌ 行ID [{行ID}] 处理失败: {str(e)}")
+            print(f"📝 详细错误栈: {traceback.format_exc()}")
+            return {"行ID": 行ID, "成功": False, "错误": str(e)}
+
+    if not 行ID列表:
+        return []
+    并发数 = 最大并发 or 获取并发数(len(行ID列表))
+    if 并发数 == 1 or len(行ID列表) == 1:
+        return [执行(行ID) for 行ID in 行ID列表]
+    print(f"🚀 多行模式：共{len(行ID列表)}行，并发数{并发数}")
+    with ThreadPoolExecutor(max_workers=并发数) as executor:
+        return list(executor.map(执行, 行ID列表))
+
+def 输出处理结果(处理结果):
+    """打印每行的处理结果，返回失败行数"""
+    失败列表 = [结果 for 结果 in 处理结果 if not 结果["成功"]]
+    print(f"\n===== 多行处理结果：成功{len(处理结果) - len(失败列表)}行，失败{len(失败列表)}行 =====")
+    for 结果 in 处理结果:
+        if 结果["成功"]:
+            print(f"✅ 行ID [{结果['行ID']}] 处理成功")
+        else:
+            print(f"❌ 行ID [{结果['行ID']}] 处理失败: {结果['错误']}")
+    return len(失败列表)
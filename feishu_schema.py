@@ -0,0 +1,235 @@
+'''多维表格字段结构缓存与写入前本地校验（SCHEMA_VALIDATION=0 关闭，字段结构缓存有效期 SCHEMA_TTL_SECONDS，默认600秒）
+
+- 每个目标表的字段列表（app_table_field.list）在有效期内只获取一次，多行线程共享
+- 写入前按字段类型校验并转换取值：数字文本→数字、数字→文本、datetime/纯数字文本→毫秒时间戳
+  （日期文本不解析，需由调用方先转换为时间戳）、"是/否"→复选框等
+- 字段不存在、只读字段（公式、查找引用、创建时间等）或无法转换的取值记为该条记录的错误，
+  该记录不提交，批量新增中的其他记录照常提交
+- 出现缓存中不存在的字段时（可能是飞书中新加的字段），先重新获取一次该表的字段结构再判断，不必等缓存过期
+- 获取字段结构失败（如应用没有读取字段的权限）时提示一次，该表在有效期内跳过校验，按原样提交
+'''
+import os
+import math
+import time
+import difflib
+import threading
+from datetime import datetime
+from feishu_metrics import 指标
+
+默认缓存秒数 = 600
+
+# 字段类型（飞书多维表格 field.type）
+文本类型 = {1, 13, 15}          # 多行文本、电话号码、超链接
+数字类型 = 2                     # 数字（含货币、进度、评分）
+单选类型 = 3
+多选类型 = 4
+日期类型 = 5
+复选框类型 = 7
+只读类型 = {
+    19: "查找引用", 20: "公式", 1001: "创建时间", 1002: "最后更新时间",
+    1003: "创建人", 1004: "修改人", 1005: "自动编号",
+}
+
+# 复选框可识别的文本取值
+真值文本 = {"true", "1", "是", "y", "yes", "√", "✓"}
+假值文本 = {"false", "0", "否", "n", "no", ""}
+
+_结构缓存 = {}
+# _结构锁 只保护字典访问；获取字段结构的请求只持有该表的锁，不阻塞其他表与缓存命中
+_结构锁 = threading.Lock()
+_表锁 = {}
+
+class 字段取值错误(ValueError):
+    """取值无法转换为字段类型"""
+
+def 字段校验已启用():
+    return os.getenv("SCHEMA_VALIDATION", "1") not in ("", "0")
+
+def 获取缓存秒数():
+    try:
+        return max(0, int(os.getenv("SCHEMA_TTL_SECONDS", 默认缓存秒数)))
+    except ValueError:
+        return 默认缓存秒数
+
+@指标.计时("字段结构获取")
+def _拉取字段结构(client, app_token, table_id):
+    """分页获取表的全部字段，返回 {字段名: 字段类型}"""
+    from lark_oapi.api.bitable.v1 import ListAppTableFieldRequest
+    字段结构 = {}
+    page_token = None
+    while True:
+        构建器 = ListAppTableFieldRequest.builder().app_token(app_token).table_id(table_id).page_size(100)
+        if page_token:
+            构建器 = 构建器.page_token(page_token)
+        指标.计数("API调用次数")
+        response = client.bitable.v1.app_table_field.list(构建器.build())
+        if not response.success():
+            raise RuntimeError(f"代码: {response.code}, 消息: {response.msg}, 日志ID: {response.get_log_id()}")
+        for 字段 in response.data.items or []:
+            字段结构[字段.field_name] = 字段.type
+        if not response.data.has_more:
+            return 字段结构
+        page_token = response.data.page_token
+
+def _缓存可用(缓存项, 最早获取时间):
+    return bool(缓存项) and 缓存项[1] > time.monotonic() and (最早获取时间 is None or 缓存项[2] >= 最早获取时间)
+
+def 获取字段结构(client, app_token, table_id, 最早获取时间=None):
+    """
+    返回 {字段名: 字段类型}；获取失败时返回None（失败结果同样缓存，有效期内不重复请求）
+    :param 最早获取时间: time.monotonic() 时刻，缓存早于该时刻获取时重新获取（多个线程同时要求时只获取一次）
+    """
+    键 = (app_token, table_id)
+    with _结构锁:
+        缓存项 = _结构缓存.get(键)
+        if _缓存可用(缓存项, 最早获取时间):
+            return 缓存项[0]
+        表锁 = _表锁.setdefault(键, threading.Lock())
+    with 表锁:
+        # 等待期间其他线程可能已获取完成
+        with _结构锁:
+            缓存项 = _结构缓存.get(键)
+        if _缓存可用(缓存项, 最早获取时间):
+            return 缓存项[0]
+        try:
+            字段结构 = _拉取字段结构(client, app_token, table_id)
+            print(f"🧾 已获取字段结构: {table_id}（{len(字段结构)}个字段）")
+        except Exception as e:
+            print(f"⚠️ 获取字段结构失败，跳过本地校验: {table_id} - {str(e)[:200]}")
+            字段结构 = None
+        with _结构锁:
+            现在 = time.monotonic()
+            _结构缓存[键] = (字段结构, 现在 + 获取缓存秒数(), 现在)
+        return 字段结构
+
+def 清除字段结构缓存():
+    with _结构锁:
+        _结构缓存.clear()
+
+def _转换数字(值):
+    if isinstance(值, bool):
+        raise 字段取值错误(f"数字字段不接受布尔值 {值!r}")
+    if isinstance(值, str):
+        文本 = 值.strip().replace(",", "")
+        if not 文本:
+            return None
+        try:
+            值 = float(文本)
+        except ValueError:
+            raise 字段取值错误(f"无法转换为数字: {值!r}")
+    elif not isinstance(值, (int, float)):
+        raise 字段取值错误(f"数字字段不接受 {type(值).__name__}: {值!r}")
+    if isinstance(值, float):
+        if not math.isfinite(值):
+            raise 字段取值错误(f"数字字段不接受 {值!r}")
+        if 值.is_integer():
+            return int(值)
+    return 值
+
+def _转换日期(值):
+    if isinstance(值, datetime):
+        return int(值.timestamp() * 1000)
+    if isinstance(值, str):
+        文本 = 值.strip()
+        if not 文本:
+            return None
+        if not 文本.isdigit():
+            raise 字段取值错误(f"日期字段需要毫秒时间戳: {值!r}")
+        值 = int(文本)
+    if isinstance(值, bool) or not isinstance(值, (int, float)) or not math.isfinite(值):
+        raise 字段取值错误(f"日期字段需要毫秒时间戳: {值!r}")
+    return int(值)
+
+def _转换复选框(值):
+    if isinstance(值, bool):
+        return 值
+    文本 = str(值).strip().lower()
+    if 文本 in 真值文本:
+        return True
+    if 文本 in 假值文本:
+        return False
+    raise 字段取值错误(f"无法转换为复选框: {值!r}")
+
+def _转换文本(值):
+    # 富文本片段列表与超链接对象按原样提交
+    if isinstance(值, (str, list, dict)):
+        return 值
+    if isinstance(值, bool) or not isinstance(值, (int, float)):
+        raise 字段取值错误(f"文本字段不接受 {type(值).__name__}: {值!r}")
+    return str(值)
+
+def _转换单选(值):
+    if isinstance(值, str):
+        return 值
+    if isinstance(值, bool) or not isinstance(值, (int, float)):
+        raise 字段取值错误(f"单选字段不接受 {type(值).__name__}: {值!r}")
+    return str(值)
+
+def _转换多选(值):
+    if isinstance(值, str):
+        return [值] if 值 else []
+    if isinstance(值, (list, tuple)):
+        return [_转换单选(选项) for 选项 in 值]
+    raise 字段取值错误(f"多选字段不接受 {type(值).__name__}: {值!r}")
+
+转换函数 = {
+    数字类型: _转换数字,
+    单选类型: _转换单选,
+    多选类型: _转换多选,
+    日期类型: _转换日期,
+    复选框类型: _转换复选框,
+}
+转换函数.update({类型: _转换文本 for 类型 in 文本类型})
+
+def 校验字段(字段, 字段结构):
+    """
+    按字段结构校验并转换一条记录的字段
+    :return: (转换后的字段, 错误列表)；空值（None）按原样保留，用于清空字段
+    """
+    转换后 = {}
+    错误列表 = []
+    for 字段名, 值 in 字段.items():
+        类型 = 字段结构.get(字段名)
+        if 类型 is None:
+            相近 = difflib.get_close_matches(字段名, 字段结构, n=1, cutoff=0.75)
+            错误列表.append(f"字段不存在: {字段名}" + (f"（是否为 {相近[0]}）" if 相近 else ""))
+            continue
+        if 类型 in 只读类型:
+            错误列表.append(f"只读字段（{只读类型[类型]}）: {字段名}")
+            continue
+        if 值 is None or 类型 not in 转换函数:
+            # 人员、附件、关联等结构化字段不做转换
+            转换后[字段名] = 值
+            continue
+        try:
+            转换后[字段名] = 转换函数[类型](值)
+        except 字段取值错误 as e:
+            错误列表.append(f"{字段名}: {str(e)}")
+    return 转换后, 错误列表
+
+def 校验记录列表(client, app_token, table_id, 字段列表):
+    """
+    写入前校验一组记录，返回与输入对应的列表：通过的记录为转换后的字段，未通过为None
+    未启用校验或获取字段结构失败时原样返回
+    """
+    if not 字段列表 or not 字段校验已启用():
+        return list(字段列表)
+    开始时间 = time.monotonic()
+    字段结构 = 获取字段结构(client, app_token, table_id)
+    if 字段结构 is None:
+        return list(字段列表)
+    if any(字段名 not in 字段结构 for 字段 in 字段列表 for 字段名 in 字段):
+        # 缓存中没有的字段可能是新加的：拒绝前重新获取一次（本次调用开始后已有其他线程获取过则直接使用）
+        字段结构 = 获取字段结构(client, app_token, table_id, 最早获取时间=开始时间)
+        if 字段结构 is None:
+            return list(字段列表)
+    结果 = []
+    for 字段 in 字段列表:
+        转换后, 错误列表 = 校验字段(字段, 字段结构)
+        if 错误列表:
+            print(f"❌ 记录未通过字段校验，不提交: {'；'.join(错误列表)} | {字段}")
+            指标.计数("校验拒绝记录数")
+            结果.append(None)
+        else:
+            结果.append(转换后)
+    return 结果
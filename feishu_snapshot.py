@@ -0,0 +1,232 @@
+'''解析结果快照（Arrow IPC 列式存储，按附件 file_token 缓存已解析的工作表，可选依赖 pyarrow）
+
+设置环境变量 SNAPSHOT_DIR 后启用：
+- 解析附件前先按 file_token 查找快照，命中则内存映射读取，跳过下载与xlsx解析
+- 解析成功后写入快照，供重跑、排查问题和离线基准测试使用
+目录结构：{SNAPSHOT_DIR}/{file_token}/{解析器}/meta.json + 每个工作表一个 .arrow 文件
+不同脚本对单元格的处理不同（空值填充、数字转字符串等），快照按解析器区分
+'''
+import os
+import re
+import json
+import shutil
+import hashlib
+import tempfile
+from datetime import datetime, date, time
+from urllib.parse import urlparse, parse_qs
+from feishu_metrics import 指标
+
+快照版本 = 1
+
+# 单元格类型 → dense union 子数组编号（判断顺序：bool先于int，Timestamp先于datetime，datetime先于date）
+_类型字符串, _类型布尔, _类型整数, _类型浮点, _类型时间, _类型Timestamp, _类型空值, _类型日期, _类型时刻, _类型NaT = range(10)
+
+_pyarrow提示已输出 = False
+
+class 快照不支持的值(Exception):
+    """工作表中含有无法无损写入快照的单元格"""
+
+def 快照目录():
+    """返回快照目录（环境变量 SNAPSHOT_DIR），未设置时返回None"""
+    目录 = (os.getenv("SNAPSHOT_DIR") or "").strip()
+    return 目录 or None
+
+def _导入pyarrow():
+    global _pyarrow提示已输出
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        return pyarrow
+    except ImportError:
+        if not _pyarrow提示已输出:
+            print("⚠️ 已设置 SNAPSHOT_DIR 但未安装 pyarrow，快照功能不可用（pip install pyarrow）")
+            _pyarrow提示已输出 = True
+        return None
+
+def 解析文件令牌(文件链接):
+    """
+    从附件链接中解析 file_token：
+    - .../medias/{file_token}/download
+    - ...?file_tokens={file_token}
+    无法解析时用链接的哈希代替
+    """
+    解析结果 = urlparse(文件链接 or "")
+    匹配 = re.search(r"/medias/([^/]+)/download", 解析结果.path)
+    if 匹配:
+        return 匹配.group(1)
+    令牌列表 = parse_qs(解析结果.query).get("file_tokens")
+    if 令牌列表 and 令牌列表[0]:
+        return 令牌列表[0].split(",")[0]
+    return "url_" + hashlib.sha1((文件链接 or "").encode("utf-8")).hexdigest()[:20]
+
+def _快照路径(文件链接, 解析器):
+    目录 = 快照目录()
+    if not 目录:
+        return None
+    return os.path.join(目录, 解析文件令牌(文件链接), 解析器)
+
+def _单元格类型(pd, 单元格):
+    if 单元格 is None:
+        return _类型空值
+    if isinstance(单元格, str):
+        return _类型字符串
+    if isinstance(单元格, bool):
+        return _类型布尔
+    if isinstance(单元格, int):
+        if not -2 ** 63 <= 单元格 < 2 ** 63:
+            raise 快照不支持的值(f"整数超出int64范围: {单元格}")
+        return _类型整数
+    if isinstance(单元格, float):
+        return _类型浮点
+    if 单元格 is pd.NaT:
+        # pandas 对日期列 fillna("") 后仍可能保留 NaT
+        return _类型NaT
+    if isinstance(单元格, pd.Timestamp):
+        if 单元格.tzinfo is not None:
+            raise 快照不支持的值(f"不支持带时区的时间: {单元格!r}")
+        return _类型Timestamp
+    if isinstance(单元格, datetime):
+        if 单元格.tzinfo is not None:
+            raise 快照不支持的值(f"不支持带时区的时间: {单元格!r}")
+        return _类型时间
+    if isinstance(单元格, date):
+        return _类型日期
+    if isinstance(单元格, time):
+        if 单元格.tzinfo is not None:
+            raise 快照不支持的值(f"不支持带时区的时刻: {单元格!r}")
+        return _类型时刻
+    raise 快照不支持的值(f"不支持的单元格类型: {type(单元格).__name__}")
+
+def _构建列(pa, 单元格列表):
+    """把一列任意类型的单元格编码为 dense union 数组（保留原始Python类型）"""
+    import pandas as pd
+    子列表 = [[] for _ in range(10)]
+    类型编码 = []
+    偏移 = []
+    for 单元格 in 单元格列表:
+        类型 = _单元格类型(pd, 单元格)
+        类型编码.append(类型)
+        偏移.append(len(子列表[类型]))
+        子列表[类型].append(单元格.value if 类型 == _类型Timestamp else 单元格)
+    子数组 = [
+        pa.array(子列表[_类型字符串], pa.string()),
+        pa.array(子列表[_类型布尔], pa.bool_()),
+        pa.array(子列表[_类型整数], pa.int64()),
+        pa.array(子列表[_类型浮点], pa.float64()),
+        pa.array(子列表[_类型时间], pa.timestamp("us")),
+        pa.array(子列表[_类型Timestamp], pa.int64()),  # pandas.Timestamp 存纳秒整数，读取时还原为Timestamp
+        pa.nulls(len(子列表[_类型空值])),
+        pa.array(子列表[_类型日期], pa.date32()),
+        pa.array(子列表[_类型时刻], pa.time64("us")),
+        pa.nulls(len(子列表[_类型NaT])),
+    ]
+    return pa.UnionArray.from_dense(
+        pa.array(类型编码, pa.int8()),
+        pa.array(偏移, pa.int32()),
+        子数组,
+        ["str", "bool", "int", "float", "datetime", "pd_timestamp", "null", "date", "time", "nat"],
+    )
+
+def _还原列(列数组):
+    """dense union 数组 → Python值列表"""
+    import pandas as pd
+    if hasattr(列数组, "combine_chunks"):
+        列数组 = 列数组.combine_chunks()
+    子值列表 = [列数组.field(序号).to_pylist() for 序号 in range(列数组.type.num_fields)]
+    子值列表[_类型Timestamp] = [pd.Timestamp(值) for 值 in 子值列表[_类型Timestamp]]
+    子值列表[_类型NaT] = [pd.NaT] * len(子值列表[_类型NaT])
+    类型编码 = 列数组.type_codes.to_numpy(zero_copy_only=False).tolist()
+    偏移 = 列数组.offsets.to_numpy(zero_copy_only=False).tolist()
+    return [子值列表[类型][位置] for 类型, 位置 in zip(类型编码, 偏移)]
+
+def _写入工作表(pa, 路径, 二维列表):
+    列数 = max((len(一行内容) for 一行内容 in 二维列表), default=0)
+    列数组 = [
+        _构建列(pa, [一行内容[列] if 列 < len(一行内容) else None for 一行内容 in 二维列表])
+        for 列 in range(列数)
+    ]
+    表 = pa.table(
+        [pa.array([len(一行内容) for 一行内容 in 二维列表], pa.int32())] + 列数组,
+        names=["_行长度"] + [f"c{列}" for 列 in range(列数)],
+    )
+    with pa.OSFile(路径, "wb") as 输出:
+        with pa.ipc.new_file(输出, 表.schema) as 写入器:
+            写入器.write_table(表)
+    return 列数
+
+def _读取工作表(pa, 路径):
+    with pa.memory_map(路径, "r") as 源:
+        表 = pa.ipc.open_file(源).read_all()
+    行长度列表 = 表.column("_行长度").to_pylist()
+    列值列表 = [_还原列(表.column(名称)) for 名称 in 表.column_names[1:]]
+    return [[列值列表[列][行] for 列 in range(行长度)] for 行, 行长度 in enumerate(行长度列表)]
+
+def 读取快照(文件链接, 解析器):
+    """
+    按附件链接中的 file_token 读取快照
+    :param 解析器: 解析器标识（如 "QSA"/"table"/"bitable"）
+    :return: {工作表名: 二维列表}，未启用/未命中/读取失败时返回None
+    """
+    路径 = _快照路径(文件链接, 解析器)
+    if not 路径 or not os.path.exists(os.path.join(路径, "meta.json")):
+        return None
+    pa = _导入pyarrow()
+    if pa is None:
+        return None
+    try:
+        with 指标.阶段("快照读取"):
+            with open(os.path.join(路径, "meta.json"), "r", encoding="utf-8") as f:
+                元数据 = json.load(f)
+            if 元数据.get("版本") != 快照版本:
+                return None
+            工作表字典 = {
+                工作表["名称"]: _读取工作表(pa, os.path.join(路径, 工作表["文件"]))
+                for 工作表 in 元数据["工作表"]
+            }
+        指标.计数("快照命中")
+        print(f"✅ 命中解析快照: {元数据.get('文件名')}（file_token={元数据.get('file_token')}，共{len(工作表字典)}个Sheet）")
+        return 工作表字典
+    except Exception as e:
+        print(f"⚠️ 读取解析快照失败，改为重新下载解析: {str(e)}")
+        return None
+
+def 保存快照(文件链接, 文件名称, 解析器, 工作表字典):
+    """将解析结果写入快照（先写临时目录再替换，避免并发读取到不完整的快照），失败不影响主流程"""
+    路径 = _快照路径(文件链接, 解析器)
+    if not 路径 or not 工作表字典:
+        return False
+    pa = _导入pyarrow()
+    if pa is None:
+        return False
+    临时路径 = None
+    try:
+        with 指标.阶段("快照写入"):
+            os.makedirs(os.path.dirname(路径), exist_ok=True)
+            临时路径 = tempfile.mkdtemp(prefix=".tmp_", dir=os.path.dirname(路径))
+            工作表元数据 = []
+            for 序号, (工作表名称, 二维列表) in enumerate(工作表字典.items()):
+                文件 = f"sheet{序号}.arrow"
+                列数 = _写入工作表(pa, os.path.join(临时路径, 文件), 二维列表)
+                工作表元数据.append({"名称": 工作表名称, "文件": 文件, "行数": len(二维列表), "列数": 列数})
+            with open(os.path.join(临时路径, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({
+                    "版本": 快照版本,
+                    "file_token": 解析文件令牌(文件链接),
+                    "文件名": 文件名称,
+                    "解析器": 解析器,
+                    "创建时间": datetime.now().isoformat(),
+                    "工作表": 工作表元数据,
+                }, f, ensure_ascii=False, indent=2)
+            if os.path.exists(路径):
+                shutil.rmtree(路径, ignore_errors=True)
+            os.replace(临时路径, 路径)
+            临时路径 = None
+        指标.计数("快照写入数")
+        print(f"💾 已写入解析快照: {路径}")
+        return True
+    except Exception as e:
+        print(f"⚠️ 写入解析快照失败（不影响处理）: {str(e)}")
+        return False
+    finally:
+        if 临时路径:
+            shutil.rmtree(临时路径, ignore_errors=True)
@@ -1,26 +1,40 @@
 '''飞书多维表格需要的库'''
 import os
 import json
-from datetime import datetime
-import lark_oapi as lark
-from lark_oapi.api.bitable.v1 import *
-from lark_oapi.api.drive.v1 import *
-import requests
-import pyexcel
-import pandas as pd
-import io
+import logging
 import traceback
+from collections import deque
+from concurrent.futures import Future
+from feishu_metrics import 指标
+from feishu_log import 获取日志器, 逐行日志
+from feishu_snapshot import 读取快照, 保存快照
+from feishu_dates import 单重转换时间戳 as 转换时间戳, 单重转换时间戳列 as 转换时间戳列
+from feishu_pipeline import 流水线, 分批
+from feishu_writer import 同步写入, 批量写入上限
+from feishu_download import 下载为字节
+from feishu_memory import 溢出字典
+from feishu_excel import 打开工作簿, 识别表格格式, 选择引擎
+from feishu_upload import 上传素材, 上传失败
+from feishu_runtime import 飞书接口地址, 获取飞书客户端, 解析行ID列表, 建立记录缓存, 并发处理行, 输出处理结果, 获取进程数, 获取进程池
+
+日志 = 获取日志器("table")
+
+# 工作表数达到该值才启用进程池（子进程启动有固定开销，少量工作表顺序处理更快）
+进程池工作表阈值 = 8
 
 '''飞书多维表格函数'''
+@指标.计时("获取令牌")
 def 获取访问令牌(APP_ID, APP_SECRET):
     """获取访问令牌"""
-    url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal/"
+    import requests
+    url = f"{飞书接口地址}/open-apis/auth/v3/tenant_access_token/internal/"
     headers = {"Content-Type": "application/json"}
     data = {
         "app_id": APP_ID,
         "app_secret": APP_SECRET
     }
     try:
+        指标.计数("API调用次数")
         response = requests.post(url, headers=headers, json=data, timeout=10)
         response.raise_for_status()
         response_data = response.json()
@@ -34,6 +48,7 @@ def 获取访问令牌(APP_ID, APP_SECRET):
 
 def 飞书上传素材(文件路径, DWBG_TOKEN, 应用ID, 应用密匙):
     """使用飞书官方SDK上传文件到多维表格（本脚本未使用，保留兼容）"""
+    # 超过20MB的文件自动改用分片上传（feishu_upload）
     if not os.path.exists(文件路径):
         print(f"错误：文件不存在 - {文件路径}")
         return None
@@ -43,51 +58,23 @@ def 飞书上传素材(文件路径, DWBG_TOKEN, 应用ID, 应用密匙):
     file_name = os.path.basename(文件路径)
     file_size = os.path.getsize(文件路径)
     print(f"准备上传文件: {file_name} (大小: {file_size} bytes)")
-    if file_size > 20 * 1024 * 1024:
-        print(f"错误：文件过大，超过20MB限制")
-        return None
-    client = lark.Client.builder() \
-        .app_id(应用ID) \
-        .app_secret(应用密匙) \
-        .log_level(lark.LogLevel.DEBUG) \
-        .build()
     try:
-        with open(文件路径, "rb") as file:
-            request: UploadAllMediaRequest = UploadAllMediaRequest.builder() \
-                .request_body(UploadAllMediaRequestBody.builder()
-                              .file_name(file_name)
-                              .parent_type("bitable_file")
-                              .parent_node(DWBG_TOKEN)
-                              .size(str(file_size))
-                              .file(file)
-                              .build()) \
-                .build()
-            response: UploadAllMediaResponse = client.drive.v1.media.upload_all(request)
-            if not response.success():
-                error_msg = f"文件上传失败 - 代码: {response.code}, 消息: {response.msg}, 日志ID: {response.get_log_id()}"
-                print(error_msg)
-                if response.raw and response.raw.content:
-                    try:
-                        resp_content = json.loads(response.raw.content)
-                        print("详细响应内容:", json.dumps(resp_content, indent=4, ensure_ascii=False))
-                    except:
-                        print("响应内容解析失败:", response.raw.content)
-                return None
-            else:
-                print("文件上传成功!")
-                print("返回数据:", lark.JSON.marshal(response.data, indent=4))
-                return response.data.file_token
+        file_token = 上传素材(应用ID, 应用密匙, 文件路径, DWBG_TOKEN)
+    except 上传失败 as e:
+        print(str(e))
+        return None
     except Exception as e:
         print(f"上传过程发生错误: {str(e)}")
         return None
+    print(f"文件上传成功! file_token: {file_token}")
+    return file_token
 
+@指标.计时("记录写入")
 def 新增飞书表格(应用ID, 应用密匙, DWBG_TOKEN, DWBG_TABLE_ID, 上传数据结构):
     """新增飞书表格记录"""
-    client = lark.Client.builder() \
-        .app_id(应用ID) \
-        .app_secret(应用密匙) \
-        .log_level(lark.LogLevel.DEBUG) \
-        .build()
+    import lark_oapi as lark
+    from lark_oapi.api.bitable.v1 import AppTableRecord, CreateAppTableRecordRequest, CreateAppTableRecordResponse
+    client = 获取飞书客户端(应用ID, 应用密匙)
     request: CreateAppTableRecordRequest = CreateAppTableRecordRequest.builder() \
         .app_token(DWBG_TOKEN) \
         .table_id(DWBG_TABLE_ID) \
@@ -95,6 +82,7 @@ def 新增飞书表格(应用ID, 应用密匙, DWBG_TOKEN, DWBG_TABLE_ID, 上传
                       .fields(上传数据结构)
                       .build()) \
         .build()
+    指标.计数("API调用次数")
     response: CreateAppTableRecordResponse = client.bitable.v1.app_table_record.create(request)
     if not response.success():
         error_info = f"新增记录失败 - 代码: {response.code}, 消息: {response.msg}, 日志ID: {response.get_log_id()}"
@@ -107,16 +95,20 @@ def 新增飞书表格(应用ID, 应用密匙, DWBG_TOKEN, DWBG_TABLE_ID, 上传
         print(error_info)
         return False
     else:
-        print("新增记录成功:", lark.JSON.marshal(response.data, indent=4))
+        日志.debug("新增记录成功: " + lark.JSON.marshal(response.data, indent=4))
+        指标.计数("写入记录数")
         return True
 
+@指标.计时("记录写入")
+def 批量新增飞书表格(应用ID, 应用密匙, DWBG_TOKEN, DWBG_TABLE_ID, 上传数据结构列表):
+    """批量新增飞书表格记录（每次最多500条），返回与输入对应的成功标记列表；某批失败时该批逐条并发新增"""
+    return 同步写入(应用ID, 应用密匙, [("批量新增", DWBG_TOKEN, DWBG_TABLE_ID, 上传数据结构列表)])[0]
+
+@指标.计时("记录写入")
 def 更新飞书表格(应用ID, 应用密匙, DWBG_TOKEN, DWBG_TABLE_ID, 行ID, 上传数据结构):
     """更新飞书表格记录（本脚本未使用，保留兼容）"""
-    client = lark.Client.builder() \
-        .app_id(应用ID) \
-        .app_secret(应用密匙) \
-        .log_level(lark.LogLevel.DEBUG) \
-        .build()
+    from lark_oapi.api.bitable.v1 import AppTableRecord, UpdateAppTableRecordRequest, UpdateAppTableRecordResponse
+    client = 获取飞书客户端(应用ID, 应用密匙)
     request: UpdateAppTableRecordRequest = UpdateAppTableRecordRequest.builder() \
         .app_token(DWBG_TOKEN) \
         .table_id(DWBG_TABLE_ID) \
@@ -125,6 +117,7 @@ def 更新飞书表格(应用ID, 应用密匙, DWBG_TOKEN, DWBG_TABLE_ID, 行ID,
                       .fields(上传数据结构)
                       .build()) \
         .build()
+    指标.计数("API调用次数")
     response: UpdateAppTableRecordResponse = client.bitable.v1.app_table_record.update(request)
     if not response.success():
         error_info = f"更新记录失败 - 代码: {response.code}, 消息: {response.msg}, 日志ID: {response.get_log_id()}"
@@ -138,15 +131,18 @@ def 更新飞书表格(应用ID, 应用密匙, DWBG_TOKEN, DWBG_TABLE_ID, 行ID,
         return False
     else:
         print("更新记录成功")
+        指标.计数("写入记录数")
         return True
 
+@指标.计时("记录查询")
 def 获取多维表格内容(tenant_access_token, app_token, table_id):
     """获取多维表格所有记录"""
+    import requests
     all_records = []
     page_token = ''
     has_more = True
     while has_more:
-        url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{app_token}/tables/{table_id}/records/search"
+        url = f"{飞书接口地址}/open-apis/bitable/v1/apps/{app_token}/tables/{table_id}/records/search"
         payload = json.dumps({
             "page_token": page_token,
             "page_size": 100
@@ -156,6 +152,7 @@ def 获取多维表格内容(tenant_access_token, app_token, table_id):
             'Authorization': f'Bearer {tenant_access_token}'
         }
         try:
+            指标.计数("API调用次数")
             response = requests.post(url, headers=headers, data=payload, timeout=10)
             response.raise_for_status()
             result = response.json()
@@ -179,19 +176,23 @@ def 获取多维表格内容(tenant_access_token, app_token, table_id):
             raise Exception(f"获取表格内容失败: {str(e)}")
     return all_records
 
-def 获取多维表格中附件的链接(访问令牌, DWBG_TOKEN, DWBG_TABLE_ID, 行ID, 附件字段名="附件"):
-    """提取多维表格指定行的附件链接"""
+@指标.计时("记录查询")
+def 获取多维表格中附件的链接(访问令牌, DWBG_TOKEN, DWBG_TABLE_ID, 行ID, 附件字段名="附件", 记录缓存=None):
+    """提取多维表格指定行的附件链接（传入记录缓存时直接查缓存，不再分页请求）"""
+    import requests
     if not 行ID:
         raise ValueError("❌ 行ID不能为空，请传入目标行的record_id")
-    url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{DWBG_TOKEN}/tables/{DWBG_TABLE_ID}/records/search"
+    if 记录缓存 is not None:
+        return 提取记录附件(记录缓存.get(str(行ID)), 行ID, 附件字段名)
+    url = f"{飞书接口地址}/open-apis/bitable/v1/apps/{DWBG_TOKEN}/tables/{DWBG_TABLE_ID}/records/search"
     headers = {
         "Authorization": f"Bearer {访问令牌}",
         "Content-Type": "application/json"
     }
     request_data = {"page_size": 100, "page_token": ""}
-    all_attachments = []
     while True:
         try:
+            指标.计数("API调用次数")
             resp = requests.post(url, headers=headers, json=request_data, timeout=15)
             resp.raise_for_status()
             result = resp.json()
@@ -205,86 +206,112 @@ def 获取多维表格中附件的链接(访问令牌, DWBG_TOKEN, DWBG_TABLE_ID
                 target_record = record
                 break
         if target_record:
-            fields = target_record.get("fields", {})
-            attachments = fields.get(附件字段名, [])
-            if not attachments:
-                raise Exception(f"❌ 行ID [{行ID}] 的「{附件字段名}」列无附件")
-            for att in attachments:
-                att_url = att.get("url")
-                att_name = att.get("name", "")
-                if att_url and att_name.endswith((".xlsx", ".xls")):
-                    print(f"✅ 行ID [{行ID}] 提取到附件: {att_name} | URL: {att_url[:50]}...")
-                    all_attachments.append((att_url, att_name))
-            break
+            return 提取记录附件(target_record, 行ID, 附件字段名)
         if not result["data"].get("has_more"):
             break
         request_data["page_token"] = result["data"]["page_token"]
+    return 提取记录附件(None, 行ID, 附件字段名)
+
+def 提取记录附件(target_record, 行ID, 附件字段名):
+    """从单条记录中筛选Excel附件，返回[(url, name), ...]"""
+    all_attachments = []
+    if target_record:
+        fields = target_record.get("fields", {})
+        attachments = fields.get(附件字段名, [])
+        if not attachments:
+            raise Exception(f"❌ 行ID [{行ID}] 的「{附件字段名}」列无附件")
+        for att in attachments:
+            att_url = att.get("url")
+            att_name = att.get("name", "")
+            if att_url and att_name.endswith((".xlsx", ".xls")):
+                print(f"✅ 行ID [{行ID}] 提取到附件: {att_name} | URL: {att_url[:50]}...")
+                all_attachments.append((att_url, att_name))
     if not all_attachments:
         raise Exception(f"❌ 行ID [{行ID}] 的「{附件字段名}」列未找到Excel附件")
     return all_attachments
 
+def 下载附件(访问令牌, 文件临时链接, 文件名称):
+    """下载附件内容（大文件分段并发下载、断点续传），失败返回None"""
+    try:
+        with 指标.阶段("附件下载"):
+            文件内容 = 下载为字节(访问令牌, 文件临时链接)
+        print(f"✅ 附件下载完成: {文件名称}（{len(文件内容)} bytes）")
+        return 文件内容
+    except Exception as e:
+        print(f"❌ 下载附件失败: {str(e)}")
+        return None
+
+@指标.计时("ZIP修复")
+def 清理Excel中的id属性(文件内容):
+    """删除工作表XML中所有元素的id属性（部分导出工具会写入，openpyxl无法读取），返回修复后的xlsx字节"""
+    import io
+    import zipfile
+    import xml.etree.ElementTree as ET
+    输出 = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(文件内容), 'r') as zip_in:
+        with zipfile.ZipFile(输出, 'w') as zip_out:
+            for item in zip_in.infolist():
+                data = zip_in.read(item.filename)
+                if item.filename.startswith('xl/worksheets/') and item.filename.endswith('.xml'):
+                    root = ET.fromstring(data)
+                    def remove_id_attr(element):
+                        if 'id' in element.attrib:
+                            del element.attrib['id']
+                        for child in element:
+                            remove_id_attr(child)
+                    remove_id_attr(root)
+                    data = ET.tostring(root, encoding='utf-8')
+                zip_out.writestr(item, data)
+    return 输出.getvalue()
+
+def 逐表解析附件(文件内容, 文件名称):
+    """逐个工作表解析（openpyxl 解析前先修复id属性），依次产出 (工作表名称, 二维列表, 工作表总数)"""
+    import numpy as np
+    引擎 = 选择引擎(识别表格格式(文件内容))
+    if 引擎 == "openpyxl":
+        文件内容 = 清理Excel中的id属性(文件内容)
+        print(f"✅ 已清理Excel中的id属性: {文件名称}")
+    with 打开工作簿(文件内容, 文件名称, 引擎) as excel_file:
+        del 文件内容
+        工作表总数 = len(excel_file.工作表名称)
+        for sheet_name in excel_file.工作表名称:
+            with 指标.阶段("表格解析"):
+                df = excel_file.读取(sheet_name, header=None).fillna("")
+                原始行 = df.values.tolist()
+                # 尽早释放DataFrame，同一时刻只驻留一个工作表的中间数据
+                del df
+                二维列表 = [
+                    [
+                        str(cell) if isinstance(cell, (np.integer, np.floating, np.bool_))
+                        else cell for cell in row
+                    ] for row in 原始行
+                ]
+                del 原始行
+            指标.计数("解析Sheet数")
+            yield sheet_name, 二维列表, 工作表总数
+
 def 在线解析表格为二维数据(访问令牌, 文件临时链接, 文件名称):
     """在线解析Excel表格为二维数据"""
     if not all([访问令牌, 文件临时链接, 文件名称]):
         print("❌ 解析参数为空")
         return None
-    import tempfile
-    import zipfile
-    import xml.etree.ElementTree as ET
-    import shutil
+    # 已有解析快照（SNAPSHOT_DIR）时直接读取，跳过下载与解析
+    快照 = 读取快照(文件临时链接, "table")
+    if 快照 is not None:
+        return 快照
+    文件内容 = 下载附件(访问令牌, 文件临时链接, 文件名称)
+    if 文件内容 is None:
+        return None
     try:
-        temp_dir = tempfile.mkdtemp()
-        raw_file = os.path.join(temp_dir, 文件名称)
-        headers = {"Authorization": f"Bearer {访问令牌}"}
-        resp = requests.get(文件临时链接, headers=headers, timeout=300)
-        resp.raise_for_status()
-        with open(raw_file, 'wb') as f:
-            f.write(resp.content)
-        print(f"✅ 原始文件保存: {raw_file}")
-        fixed_file = os.path.join(temp_dir, f"fixed_{文件名称}")
-        with zipfile.ZipFile(raw_file, 'r') as zip_in:
-            with zipfile.ZipFile(fixed_file, 'w') as zip_out:
-                for item in zip_in.infolist():
-                    data = zip_in.read(item.filename)
-                    if item.filename.startswith('xl/worksheets/') and item.filename.endswith('.xml'):
-                        root = ET.fromstring(data)
-                        def remove_id_attr(element):
-                            if 'id' in element.attrib:
-                                del element.attrib['id']
-                            for child in element:
-                                remove_id_attr(child)
-                        remove_id_attr(root)
-                        data = ET.tostring(root, encoding='utf-8')
-                    zip_out.writestr(item, data)
-        print(f"✅ 已清理Excel中的id属性，修复后文件: {fixed_file}")
-        工作表字典 = {}
-        df_dict = pd.read_excel(
-            fixed_file,
-            engine="openpyxl",
-            sheet_name=None,
-            header=None
+        工作表字典 = 溢出字典(
+            (sheet_name, 二维列表) for sheet_name, 二维列表, _ in 逐表解析附件(文件内容, 文件名称)
         )
-        import numpy as np
-        for sheet_name, df in df_dict.items():
-            df = df.fillna("")
-            二维列表 = df.values.tolist()
-            二维列表 = [
-                [
-                    str(cell) if isinstance(cell, (np.integer, np.floating, np.bool_))
-                    else cell for cell in row
-                ] for row in 二维列表
-            ]
-            工作表字典[sheet_name] = 二维列表
         print(f"✅ 解析完成，共{len(工作表字典)}个Sheet")
-        shutil.rmtree(temp_dir)
+        保存快照(文件临时链接, 文件名称, "table", 工作表字典)
         return 工作表字典
     except Exception as e:
         print(f"❌ 解析表格失败: {str(e)}")
         print(f"📝 详细错误: {traceback.format_exc()}")
-        try:
-            shutil.rmtree(temp_dir)
-        except:
-            pass
         return None
 
 def 根据单元格内容提取行数列数(工作表内容, 搜索值: str):
@@ -295,8 +322,29 @@ def 根据单元格内容提取行数列数(工作表内容, 搜索值: str):
                 return 行数, 列数
     return None, None
 
+def 转换为对象数组(单元格列表):
+    """一维object数组（逐元素赋值，避免numpy把字符串/时间等单元格展开或转换类型）"""
+    import numpy as np
+    数组 = np.empty(len(单元格列表), dtype=object)
+    数组[:] = 单元格列表
+    return 数组
+
+def 有效单重掩码(数据块):
+    """
+    二维object数据块 → 有效单重布尔掩码：非0整数视为有效单重（与逐格判断 `单重 and isinstance(单重, int)` 一致）
+    先按单元格类型得到整数掩码，再把整数单元格整块转换为float64数值块，掩码 = 整数 & 数值非0
+    """
+    import numpy as np
+    类型 = np.fromiter(map(type, 数据块.ravel()), dtype=object, count=数据块.size).reshape(数据块.shape)
+    整数掩码 = (类型 == int) | (类型 == bool)
+    数值块 = np.zeros(数据块.shape)
+    数值块[整数掩码] = 数据块[整数掩码].astype(np.float64)
+    return 整数掩码 & (数值块 != 0)
+
+@指标.计时("单重提取")
 def 获取单重数据(工作表内容, 参数1):
     """提取单重数据"""
+    import numpy as np
     数据开始行数, 数据开始列数 = 根据单元格内容提取行数列数(工作表内容, "第1个")
     if not 数据开始行数:
         return None, None, None, None, None, None
@@ -336,132 +384,258 @@ def 获取单重数据(工作表内容, 参数1):
             return None, None, None, None, None, None
         if not 标准上限:
             标准上限 = 9999
+        # 第8行（索引7）第7~31列为各组检测时间
         单重数据时间列表 = []
-        for 行数, 一行内容 in enumerate(工作表内容):
-            if 行数 == 7:
-                for 列数, 列元素 in enumerate(一行内容):
-                    if 7 <= 列数 <= 31 and 列元素:
-                        单重数据时间列表.append(列元素)
+        if len(工作表内容) > 7:
+            时间行 = 转换为对象数组(工作表内容[7][7:32])
+            单重数据时间列表 = 时间行[np.frompyfunc(bool, 1, 1)(时间行).astype(bool)].tolist()
         if not isinstance(每组数列, int):
             return None, None, None, None, None, None
-        数据范围 = [数据开始行数, 3, 数据开始行数 + 每组数列, 30]
-        列数范围 = list(range(2, 30))
-        行数范围 = list(range(int(数据范围[0]), int(数据范围[2])))
-        单重数据列表_二维数组 = []
-        for 列数 in 列数范围:
-            每组列表 = []
-            for 片数, 行数 in enumerate(行数范围):
-                单重 = 工作表内容[行数][列数]
-                if 单重 and isinstance(单重, int):
-                    每组列表.append(单重)
-            if 每组列表:
-                单重数据列表_二维数组.append(每组列表.copy())
+        # 一次切出 数据开始行数..+每组数列 行、第2~29列的数据块，按列筛选非0整数
+        数据行列表 = 工作表内容[数据开始行数:数据开始行数 + 每组数列] if 每组数列 > 0 else []
+        if len(数据行列表) < 每组数列 or any(len(一行内容) < 30 for 一行内容 in 数据行列表):
+            raise IndexError("list index out of range")
+        数据块 = np.empty((len(数据行列表), 28), dtype=object)
+        for 序号, 一行内容 in enumerate(数据行列表):
+            数据块[序号] = 转换为对象数组(一行内容[2:30])
+        有效掩码 = 有效单重掩码(数据块)
+        单重数据列表_二维数组 = [数据块[有效掩码[:, 列], 列].tolist() for 列 in np.flatnonzero(有效掩码.any(axis=0))]
         return 单重数据列表_二维数组, 单重数据时间列表, 标准下限, 标准上限, 品名, 工艺单
     except Exception as e:
         print(f"❌ 提取单重数据失败: {str(e)}")
         return None, None, None, None, None, None
 
-def 转换时间戳(input_var, timezone_offset=8):
-    """转换为毫秒级时间戳"""
-    if isinstance(input_var, str):
-        try:
-            dt = datetime.strptime(input_var, "%Y-%m-%d %H:%M:%S")
-        except ValueError:
-            try:
-                dt = datetime.strptime(input_var, "%Y/%m/%d %H:%M:%S")
-            except ValueError:
-                try:
-                    dt = datetime.fromisoformat(input_var.replace('Z', '+00:00'))
-                except ValueError:
-                    raise ValueError(f"无法解析日期字符串: {input_var}")
-        timestamp = dt.timestamp() - timezone_offset * 3600
-        return int(timestamp * 1000)
-    elif isinstance(input_var, datetime):
-        return int(input_var.timestamp() * 1000)
+def 提取工作表单重数据(工作表名称, 工作表内容):
+    """
+    从单个工作表提取单重数据（各工作表互不依赖，可在子进程中执行）
+    :return: ([[工序, 记录时间, 单重数据, 标准下限, 标准上限, 品名, 工艺单], ...], 提示信息列表)
+    """
+    本地数据列表 = []
+    提示列表 = []
+    工序行数, 工序列数 = 根据单元格内容提取行数列数(工作表内容, "工序")
+    if 工序行数:
+        工序获取值 = 工作表内容[工序行数][工序列数 + 1] if (工序列数 + 1) < len(工作表内容[工序行数]) else None
+        工序获取值2 = 工作表内容[工序行数][工序列数 + 2] if (工序列数 + 2) < len(工作表内容[工序行数]) else None
+        工序内容 = 工序获取值 or 工序获取值2 or None
+        if 工序内容:
+            单重数据信息, 单重数据时间列表, 标准下限, 标准上限, 品名, 工艺单 = 获取单重数据(工作表内容, 工序内容)
+            if 单重数据信息 and 单重数据时间列表:
+                for 计次, 列表元素_子元素 in enumerate(单重数据信息):
+                    if 计次 < len(单重数据时间列表):
+                        单重数据时间 = 单重数据时间列表[计次]
+                        if isinstance(列表元素_子元素, list):
+                            单重数据 = ",".join(map(str, 列表元素_子元素))
+                            本地数据列表.append([工序内容, 单重数据时间, 单重数据, 标准下限, 标准上限, 品名, 工艺单])
+                        else:
+                            提示列表.append(f"⚠️ 非列表数据: {单重数据时间} - {列表元素_子元素}")
+                    else:
+                        提示列表.append(f"⚠️ 数据索引超出时间列表长度: 计次{计次}")
+            else:
+                提示列表.append(f"⚠️ 未提取到单重数据: {工作表名称}")
+        else:
+            提示列表.append(f"⚠️ 未找到工序内容: {工作表名称}")
     else:
-        raise TypeError(f"不支持的类型: {type(input_var)}. 只支持字符串或datetime对象")
+        提示列表.append(f"⚠️ 未找到工序单元格: {工作表名称}")
+    return 本地数据列表, 提示列表
+
+def 压缩工作表(工作表内容):
+    """
+    去掉行尾和表尾的空单元格，返回 (行数, 列数, 各行长度, 裁剪后的行元组)，减少进程间传输量
+    各行长度：所有行等长（由DataFrame转换的工作表）时为None，否则为每行原始长度的元组，使不规则的行也能原样还原
+    """
+    裁剪行列表 = []
+    行长度列表 = []
+    for 一行内容 in 工作表内容:
+        结束 = len(一行内容)
+        行长度列表.append(结束)
+        while 结束 and isinstance(一行内容[结束 - 1], str) and not 一行内容[结束 - 1]:
+            结束 -= 1
+        裁剪行列表.append(tuple(一行内容[:结束]))
+    while 裁剪行列表 and not 裁剪行列表[-1]:
+        裁剪行列表.pop()
+    列数 = max(行长度列表, default=0)
+    各行长度 = None if all(长度 == 列数 for 长度 in 行长度列表) else tuple(行长度列表)
+    return len(工作表内容), 列数, 各行长度, tuple(裁剪行列表)
+
+def 还原工作表(压缩数据):
+    """压缩工作表 的逆操作：按各行原始长度补齐被裁掉的空单元格（""），结果与压缩前的二维列表相等"""
+    行数, 列数, 各行长度, 裁剪行列表 = 压缩数据
+    各行长度 = 各行长度 or (列数,) * 行数
+    工作表内容 = [list(一行内容) + [""] * (各行长度[序号] - len(一行内容)) for 序号, 一行内容 in enumerate(裁剪行列表)]
+    工作表内容.extend([""] * 各行长度[序号] for 序号 in range(len(裁剪行列表), 行数))
+    return 工作表内容
+
+def _子进程提取工作表(工作表名称, 压缩数据):
+    """进程池任务入口（需为模块级函数以便序列化）"""
+    return 提取工作表单重数据(工作表名称, 还原工作表(压缩数据))
+
+def 获取进程池工作表阈值():
+    try:
+        return int(os.getenv("SHEET_POOL_THRESHOLD", 进程池工作表阈值))
+    except ValueError:
+        return 进程池工作表阈值
+
+def 获取写入批大小():
+    try:
+        return min(批量写入上限, max(1, int(os.getenv("WRITE_BATCH_SIZE", 批量写入上限))))
+    except ValueError:
+        return 批量写入上限
+
+# 整列转换时间戳时标记无法转换的位置
+_转换失败 = object()
+
+def 构建上传数据结构(列表元素_子列表, 记录时间戳=_转换失败):
+    """
+    [工序, 记录时间, 单重数据, 标准下限, 标准上限, 品名, 工艺单] → 目标表字段
+    :param 记录时间戳: 已整列转换好的记录日期时间戳；未提供（或整列转换失败）时逐个转换
+    """
+    上传数据结构2 = {}
+    字段名列表 = ["工序", "记录日期", "单重数据", "标准下限", "标准上限", "品名", "工艺单"]
+    for 计次, 列表元素_子元素 in enumerate(列表元素_子列表):
+        if 计次 >= len(字段名列表):
+            continue
+        字段名 = 字段名列表[计次]
+        if 计次 == 1 and 记录时间戳 is not _转换失败:
+            字段内容 = 记录时间戳
+        elif 计次 == 1:  # 记录日期转换为时间戳
+            try:
+                字段内容 = 转换时间戳(列表元素_子元素)
+            except Exception as e:
+                逐行日志(日志, "时间转换失败", f"⚠️ 时间转换失败: {列表元素_子元素} - {str(e)}", logging.WARNING)
+                字段内容 = None
+        else:
+            字段内容 = 列表元素_子元素
+        if 字段名 and 字段内容 is not None:
+            上传数据结构2[字段名] = 字段内容
+    return 上传数据结构2
+
+def 构建上传数据结构列表(批):
+    """一批数据行 → 目标表字段列表；记录日期整列转换（按列识别一次日期格式）"""
+    时间戳列 = 转换时间戳列([行[1] if len(行) > 1 else None for 行 in 批], 列键=("单重", "记录日期"), 失败值=_转换失败)
+    return [构建上传数据结构(行, 时间戳) for 行, 时间戳 in zip(批, 时间戳列)]
+
+def 处理单行(访问令牌, APP_ID, APP_SECRET, DWBG_TOKEN, DWBG_TABLE_ID, TARGET_TABLE_ID, 行ID, 记录缓存=None):
+    """
+    处理单个行ID：解析附件中的单重数据并写入目标表格
+    下载 → 解析 → 提取 → 写入 四个阶段流水线执行：前面工作表的数据在写入时，后面的附件仍在下载/解析
+    """
+    获取信息 = 获取多维表格中附件的链接(访问令牌, DWBG_TOKEN, DWBG_TABLE_ID, 行ID, "上传附件", 记录缓存)
+    print(f"\n📊 行ID [{行ID}] 共{len(获取信息)}个附件，开始解析并写入飞书表格...")
+
+    def 下载阶段(附件列表):
+        for 文件临时链接, 文件名称 in 附件列表:
+            print(f"📥 处理附件: {文件名称}")
+            # 已有解析快照（SNAPSHOT_DIR）时直接读取，跳过下载与解析
+            快照 = 读取快照(文件临时链接, "table")
+            if 快照 is not None:
+                yield 文件临时链接, 文件名称, 快照, None
+                continue
+            文件内容 = 下载附件(访问令牌, 文件临时链接, 文件名称)
+            if 文件内容 is None:
+                print(f"❌ 解析附件失败: {文件名称}")
+                continue
+            yield 文件临时链接, 文件名称, None, 文件内容
+
+    def 解析阶段(附件列表):
+        for 文件临时链接, 文件名称, 快照, 文件内容 in 附件列表:
+            if 快照 is not None:
+                for 名称, 内容 in 快照.items():
+                    yield 名称, 内容, len(快照)
+                continue
+            # 快照用的工作表在内存紧张时溢出到磁盘
+            工作表字典 = 溢出字典()
+            try:
+                for 名称, 内容, 工作表总数 in 逐表解析附件(文件内容, 文件名称):
+                    工作表字典[名称] = 内容
+                    yield 名称, 内容, 工作表总数
+            except Exception as e:
+                print(f"❌ 解析表格失败: {str(e)}")
+                print(f"📝 详细错误: {traceback.format_exc()}")
+                print(f"❌ 解析附件失败: {文件名称}")
+                continue
+            print(f"✅ 解析完成，共{len(工作表字典)}个Sheet")
+            保存快照(文件临时链接, 文件名称, "table", 工作表字典)
+
+    def 提取阶段(工作表列表):
+        # 工作簿的工作表数达到阈值且可用核数>1时提交到进程池；按提交顺序取结果，保持工作表顺序
+        进程数 = 获取进程数()
+        阈值 = 获取进程池工作表阈值()
+        待完成 = deque()
+
+        def 输出结果(任务):
+            本地数据列表, 提示列表 = 任务.result() if isinstance(任务, Future) else 任务
+            for 提示 in 提示列表:
+                print(提示)
+            指标.计数("提取行数", len(本地数据列表))
+            return 本地数据列表
+
+        # 每个工作表的数据行整体输出，写入阶段按行数分批
+
+        for 名称, 内容, 工作表总数 in 工作表列表:
+            if 进程数 > 1 and 工作表总数 >= 阈值:
+                待完成.append(获取进程池().submit(_子进程提取工作表, 名称, 压缩工作表(内容)))
+                指标.计数("进程池工作表数")
+            else:
+                待完成.append(提取工作表单重数据(名称, 内容))
+            while 待完成 and (len(待完成) > 进程数 * 2 or not isinstance(待完成[0], Future) or 待完成[0].done()):
+                yield 输出结果(待完成.popleft())
+        while 待完成:
+            yield 输出结果(待完成.popleft())
+
+    def 写入阶段(工作表数据列表):
+        for 批 in 分批(工作表数据列表, 获取写入批大小(), 展开=True):
+            上传数据结构列表 = []
+            for 上传数据结构2 in 构建上传数据结构列表(批):
+                if 上传数据结构2:
+                    逐行日志(日志, "写入数据", f"📝 写入数据: {上传数据结构2.get('工序')}", 记录=上传数据结构2)
+                    上传数据结构列表.append(上传数据结构2)
+                else:
+                    逐行日志(日志, "空数据结构", "⚠️ 空数据结构，跳过写入", logging.WARNING)
+            if 上传数据结构列表:
+                成功标记列表 = 批量新增飞书表格(APP_ID, APP_SECRET, DWBG_TOKEN, TARGET_TABLE_ID, 上传数据结构列表)
+                for 上传数据结构2, 新增结果 in zip(上传数据结构列表, 成功标记列表):
+                    if not 新增结果:
+                        日志.error("❌ 写入数据失败", extra={"上下文": {"记录": 上传数据结构2}})
+                yield sum(成功标记列表)
+
+    写入数列表 = 流水线("单重数据") \
+        .阶段("下载", 下载阶段) \
+        .阶段("解析", 解析阶段) \
+        .阶段("提取", 提取阶段) \
+        .阶段("写入", 写入阶段) \
+        .运行(获取信息)
+    print(f"✅ 行ID [{行ID}] 共写入{sum(写入数列表)}条数据")
 
 def main():
-    """主函数：处理飞书表格数据"""
+    """主函数：处理飞书表格数据（支持 ROW_IDS 多行模式）"""
     try:
         # 从环境变量读取配置
         APP_ID = os.getenv("APP_ID")
         APP_SECRET = os.getenv("APP_SECRET")
         DWBG_TOKEN = os.getenv("DWBG_TOKEN")
         DWBG_TABLE_ID = os.getenv("DWBG_TABLE_ID")
-        ROW_ID = os.getenv("ROW_ID")
+        行ID列表 = 解析行ID列表(os.getenv("ROW_IDS"), os.getenv("ROW_ID"))
         TARGET_TABLE_ID = os.getenv("TARGET_TABLE_ID")
         
         # 校验配置
-        if not all([APP_ID, APP_SECRET, DWBG_TOKEN, DWBG_TABLE_ID, ROW_ID, TARGET_TABLE_ID]):
+        if not all([APP_ID, APP_SECRET, DWBG_TOKEN, DWBG_TABLE_ID, 行ID列表, TARGET_TABLE_ID]):
             raise Exception("❌ 环境变量配置不完整，请检查Secrets和工作流配置")
         
-        # 获取访问令牌
+        # 获取访问令牌（多行共享）
         访问令牌 = 获取访问令牌(APP_ID, APP_SECRET)
         print(f"✅ 获取访问令牌成功: {访问令牌[:20]}...")
-        
-        # 获取附件链接
-        所有本地数据列表 = []
-        获取信息 = 获取多维表格中附件的链接(访问令牌, DWBG_TOKEN, DWBG_TABLE_ID, ROW_ID, "上传附件")
-        for 列表元素_元组 in 获取信息:
-            文件临时链接, 文件名称 = 列表元素_元组
-            print(f"📥 处理附件: {文件名称}")
-            读取数据字典 = 在线解析表格为二维数据(访问令牌, 文件临时链接, 文件名称)
-            if 读取数据字典:
-                for 工作表名称, 工作表内容 in 读取数据字典.items():
-                    工序行数, 工序列数 = 根据单元格内容提取行数列数(工作表内容, "工序")
-                    if 工序行数:
-                        工序获取值 = 工作表内容[工序行数][工序列数 + 1] if (工序列数 + 1) < len(工作表内容[工序行数]) else None
-                        工序获取值2 = 工作表内容[工序行数][工序列数 + 2] if (工序列数 + 2) < len(工作表内容[工序行数]) else None
-                        工序内容 = 工序获取值 or 工序获取值2 or None
-                        if 工序内容:
-                            单重数据信息, 单重数据时间列表, 标准下限, 标准上限, 品名, 工艺单 = 获取单重数据(工作表内容, 工序内容)
-                            if 单重数据信息 and 单重数据时间列表:
-                                for 计次, 列表元素_子元素 in enumerate(单重数据信息):
-                                    if 计次 < len(单重数据时间列表):
-                                        单重数据时间 = 单重数据时间列表[计次]
-                                        if isinstance(列表元素_子元素, list):
-                                            单重数据 = ",".join(map(str, 列表元素_子元素))
-                                            所有本地数据列表.append([工序内容, 单重数据时间, 单重数据, 标准下限, 标准上限, 品名, 工艺单])
-                                        else:
-                                            print(f"⚠️ 非列表数据: {单重数据时间} - {列表元素_子元素}")
-                                    else:
-                                        print(f"⚠️ 数据索引超出时间列表长度: 计次{计次}")
-                            else:
-                                print(f"⚠️ 未提取到单重数据: {工作表名称}")
-                        else:
-                            print(f"⚠️ 未找到工序内容: {工作表名称}")
-                    else:
-                        print(f"⚠️ 未找到工序单元格: {工作表名称}")
-            else:
-                print(f"❌ 解析附件失败: {文件名称}")
-        
-        # 新增数据到飞书表格
-        print(f"\n📊 共处理{len(所有本地数据列表)}条数据，开始写入飞书表格...")
-        for 列表元素_子列表 in 所有本地数据列表:
-            上传数据结构2 = {}
-            字段名列表 = ["工序", "记录日期", "单重数据", "标准下限", "标准上限", "品名", "工艺单"]
-            for 计次, 列表元素_子元素 in enumerate(列表元素_子列表):
-                if 计次 >= len(字段名列表):
-                    continue
-                字段名 = 字段名列表[计次]
-                if 计次 == 1:  # 记录日期转换为时间戳
-                    try:
-                        字段内容 = 转换时间戳(列表元素_子元素)
-                    except Exception as e:
-                        print(f"⚠️ 时间转换失败: {列表元素_子元素} - {str(e)}")
-                        字段内容 = None
-                else:
-                    字段内容 = 列表元素_子元素
-                if 字段名 and 字段内容 is not None:
-                    上传数据结构2[字段名] = 字段内容
-            if 上传数据结构2:
-                print(f"📝 写入数据: {json.dumps(上传数据结构2, ensure_ascii=False)}")
-                新增结果 = 新增飞书表格(APP_ID, APP_SECRET, DWBG_TOKEN, TARGET_TABLE_ID, 上传数据结构2)
-                if not 新增结果:
-                    print(f"❌ 写入数据失败: {上传数据结构2}")
-            else:
-                print(f"⚠️ 空数据结构，跳过写入")
+
+        if len(行ID列表) == 1:
+            处理单行(访问令牌, APP_ID, APP_SECRET, DWBG_TOKEN, DWBG_TABLE_ID, TARGET_TABLE_ID, 行ID列表[0])
+        else:
+            # 多行模式：整表只读取一次，各行共享记录缓存
+            记录缓存 = 建立记录缓存(获取多维表格内容(访问令牌, DWBG_TOKEN, DWBG_TABLE_ID))
+            处理结果 = 并发处理行(
+                lambda 行ID: 处理单行(访问令牌, APP_ID, APP_SECRET, DWBG_TOKEN, DWBG_TABLE_ID, TARGET_TABLE_ID, 行ID, 记录缓存),
+                行ID列表
+            )
+            if 输出处理结果(处理结果):
+                raise Exception("❌ 存在处理失败的行，请查看上方日志")
         
         print("\n✅ 脚本执行完成")
     
@@ -469,6 +643,8 @@ def main():
         print(f"\n❌ 脚本执行出错: {str(e)}")
         print(f"📝 详细错误栈: {traceback.format_exc()}")
         raise  # 抛出异常让GitHub Actions标记为失败
+    finally:
+        指标.输出汇总("feishu_table_script")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,294 @@
+'''素材上传（不超过20MB走 upload_all；更大的文件走 upload_prepare → upload_part → upload_finish 分片上传）
+
+分片上传：
+- 文件以 mmap 映射，分片按需切出，同时在途的分片数受 UPLOAD_CONCURRENCY（默认4）限制
+- 每个分片附带 adler32 校验和，单个分片失败时重试
+- 进度写入 {文件路径}.upload.json，重跑时跳过已成功的分片（文件大小/修改时间变化或上传会话过期则重新开始）
+
+批量上传：按文件内容 sha256 去重，同一 parent_node 下已上传过的内容直接复用本地记录的 file_token
+（记录文件 UPLOAD_TOKEN_MAP，默认系统临时目录下 feishu_upload_tokens.json），其余文件并发上传
+'''
+import io
+import os
+import json
+import mmap
+import time
+import zlib
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from feishu_metrics import 指标
+from feishu_runtime import 获取飞书客户端
+
+# upload_all 单次上传上限
+单次上传上限 = 20 * 1024 * 1024
+
+# 默认同时上传的分片数（可通过环境变量 UPLOAD_CONCURRENCY 覆盖）
+默认分片并发数 = 4
+
+# 单个分片的重试次数
+分片重试次数 = 3
+
+# 上传会话（upload_id）有效期按24小时计，超过后重新 prepare
+上传会话有效秒数 = 24 * 3600
+
+_令牌映射锁 = threading.Lock()
+
+class 上传失败(Exception):
+    """素材上传失败（含接口返回的错误码与日志ID）"""
+
+def 获取分片并发数():
+    try:
+        return max(1, int(os.getenv("UPLOAD_CONCURRENCY", 默认分片并发数)))
+    except ValueError:
+        return 默认分片并发数
+
+def _错误信息(动作, response):
+    return f"{动作}失败 - 代码: {response.code}, 消息: {response.msg}, 日志ID: {response.get_log_id()}"
+
+def _进度文件路径(文件路径):
+    return f"{文件路径}.upload.json"
+
+def _读取进度(文件路径, 文件大小, 修改时间, parent_type, parent_node):
+    """读取可续传的进度，与当前文件/目标不一致或会话过期时返回None"""
+    try:
+        with open(_进度文件路径(文件路径), "r", encoding="utf-8") as f:
+            进度 = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (进度.get("文件大小"), 进度.get("修改时间"), 进度.get("parent_type"), 进度.get("parent_node")) \
+            != (文件大小, 修改时间, parent_type, parent_node):
+        return None
+    if time.time() - 进度.get("创建时间", 0) > 上传会话有效秒数:
+        return None
+    return 进度
+
+def _写入进度(文件路径, 进度):
+    临时路径 = _进度文件路径(文件路径) + ".tmp"
+    with open(临时路径, "w", encoding="utf-8") as f:
+        json.dump(进度, f, ensure_ascii=False)
+    os.replace(临时路径, _进度文件路径(文件路径))
+
+def _删除进度(文件路径):
+    try:
+        os.remove(_进度文件路径(文件路径))
+    except OSError:
+        pass
+
+@指标.计时("素材上传")
+def 整体上传素材(client, 文件路径, parent_type, parent_node, 文件名称=None):
+    """upload_all 一次上传（不超过20MB），返回 file_token"""
+    from lark_oapi.api.drive.v1 import UploadAllMediaRequest, UploadAllMediaRequestBody
+    文件名称 = 文件名称 or os.path.basename(文件路径)
+    with open(文件路径, "rb") as file:
+        request = UploadAllMediaRequest.builder() \
+            .request_body(UploadAllMediaRequestBody.builder()
+                          .file_name(文件名称)
+                          .parent_type(parent_type)
+                          .parent_node(parent_node)
+                          .size(str(os.path.getsize(文件路径)))
+                          .file(file)
+                          .build()) \
+            .build()
+        指标.计数("API调用次数")
+        response = client.drive.v1.media.upload_all(request)
+    if not response.success():
+        raise 上传失败(_错误信息("文件上传", response))
+    指标.计数("上传字节数", os.path.getsize(文件路径))
+    return response.data.file_token
+
+def _准备分片上传(client, 文件名称, 文件大小, parent_type, parent_node):
+    from lark_oapi.api.drive.v1 import UploadPrepareMediaRequest, MediaUploadInfo
+    request = UploadPrepareMediaRequest.builder() \
+        .request_body(MediaUploadInfo.builder()
+                      .file_name(文件名称)
+                      .parent_type(parent_type)
+                      .parent_node(parent_node)
+                      .size(文件大小)
+                      .build()) \
+        .build()
+    指标.计数("API调用次数")
+    response = client.drive.v1.media.upload_prepare(request)
+    if not response.success():
+        raise 上传失败(_错误信息("分片上传准备", response))
+    return response.data.upload_id, response.data.block_size, response.data.block_num
+
+def _上传分片(client, 映射, upload_id, 序号, 分片大小, 文件大小):
+    """上传一个分片（失败重试），返回该分片的字节数"""
+    from lark_oapi.api.drive.v1 import UploadPartMediaRequest, UploadPartMediaRequestBody
+    开始 = 序号 * 分片大小
+    分片 = 映射[开始:min(开始 + 分片大小, 文件大小)]
+    校验和 = str(zlib.adler32(分片))
+    最后错误 = None
+    for 第几次 in range(分片重试次数):
+        # 请求体在发送时会被替换为 multipart 编码，每次重试需重新构造
+        request = UploadPartMediaRequest.builder() \
+            .request_body(UploadPartMediaRequestBody.builder()
+                          .upload_id(upload_id)
+                          .seq(序号)
+                          .size(len(分片))
+                          .checksum(校验和)
+                          .file(io.BytesIO(分片))
+                          .build()) \
+            .build()
+        指标.计数("API调用次数")
+        try:
+            response = client.drive.v1.media.upload_part(request)
+            if response.success():
+                指标.计数("上传字节数", len(分片))
+                return len(分片)
+            最后错误 = _错误信息(f"分片{序号}上传", response)
+        except Exception as e:
+            最后错误 = f"分片{序号}上传失败: {str(e)}"
+        print(f"⚠️ {最后错误}（第{第几次 + 1}/{分片重试次数}次）")
+        if 第几次 + 1 < 分片重试次数:
+            指标.计数("分片重试次数")
+            time.sleep(min(2 ** 第几次, 8))
+    raise 上传失败(最后错误)
+
+def _完成分片上传(client, upload_id, 分片数):
+    from lark_oapi.api.drive.v1 import UploadFinishMediaRequest, UploadFinishMediaRequestBody
+    request = UploadFinishMediaRequest.builder() \
+        .request_body(UploadFinishMediaRequestBody.builder()
+                      .upload_id(upload_id)
+                      .block_num(分片数)
+                      .build()) \
+        .build()
+    指标.计数("API调用次数")
+    response = client.drive.v1.media.upload_finish(request)
+    if not response.success():
+        raise 上传失败(_错误信息("分片上传完成", response))
+    return response.data.file_token
+
+@指标.计时("素材上传")
+def 分片上传素材(client, 文件路径, parent_type, parent_node, 文件名称=None, 并发数=None):
+    """
+    分片上传，返回 file_token
+    有分片失败时保留进度文件并抛出 上传失败，重跑时从未完成的分片继续
+    """
+    文件名称 = 文件名称 or os.path.basename(文件路径)
+    文件大小 = os.path.getsize(文件路径)
+    修改时间 = os.path.getmtime(文件路径)
+    进度 = _读取进度(文件路径, 文件大小, 修改时间, parent_type, parent_node)
+    if 进度:
+        print(f"🔁 续传 {文件名称}: 已完成 {len(进度['已完成分片'])}/{进度['分片数']} 个分片")
+    else:
+        upload_id, 分片大小, 分片数 = _准备分片上传(client, 文件名称, 文件大小, parent_type, parent_node)
+        进度 = {
+            "upload_id": upload_id, "分片大小": 分片大小, "分片数": 分片数,
+            "文件大小": 文件大小, "修改时间": 修改时间,
+            "parent_type": parent_type, "parent_node": parent_node,
+            "创建时间": time.time(), "已完成分片": [],
+        }
+        _写入进度(文件路径, 进度)
+        print(f"📦 分片上传 {文件名称}: {文件大小} bytes，{分片数} 个分片（每片 {分片大小} bytes）")
+
+    已完成 = set(进度["已完成分片"])
+    待上传 = [序号 for 序号 in range(进度["分片数"]) if 序号 not in 已完成]
+    进度锁 = threading.Lock()
+    错误列表 = []
+
+    def 上传一个(序号):
+        try:
+            _上传分片(client, 映射, 进度["upload_id"], 序号, 进度["分片大小"], 文件大小)
+        except 上传失败 as e:
+            错误列表.append(str(e))
+            return
+        with 进度锁:
+            进度["已完成分片"].append(序号)
+            _写入进度(文件路径, 进度)
+
+    with open(文件路径, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as 映射:
+        with ThreadPoolExecutor(max_workers=min(并发数 or 获取分片并发数(), max(1, len(待上传))),
+                                thread_name_prefix="分片上传") as 线程池:
+            list(线程池.map(上传一个, 待上传))
+    if 错误列表:
+        raise 上传失败(f"{len(错误列表)} 个分片上传失败（进度已保存，重跑可续传）: {错误列表[0]}")
+
+    file_token = _完成分片上传(client, 进度["upload_id"], 进度["分片数"])
+    _删除进度(文件路径)
+    return file_token
+
+def 上传素材(应用ID, 应用密匙, 文件路径, parent_node, parent_type="bitable_file", 文件名称=None):
+    """上传本地文件为素材，按文件大小选择整体/分片上传，返回 file_token"""
+    client = 获取飞书客户端(应用ID, 应用密匙)
+    if os.path.getsize(文件路径) <= 单次上传上限:
+        return 整体上传素材(client, 文件路径, parent_type, parent_node, 文件名称)
+    return 分片上传素材(client, 文件路径, parent_type, parent_node, 文件名称)
+
+def 令牌映射文件():
+    return os.getenv("UPLOAD_TOKEN_MAP") or os.path.join(tempfile.gettempdir(), "feishu_upload_tokens.json")
+
+def _读取令牌映射(映射文件):
+    try:
+        with open(映射文件, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _保存令牌映射(映射文件, 新令牌):
+    """合并写入（读取最新内容后再写，避免覆盖其他进程新增的记录）"""
+    with _令牌映射锁:
+        令牌映射 = _读取令牌映射(映射文件)
+        for 目标, 哈希映射 in 新令牌.items():
+            令牌映射.setdefault(目标, {}).update(哈希映射)
+        os.makedirs(os.path.dirname(os.path.abspath(映射文件)), exist_ok=True)
+        临时路径 = f"{映射文件}.{os.getpid()}.tmp"
+        with open(临时路径, "w", encoding="utf-8") as f:
+            json.dump(令牌映射, f, ensure_ascii=False, indent=2)
+        os.replace(临时路径, 映射文件)
+
+def 计算文件哈希(文件路径):
+    """按1MB分块计算 sha256"""
+    哈希 = hashlib.sha256()
+    with open(文件路径, "rb") as f:
+        for 块 in iter(lambda: f.read(1024 * 1024), b""):
+            哈希.update(块)
+    return 哈希.hexdigest()
+
+def 批量上传素材(应用ID, 应用密匙, 文件路径列表, parent_node, parent_type="bitable_file", 并发数=None, 映射文件=None):
+    """
+    批量上传本地文件
+    - 内容相同（sha256一致）的文件只上传一次，已上传到同一 parent_node 的内容直接复用 file_token
+    - 其余文件并发上传（同时上传的文件数受 UPLOAD_CONCURRENCY 限制，大文件内部仍分片上传）
+    :return: {文件路径: file_token}，读取或上传失败的文件为None
+    """
+    映射文件 = 映射文件 or 令牌映射文件()
+    目标 = f"{parent_type}:{parent_node}"
+    路径哈希 = {}
+    读取失败 = []
+    with 指标.阶段("素材哈希"):
+        for 路径 in dict.fromkeys(文件路径列表):
+            try:
+                路径哈希[路径] = 计算文件哈希(路径)
+            except OSError as e:
+                print(f"❌ 读取文件失败，跳过上传: {路径} - {str(e)}")
+                读取失败.append(路径)
+    已上传 = _读取令牌映射(映射文件).get(目标, {})
+    哈希令牌 = {哈希: 已上传[哈希] for 哈希 in set(路径哈希.values()) if 哈希 in 已上传}
+    待上传 = {}
+    for 路径, 哈希 in 路径哈希.items():
+        if 哈希 in 哈希令牌 or 哈希 in 待上传:
+            指标.计数("上传去重命中")
+            print(f"♻️ 跳过重复内容: {os.path.basename(路径)}")
+        else:
+            待上传[哈希] = 路径
+    print(f"📤 批量上传: 共{len(路径哈希) + len(读取失败)}个文件，需上传{len(待上传)}个")
+
+    def 上传一个(哈希):
+        路径 = 待上传[哈希]
+        try:
+            return 哈希, 上传素材(应用ID, 应用密匙, 路径, parent_node, parent_type)
+        except Exception as e:
+            print(f"❌ 上传失败: {路径} - {str(e)}")
+            return 哈希, None
+
+    if 待上传:
+        with ThreadPoolExecutor(max_workers=min(并发数 or 获取分片并发数(), len(待上传)),
+                                thread_name_prefix="批量上传") as 线程池:
+            新令牌 = {哈希: 令牌 for 哈希, 令牌 in 线程池.map(上传一个, list(待上传)) if 令牌}
+        if 新令牌:
+            _保存令牌映射(映射文件, {目标: 新令牌})
+        哈希令牌.update(新令牌)
+    return {路径: 哈希令牌.get(路径哈希[路径]) if 路径 in 路径哈希 else None for 路径 in dict.fromkeys(文件路径列表)}
@@ -0,0 +1,248 @@
+'''飞书脚本常驻Worker（本地Webhook接收 + 队列处理，复用已加载的依赖与客户端）'''
+import os
+import json
+import queue
+import threading
+import traceback
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import feishu_QSA_script
+import feishu_table_script
+import feishu_bitable_process
+from feishu_metrics import 指标
+from feishu_runtime import 获取缓存访问令牌, 解析行ID列表, 建立记录缓存, 并发处理行, 输出处理结果
+
+# ====================== 环境变量配置 ======================
+# 应用凭证兼容两种命名（QSA/单重工作流用 APP_ID，监测数据工作流用 FEISHU_APP_ID）
+APP_ID = (os.getenv("APP_ID") or os.getenv("FEISHU_APP_ID") or "").strip()
+APP_SECRET = (os.getenv("APP_SECRET") or os.getenv("FEISHU_APP_SECRET") or "").strip()
+QSA_TABLE_ID = (os.getenv("QSA_TABLE_ID") or "").strip()
+TARGET_TABLE_ID = (os.getenv("TARGET_TABLE_ID") or "").strip()
+WORKER_HOST = os.getenv("WORKER_HOST", "127.0.0.1")
+WORKER_PORT = int(os.getenv("WORKER_PORT", "8787"))
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "2"))
+# 事件状态最多保留的已完成事件数（超出时淘汰最早完成的）
+WORKER_EVENT_HISTORY = int(os.getenv("WORKER_EVENT_HISTORY", "1000"))
+# 可选：请求需携带 Authorization: Bearer <WORKER_TOKEN>
+WORKER_TOKEN = os.getenv("WORKER_TOKEN", "")
+
+def 处理QSA事件(访问令牌, 载荷, 行ID, 记录缓存=None):
+    """feishu_QSA_trigger：与 feishu_QSA_script.py 相同的处理逻辑"""
+    feishu_QSA_script.处理单行(
+        访问令牌, APP_ID, APP_SECRET, 载荷["DWBG_TOKEN"], 载荷["DWBG_TABLE_ID"],
+        载荷.get("QSA_TABLE_ID") or QSA_TABLE_ID, 载荷.get("FJ_ID", ""), 行ID, 记录缓存
+    )
+
+def 处理单重事件(访问令牌, 载荷, 行ID, 记录缓存=None):
+    """feishu_Dzsj_trigger：与 feishu_table_script.py 相同的处理逻辑"""
+    feishu_table_script.处理单行(
+        访问令牌, APP_ID, APP_SECRET, 载荷["DWBG_TOKEN"], 载荷["DWBG_TABLE_ID"],
+        载荷.get("TARGET_TABLE_ID") or TARGET_TABLE_ID, 行ID, 记录缓存
+    )
+
+def 处理监测数据事件(访问令牌, 载荷, 行ID, 记录缓存=None):
+    """feishu_bitable_process：与 feishu_bitable_process.py 相同的处理逻辑"""
+    feishu_bitable_process.处理单行(
+        访问令牌, APP_ID, APP_SECRET, 载荷["DWBG_TOKEN"], 载荷["DWBG_TABLE_ID"], 行ID, 记录缓存
+    )
+
+# 事件类型 → (处理函数, 对应脚本的记录读取函数)，与各工作流的 repository_dispatch types 一致
+事件处理字典 = {
+    "feishu_QSA_trigger": (处理QSA事件, feishu_QSA_script.获取多维表格内容),
+    "feishu_Dzsj_trigger": (处理单重事件, feishu_table_script.获取多维表格内容),
+    "feishu_bitable_process": (处理监测数据事件, feishu_bitable_process.获取多维表格内容),
+}
+
+class 事件队列Worker:
+    """
+    接收 repository_dispatch 形状的事件并在后台线程中排队处理
+    每个事件结束时输出并清空运行指标（与独立脚本每次运行输出一次一致）；
+    多个处理线程同时处理事件时，重叠期间的计时与计数记入先结束的事件
+    """
+
+    def __init__(self, 线程数=WORKER_THREADS, 保留事件数=WORKER_EVENT_HISTORY):
+        self.队列 = queue.Queue()
+        self.线程数 = max(1, 线程数)
+        self.保留事件数 = max(1, 保留事件数)
+        # 事件状态 由 _锁 保护（处理线程更新、HTTP线程读取）
+        self.事件状态 = {}
+        self._编号 = 0
+        self._锁 = threading.Lock()
+        self._线程列表 = []
+
+    def 提交(self, 事件):
+        """校验并入队事件，返回事件编号"""
+        事件类型 = 事件.get("event_type")
+        载荷 = 事件.get("client_payload") or {}
+        if 事件类型 not in 事件处理字典:
+            raise ValueError(f"不支持的事件类型: {事件类型}，可选: {list(事件处理字典)}")
+        缺少字段 = [键 for 键 in ("DWBG_TOKEN", "DWBG_TABLE_ID") if not 载荷.get(键)]
+        if not 解析行ID列表(json.dumps(载荷.get("ROW_IDS")), 载荷.get("ROW_ID")):
+            缺少字段.append("ROW_ID/ROW_IDS")
+        # 与独立脚本启动时的环境变量检查一致：空的 FJ_ID 会模糊匹配到记录的任意字段
+        if 事件类型 == "feishu_QSA_trigger" and not str(载荷.get("FJ_ID") or "").strip():
+            缺少字段.append("FJ_ID")
+        if 事件类型 == "feishu_Dzsj_trigger" and not (载荷.get("TARGET_TABLE_ID") or TARGET_TABLE_ID):
+            缺少字段.append("TARGET_TABLE_ID（或设置环境变量 TARGET_TABLE_ID）")
+        if 缺少字段:
+            raise ValueError(f"client_payload 缺少字段: {', '.join(缺少字段)}")
+        with self._锁:
+            self._编号 += 1
+            编号 = self._编号
+            self.事件状态[编号] = {"事件类型": 事件类型, "状态": "排队中", "提交时间": datetime.now().isoformat()}
+        self.队列.put((编号, 事件类型, 载荷))
+        print(f"📥 事件[{编号}] 已入队: {事件类型}，当前队列长度 {self.队列.qsize()}")
+        return 编号
+
+    def 更新事件状态(self, 编号, **字段):
+        with self._锁:
+            self.事件状态[编号].update(字段)
+
+    def 获取事件状态(self, 编号):
+        """返回事件状态的副本，不存在时返回None"""
+        with self._锁:
+            状态 = self.事件状态.get(编号)
+            return dict(状态) if 状态 else None
+
+    def _淘汰已完成事件(self):
+        """已完成的事件超过 保留事件数 时，按提交先后淘汰最早的（调用方持有 _锁）"""
+        已完成 = [编号 for 编号, 状态 in self.事件状态.items() if "完成时间" in 状态]
+        for 编号 in 已完成[:max(0, len(已完成) - self.保留事件数)]:
+            del self.事件状态[编号]
+
+    def 处理事件(self, 事件类型, 载荷):
+        """执行单个事件（支持 ROW_IDS 多行），返回失败行数"""
+        处理函数, 读取记录函数 = 事件处理字典[事件类型]
+        行ID列表 = 解析行ID列表(json.dumps(载荷.get("ROW_IDS")), 载荷.get("ROW_ID"))
+        访问令牌 = 获取缓存访问令牌(feishu_bitable_process.获取访问令牌, APP_ID, APP_SECRET)
+        if len(行ID列表) == 1:
+            处理函数(访问令牌, 载荷, 行ID列表[0])
+            return 0
+        记录缓存 = 建立记录缓存(读取记录函数(访问令牌, 载荷["DWBG_TOKEN"], 载荷["DWBG_TABLE_ID"]))
+        处理结果 = 并发处理行(lambda 行ID: 处理函数(访问令牌, 载荷, 行ID, 记录缓存), 行ID列表)
+        return 输出处理结果(处理结果)
+
+    def _循环(self):
+        while True:
+            任务 = self.队列.get()
+            if 任务 is None:
+                self.队列.task_done()
+                break
+            编号, 事件类型, 载荷 = 任务
+            self.更新事件状态(编号, 状态="处理中")
+            print(f"\n===== 开始处理事件[{编号}]: {事件类型} =====")
+            结果 = {}
+            try:
+                失败行数 = self.处理事件(事件类型, 载荷)
+                结果["状态"] = "失败" if 失败行数 else "成功"
+                if 失败行数:
+                    结果["错误"] = f"{失败行数}行处理失败"
+            except Exception as e:
+                print(f"❌ 事件[{编号}] 处理失败: {str(e)}")
+                print(f"📝 详细错误栈: {traceback.format_exc()}")
+                结果.update({"状态": "失败", "错误": str(e)})
+            finally:
+                结果["指标"] = 指标.输出汇总(f"feishu_worker 事件[{编号}] {事件类型}", 重置=True)
+                结果["完成时间"] = datetime.now().isoformat()
+                with self._锁:
+                    self.事件状态[编号].update(结果)
+                    self._淘汰已完成事件()
+                self.队列.task_done()
+
+    def 启动(self):
+        """启动后台处理线程"""
+        for 序号 in range(self.线程数):
+            线程 = threading.Thread(target=self._循环, name=f"feishu-worker-{序号}", daemon=True)
+            线程.start()
+            self._线程列表.append(线程)
+
+    def 停止(self):
+        """等待队列清空后停止处理线程"""
+        for _ in self._线程列表:
+            self.队列.put(None)
+        for 线程 in self._线程列表:
+            线程.join()
+        self._线程列表 = []
+
+def 创建请求处理类(worker):
+    """生成绑定到指定Worker的HTTP请求处理类"""
+
+    class 请求处理(BaseHTTPRequestHandler):
+        def _返回(self, 状态码, 数据):
+            内容 = json.dumps(数据, ensure_ascii=False).encode("utf-8")
+            self.send_response(状态码)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(内容)))
+            self.end_headers()
+            self.wfile.write(内容)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._返回(200, {"状态": "运行中", "队列长度": worker.队列.qsize()})
+            elif self.path.startswith("/events/"):
+                try:
+                    编号 = int(self.path.rsplit("/", 1)[-1])
+                except ValueError:
+                    self._返回(400, {"错误": "事件编号必须为整数"})
+                    return
+                状态 = worker.获取事件状态(编号)
+                self._返回(200 if 状态 else 404, 状态 or {"错误": f"事件[{编号}]不存在"})
+            else:
+                self._返回(404, {"错误": f"未知路径: {self.path}"})
+
+        def do_POST(self):
+            # 与 GitHub 的 POST /repos/{owner}/{repo}/dispatches 保持相同的请求体
+            if self.path.rstrip("/") not in ("", "/dispatches"):
+                self._返回(404, {"错误": f"未知路径: {self.path}"})
+                return
+            if WORKER_TOKEN and self.headers.get("Authorization") != f"Bearer {WORKER_TOKEN}":
+                self._返回(401, {"错误": "鉴权失败"})
+                return
+            try:
+                长度 = int(self.headers.get("Content-Length") or 0)
+                事件 = json.loads(self.rfile.read(长度) or b"{}")
+                编号 = worker.提交(事件)
+            except ValueError as e:
+                self._返回(400, {"错误": str(e)})
+                return
+            self._返回(202, {"事件编号": 编号, "队列长度": worker.队列.qsize()})
+
+        def log_message(self, format, *args):
+            print(f"🌐 {self.address_string()} {format % args}")
+
+    return 请求处理
+
+def 预热依赖():
+    """入口脚本已改为按需导入，常驻模式启动时提前加载重量级依赖，使首个事件无需等待导入"""
+    import importlib
+    for 模块名 in ["requests", "pandas", "numpy", "openpyxl", "pyexcel", "xlrd",
+                   "lark_oapi", "lark_oapi.api.bitable.v1", "lark_oapi.api.drive.v1"]:
+        try:
+            importlib.import_module(模块名)
+        except ImportError as e:
+            print(f"⚠️ 预热依赖 {模块名} 失败: {str(e)}")
+
+def 启动服务(host=WORKER_HOST, port=WORKER_PORT, 线程数=WORKER_THREADS):
+    """启动Worker与HTTP服务，返回 (server, worker)；server.serve_forever() 需由调用方执行"""
+    worker = 事件队列Worker(线程数)
+    worker.启动()
+    server = ThreadingHTTPServer((host, port), 创建请求处理类(worker))
+    return server, worker
+
+def main():
+    """常驻运行入口"""
+    if not APP_ID or not APP_SECRET:
+        raise Exception("❌ 缺少必要环境变量：APP_ID/FEISHU_APP_ID, APP_SECRET/FEISHU_APP_SECRET")
+    预热依赖()
+    server, worker = 启动服务()
+    print(f"🚀 Worker已启动: http://{WORKER_HOST}:{WORKER_PORT}/dispatches（处理线程 {worker.线程数} 个）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️ 收到停止信号，等待队列处理完成...")
+    finally:
+        server.server_close()
+        worker.停止()
+
+if __name__ == "__main__":
+    main()
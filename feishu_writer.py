@@ -0,0 +1,171 @@
+'''异步记录写入（基于 lark_oapi 的 acreate/aupdate/abatch_create，信号量限制并发，结果按提交顺序返回）
+
+同步代码通过 同步写入() 调用：
+    结果 = 同步写入(APP_ID, APP_SECRET, [
+        ("更新", app_token, table_id, 行ID, 字段),
+        ("批量新增", app_token, table_id2, 字段列表),
+    ])
+互不依赖的写入（如主表更新与失分点新增）同时发出，结果列表与写入列表一一对应
+提交前按目标表字段结构校验并转换字段（见 feishu_schema），未通过校验的记录不提交、结果记为失败
+'''
+import os
+import json
+import time
+import asyncio
+import threading
+from feishu_metrics import 指标
+from feishu_runtime import 获取飞书客户端
+from feishu_schema import 校验记录列表
+
+# 同时在途的写入请求数（可通过环境变量 WRITE_CONCURRENCY 覆盖）
+默认写入并发数 = 4
+
+# 飞书 batch_create 单次最多500条
+批量写入上限 = 500
+
+def 获取写入并发数():
+    try:
+        return max(1, int(os.getenv("WRITE_CONCURRENCY", 默认写入并发数)))
+    except ValueError:
+        return 默认写入并发数
+
+def _错误详情(response):
+    详情 = f"代码: {response.code}, 消息: {response.msg}, 日志ID: {response.get_log_id()}"
+    if response.raw and response.raw.content:
+        try:
+            详情 += f"\n详细响应: {json.dumps(json.loads(response.raw.content), indent=4, ensure_ascii=False)}"
+        except ValueError:
+            详情 += f"\n响应内容: {response.raw.content}"
+    return 详情
+
+class 异步记录写入器:
+    """同一写入器内的请求共享一个信号量；新增/更新返回是否成功，批量新增返回与输入对应的成功标记列表"""
+
+    def __init__(self, 应用ID, 应用密匙, 并发数=None):
+        self.client = 获取飞书客户端(应用ID, 应用密匙)
+        self.并发数 = 并发数 or 获取写入并发数()
+        self._信号量 = None
+
+    async def _发送(self, 方法名, request):
+        if self._信号量 is None:
+            # 信号量需在事件循环内创建
+            self._信号量 = asyncio.Semaphore(self.并发数)
+        async with self._信号量:
+            指标.计数("API调用次数")
+            开始 = time.perf_counter()
+            try:
+                return await getattr(self.client.bitable.v1.app_table_record, 方法名)(request)
+            finally:
+                指标.记录耗时("记录写入(异步)", time.perf_counter() - 开始)
+
+    async def _校验(self, app_token, table_id, 字段列表):
+        # 字段结构的获取是同步请求（结果有缓存），放到线程中执行，不阻塞其他写入
+        return await asyncio.to_thread(校验记录列表, self.client, app_token, table_id, 字段列表)
+
+    async def 新增(self, app_token, table_id, 字段, 已校验=False):
+        from lark_oapi.api.bitable.v1 import AppTableRecord, CreateAppTableRecordRequest
+        if not 已校验:
+            字段 = (await self._校验(app_token, table_id, [字段]))[0]
+            if 字段 is None:
+                return False
+        request = CreateAppTableRecordRequest.builder() \
+            .app_token(app_token) \
+            .table_id(table_id) \
+            .request_body(AppTableRecord.builder().fields(字段).build()) \
+            .build()
+        response = await self._发送("acreate", request)
+        if not response.success():
+            print(f"❌ 新增记录失败 - {_错误详情(response)}")
+            return False
+        指标.计数("写入记录数")
+        return True
+
+    async def 更新(self, app_token, table_id, 行ID, 字段):
+        from lark_oapi.api.bitable.v1 import AppTableRecord, UpdateAppTableRecordRequest
+        字段 = (await self._校验(app_token, table_id, [字段]))[0]
+        if 字段 is None:
+            print(f"❌ 更新记录失败 - 行ID:{行ID} | 字段校验未通过")
+            return False
+        request = UpdateAppTableRecordRequest.builder() \
+            .app_token(app_token) \
+            .table_id(table_id) \
+            .record_id(行ID) \
+            .request_body(AppTableRecord.builder().fields(字段).build()) \
+            .build()
+        response = await self._发送("aupdate", request)
+        if not response.success():
+            print(f"❌ 更新记录失败 - 行ID:{行ID} | {_错误详情(response)}")
+            return False
+        指标.计数("写入记录数")
+        return True
+
+    async def 批量新增(self, app_token, table_id, 字段列表):
+        """按500条分批并发提交；某批失败时该批逐条新增（同样受并发上限约束）；未通过字段校验的记录直接记为失败"""
+        from lark_oapi.api.bitable.v1 import AppTableRecord, BatchCreateAppTableRecordRequest, \
+            BatchCreateAppTableRecordRequestBody
+
+        async def 提交一批(本批):
+            request = BatchCreateAppTableRecordRequest.builder() \
+                .app_token(app_token) \
+                .table_id(table_id) \
+                .request_body(BatchCreateAppTableRecordRequestBody.builder()
+                              .records([AppTableRecord.builder().fields(字段).build() for 字段 in 本批])
+                              .build()) \
+                .build()
+            response = await self._发送("abatch_create", request)
+            if response.success():
+                print(f"✅ 批量新增记录成功: {len(本批)}条")
+                指标.计数("写入记录数", len(本批))
+                return [True] * len(本批)
+            print(f"⚠️ 批量新增记录失败，改为逐条新增 - 代码: {response.code}, 消息: {response.msg}, 日志ID: {response.get_log_id()}")
+            return list(await asyncio.gather(*(self.新增(app_token, table_id, 字段, True) for 字段 in 本批)))
+
+        校验结果 = await self._校验(app_token, table_id, 字段列表)
+        有效列表 = [字段 for 字段 in 校验结果 if 字段 is not None]
+        批结果 = await asyncio.gather(*(
+            提交一批(有效列表[起始:起始 + 批量写入上限]) for 起始 in range(0, len(有效列表), 批量写入上限)
+        ))
+        有效结果 = iter([成功 for 结果 in 批结果 for 成功 in 结果])
+        return [False if 字段 is None else next(有效结果) for 字段 in 校验结果]
+
+    async def 执行(self, 写入列表):
+        """并发执行写入列表，结果按写入列表顺序返回"""
+        return list(await asyncio.gather(*(self._执行一项(写入) for 写入 in 写入列表)))
+
+    async def _执行一项(self, 写入):
+        操作, *参数 = 写入
+        if 操作 == "新增":
+            return await self.新增(*参数)
+        if 操作 == "更新":
+            return await self.更新(*参数)
+        if 操作 == "批量新增":
+            return await self.批量新增(*参数)
+        raise ValueError(f"不支持的写入操作: {操作}")
+
+def 同步写入(应用ID, 应用密匙, 写入列表, 并发数=None):
+    """
+    同步调用入口：
+    :param 写入列表: [("新增", app_token, table_id, 字段) | ("更新", app_token, table_id, 行ID, 字段)
+                     | ("批量新增", app_token, table_id, 字段列表), ...]
+    :return: 与写入列表一一对应的结果（bool 或 批量新增的成功标记列表）
+    """
+    写入器 = 异步记录写入器(应用ID, 应用密匙, 并发数)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(写入器.执行(写入列表))
+    # 调用方已在事件循环中（如常驻Worker），在独立线程中运行新的事件循环
+    结果 = {}
+
+    def 运行():
+        try:
+            结果["值"] = asyncio.run(写入器.执行(写入列表))
+        except BaseException as e:
+            结果["错误"] = e
+
+    线程 = threading.Thread(target=运行, name="异步写入", daemon=True)
+    线程.start()
+    线程.join()
+    if "错误" in 结果:
+        raise 结果["错误"]
+    return 结果["值"]
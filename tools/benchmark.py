@@ -0,0 +1,258 @@
+'''端到端基准测试：启动本地模拟飞书服务，预置附件记录，逐个运行脚本并统计耗时与阶段指标'''
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mock_feishu_server import 模拟飞书服务
+from generate_workbooks import 生成默认工作簿
+
+项目目录 = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+模拟APP_TOKEN = "bascnMockApp"
+模拟来源表 = "tblMockSource"
+模拟目标表 = "tblMockTarget"
+
+# 脚本名 → (脚本文件, 附件字段名, 额外环境变量)
+脚本配置 = {
+    "feishu_QSA_script": ("feishu_QSA_script.py", "QSA附件", {
+        "APP_ID": "cli_mock", "APP_SECRET": "mock_secret",
+        "QSA_TABLE_ID": 模拟目标表, "FJ_ID": "QSA附件",
+    }),
+    "feishu_table_script": ("feishu_table_script.py", "上传附件", {
+        "APP_ID": "cli_mock", "APP_SECRET": "mock_secret",
+        "TARGET_TABLE_ID": 模拟目标表,
+    }),
+    "feishu_bitable_process": ("feishu_bitable_process.py", "上传附件", {
+        "FEISHU_APP_ID": "cli_mock", "FEISHU_APP_SECRET": "mock_secret",
+    }),
+}
+
+def 获取字段结构配置(脚本名):
+    """各脚本写入的表的字段结构 {table_id: {字段名: 字段类型}}（1文本 2数字 5日期 17附件），模拟服务据此校验写入"""
+    if 脚本名 == "feishu_QSA_script":
+        return {
+            模拟来源表: {"QSA附件": 17, "工厂名称": 1, "审核员": 1, "QSA得分": 2, "QSA+得分": 2,
+                      "审核开始日期": 5, "审核结束日期": 5},
+            模拟目标表: {"工厂名称": 1, "审核员": 1, "审核日期": 1, "审核项": 1, "审核条款": 1, "审核标准": 1,
+                      "符合等级": 1, "问题描述": 1, "根因分析": 1, "改进计划": 1, "计划完成时限": 5},
+        }
+    if 脚本名 == "feishu_table_script":
+        return {
+            模拟来源表: {"上传附件": 17},
+            模拟目标表: {"工序": 1, "记录日期": 5, "单重数据": 1, "标准下限": 2, "标准上限": 2, "品名": 1, "工艺单": 1},
+        }
+    from feishu_bitable_process import 检查工厂字典
+    字段结构 = {"上传附件": 17}
+    for 工厂名称 in 检查工厂字典:
+        字段结构.update({f"{工厂名称}（偏差）": 1, f"{工厂名称}（翅类中值）": 1})
+    return {模拟来源表: 字段结构}
+
+def 构建运行环境(服务, 脚本名, 行ID列表, 并发数, 指标文件, 快照目录=None, 内存预算MB=None, 附加变量=None):
+    """脚本子进程的环境变量：指向模拟服务，按行数选择 ROW_ID / ROW_IDS；附加变量最后覆盖（如回放载荷中的表格参数）"""
+    环境变量 = dict(os.environ)
+    环境变量.update(脚本配置[脚本名][2])
+    环境变量.update({
+        "FEISHU_BASE_URL": 服务.基础地址,
+        "DWBG_TOKEN": 模拟APP_TOKEN,
+        "DWBG_TABLE_ID": 模拟来源表,
+        "ROW_ID": 行ID列表[0] if len(行ID列表) == 1 else "",
+        "ROW_IDS": json.dumps(行ID列表) if len(行ID列表) > 1 else "",
+        "MAX_WORKERS": str(并发数),
+        "METRICS_FILE": 指标文件,
+        "METRICS_STEP_SUMMARY": "0",
+        "PYTHONIOENCODING": "utf-8",
+    })
+    if 快照目录:
+        环境变量["SNAPSHOT_DIR"] = 快照目录
+    if 内存预算MB:
+        环境变量["MAX_MEMORY_MB"] = str(内存预算MB)
+    环境变量.update(附加变量 or {})
+    return 环境变量
+
+def 读取指标文件(指标文件):
+    """读取并删除脚本写出的指标JSON，读取失败返回空字典"""
+    try:
+        with open(指标文件, "r", encoding="utf-8") as f:
+            return json.loads(f.read() or "{}")
+    except (OSError, ValueError):
+        return {}
+    finally:
+        if os.path.exists(指标文件):
+            os.remove(指标文件)
+
+def 统计表记录数(服务, table_id):
+    return len(服务.数据.获取表(模拟APP_TOKEN, table_id))
+
+def 检查写入结果(服务, 脚本名, 行ID列表, 写入前记录数, 指标数据, FJ_ID=None):
+    """
+    按模拟服务中实际写入的数据检查一次运行，返回问题列表（为空表示通过）：
+    - QSA：目标表新增记录数等于失分点数且审核项与附件字段一致，来源行只写入与附件字段对应的得分字段
+    - 单重：目标表新增记录数等于提取行数
+    - 监测数据：每个来源行都写入了工厂统计字段
+    """
+    问题列表 = []
+    计数 = 指标数据.get("计数") or {}
+    新增记录 = list(服务.数据.获取表(模拟APP_TOKEN, 模拟目标表).values())[写入前记录数:]
+    来源表 = 服务.数据.获取表(模拟APP_TOKEN, 模拟来源表)
+    if 脚本名 == "feishu_QSA_script":
+        FJ_ID = FJ_ID or 脚本配置[脚本名][2]["FJ_ID"]
+        审核项 = "QSA+" if "QSA+" in FJ_ID.upper() else "QSA"
+        其他审核项 = "QSA" if 审核项 == "QSA+" else "QSA+"
+        if not 新增记录 or len(新增记录) != 计数.get("失分点数", 0):
+            问题列表.append(f"目标表新增 {len(新增记录)} 条，失分点数 {计数.get('失分点数', 0)}")
+        错误审核项 = [记录["fields"].get("审核项") for 记录 in 新增记录 if 记录["fields"].get("审核项") != 审核项]
+        if 错误审核项:
+            问题列表.append(f"{len(错误审核项)} 条失分点的审核项不是 {审核项}: {sorted(set(map(str, 错误审核项)))}")
+        for 行ID in 行ID列表:
+            字段 = 来源表.get(行ID, {}).get("fields", {})
+            if f"{审核项}得分" not in 字段:
+                问题列表.append(f"行 {行ID} 未写入 {审核项}得分")
+            if f"{其他审核项}得分" in 字段:
+                问题列表.append(f"行 {行ID} 写入了 {其他审核项}得分（附件字段为 {FJ_ID}）")
+    elif 脚本名 == "feishu_table_script":
+        if not 新增记录 or len(新增记录) != 计数.get("提取行数", 0):
+            问题列表.append(f"目标表新增 {len(新增记录)} 条，提取行数 {计数.get('提取行数', 0)}")
+    else:
+        for 行ID in 行ID列表:
+            if not any(字段名.endswith("（偏差）") for 字段名 in 来源表.get(行ID, {}).get("fields", {})):
+                问题列表.append(f"行 {行ID} 未写入工厂统计字段")
+    return 问题列表
+
+def 运行脚本(服务, 脚本名, 行ID列表, 并发数, 超时秒, 快照目录=None, 内存预算MB=None):
+    """以子进程运行脚本，返回耗时、退出码与脚本输出的指标汇总"""
+    脚本文件 = 脚本配置[脚本名][0]
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        指标文件 = f.name
+    环境变量 = 构建运行环境(服务, 脚本名, 行ID列表, 并发数, 指标文件, 快照目录, 内存预算MB)
+    写入前记录数 = 统计表记录数(服务, 模拟目标表)
+    开始 = time.perf_counter()
+    try:
+        进程 = subprocess.run([sys.executable, os.path.join(项目目录, 脚本文件)], cwd=项目目录, env=环境变量,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=超时秒)
+        退出码, 输出 = 进程.returncode, 进程.stdout.decode("utf-8", "replace")
+    except subprocess.TimeoutExpired as e:
+        退出码, 输出 = None, (e.stdout or b"").decode("utf-8", "replace")
+    耗时 = time.perf_counter() - 开始
+    指标数据 = 读取指标文件(指标文件)
+    return {"耗时秒": round(耗时, 4), "退出码": 退出码, "指标": 指标数据, "输出": 输出,
+            "数据问题": 检查写入结果(服务, 脚本名, 行ID列表, 写入前记录数, 指标数据)}
+
+def 执行基准(脚本文件映射, 每文件行数=1, 重复次数=1, 并发数=4, 延迟毫秒=0, 分页大小=100, 限流每秒=0, 超时秒=600, 显示输出=False, 快照目录=None, 内存预算MB=None):
+    """
+    :param 脚本文件映射: {脚本名: [工作簿路径, ...]}
+    :return: {脚本名: {"耗时秒": [...], "最小耗时秒", "平均耗时秒", "退出码", "指标", "接口调用": {...}}}
+    """
+    结果 = {}
+    for 脚本名, 文件列表 in 脚本文件映射.items():
+        if not 文件列表:
+            continue
+        # 每个脚本使用独立的模拟服务，接口调用统计互不干扰
+        服务 = 模拟飞书服务(("127.0.0.1", 0), 延迟毫秒, 分页大小, 限流每秒).后台启动()
+        try:
+            附件字段名 = 脚本配置[脚本名][1]
+            for table_id, 字段结构 in 获取字段结构配置(脚本名).items():
+                服务.数据.设置字段结构(模拟APP_TOKEN, table_id, 字段结构)
+            行ID列表 = [
+                服务.数据.添加附件记录(服务.基础地址, 模拟APP_TOKEN, 模拟来源表, [文件], 附件字段名)
+                for 文件 in 文件列表 for _ in range(每文件行数)
+            ]
+            运行列表 = []
+            for 序号 in range(重复次数):
+                单次 = 运行脚本(服务, 脚本名, 行ID列表, 并发数, 超时秒, 快照目录, 内存预算MB)
+                状态 = "✅" if 单次["退出码"] == 0 and not 单次["数据问题"] else "❌"
+                print(f"{状态} {脚本名} 第{序号 + 1}次: {单次['耗时秒']:.3f}s（{len(行ID列表)}行，退出码 {单次['退出码']}）")
+                for 问题 in 单次["数据问题"]:
+                    print(f"  ❌ 写入数据检查: {问题}")
+                if 显示输出 or 单次["退出码"] != 0 or 单次["数据问题"]:
+                    print(单次["输出"][-4000:])
+                运行列表.append(单次)
+            耗时列表 = [单次["耗时秒"] for 单次 in 运行列表]
+            结果[脚本名] = {
+                "行数": len(行ID列表),
+                "耗时秒": 耗时列表,
+                "最小耗时秒": min(耗时列表),
+                "平均耗时秒": round(sum(耗时列表) / len(耗时列表), 4),
+                "退出码": [单次["退出码"] for 单次 in 运行列表],
+                "数据问题": [单次["数据问题"] for 单次 in 运行列表],
+                "指标": 运行列表[-1]["指标"],
+                "接口调用": dict(服务.数据.请求统计),
+            }
+        finally:
+            服务.停止()
+    return 结果
+
+def 打印报告(结果):
+    for 脚本名, 统计 in 结果.items():
+        print(f"\n### {脚本名}（{统计['行数']}行）最小 {统计['最小耗时秒']:.3f}s / 平均 {统计['平均耗时秒']:.3f}s")
+        for 名称, 阶段 in (统计["指标"].get("阶段") or {}).items():
+            print(f"  {名称:<10} 次数 {阶段['次数']:>4}  总耗时 {阶段['总耗时秒']:>8.3f}s  最大 {阶段['最大耗时秒']:>8.3f}s")
+        if 统计["指标"].get("计数"):
+            print(f"  计数: {json.dumps(统计['指标']['计数'], ensure_ascii=False)}")
+        for 名称, 峰值 in (统计["指标"].get("内存") or {}).items():
+            print(f"  内存 {名称:<8} RSS峰值 {峰值['RSS峰值MB']:>8.1f}MB  Python分配峰值 {峰值['Python分配峰值MB']:>8.1f}MB")
+        print(f"  接口调用: {json.dumps(统计['接口调用'], ensure_ascii=False)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="基于本地模拟飞书服务的端到端基准测试")
+    parser.add_argument("--qsa", nargs="*", default=[], help="QSA审核工作簿（feishu_QSA_script）")
+    parser.add_argument("--dz", nargs="*", default=[], help="单重数据工作簿（feishu_table_script）")
+    parser.add_argument("--jc", nargs="*", default=[], help="监测数据工作簿（feishu_bitable_process）")
+    parser.add_argument("--qsa-rows", type=int, default=200, help="未指定工作簿时：生成的QSA检查表条款数")
+    parser.add_argument("--dz-rows", type=int, default=20, help="未指定工作簿时：生成的单重每组个数")
+    parser.add_argument("--dz-sheets", type=int, default=8, help="未指定工作簿时：生成的单重工作表数")
+    parser.add_argument("--jc-rows", type=int, default=5000, help="未指定工作簿时：生成的监测数据行数")
+    parser.add_argument("--no-inject-id", action="store_true", help="未指定工作簿时：生成的工作簿不注入id属性")
+    parser.add_argument("--rows-per-file", type=int, default=1, help="每个工作簿预置的记录数（>1时以ROW_IDS多行模式运行）")
+    parser.add_argument("--repeat", type=int, default=1, help="每个脚本重复运行次数")
+    parser.add_argument("--max-workers", type=int, default=4, help="传给脚本的 MAX_WORKERS")
+    parser.add_argument("--latency-ms", type=float, default=0, help="模拟接口延迟（毫秒）")
+    parser.add_argument("--page-size", type=int, default=100, help="模拟 records/search 每页最大条数")
+    parser.add_argument("--rate-limit", type=float, default=0, help="模拟每秒请求上限，0为不限流")
+    parser.add_argument("--timeout", type=float, default=600, help="单次运行超时（秒）")
+    parser.add_argument("--snapshot-dir", help="传给脚本的 SNAPSHOT_DIR（配合 --repeat 测量命中解析快照后的耗时）")
+    parser.add_argument("--max-memory", type=float, help="传给脚本的 MAX_MEMORY_MB（内存上限模式，同时输出各阶段内存峰值）")
+    parser.add_argument("--output", help="结果JSON输出路径")
+    parser.add_argument("--verbose", action="store_true", help="打印脚本完整输出")
+    args = parser.parse_args()
+
+    脚本文件映射 = {
+        "feishu_QSA_script": args.qsa,
+        "feishu_table_script": args.dz,
+        "feishu_bitable_process": args.jc,
+    }
+    临时目录 = None
+    if not any(脚本文件映射.values()):
+        # 未指定工作簿时生成合成数据，三个脚本都参与
+        临时目录 = tempfile.mkdtemp(prefix="feishu_bench_")
+        print(f"🧪 未指定工作簿，生成合成数据到 {临时目录} ...")
+        生成结果 = 生成默认工作簿(临时目录, args.qsa_rows, args.dz_rows, args.dz_sheets, args.jc_rows,
+                             not args.no_inject_id)
+        脚本文件映射 = {
+            "feishu_QSA_script": 生成结果["qsa"],
+            "feishu_table_script": 生成结果["dz"],
+            "feishu_bitable_process": 生成结果["jc"],
+        }
+
+    try:
+        结果 = 执行基准(脚本文件映射, args.rows_per_file, args.repeat, args.max_workers,
+                      args.latency_ms, args.page_size, args.rate_limit, args.timeout, args.verbose,
+                      args.snapshot_dir, args.max_memory)
+    finally:
+        if 临时目录:
+            shutil.rmtree(临时目录, ignore_errors=True)
+    打印报告(结果)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(结果, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已写入 {args.output}")
+    失败 = any(退出码 != 0 for 统计 in 结果.values() for 退出码 in 统计["退出码"]) or \
+        any(问题 for 统计 in 结果.values() for 问题 in 统计["数据问题"])
+    return 1 if 失败 else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
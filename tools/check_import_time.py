@@ -0,0 +1,84 @@
+'''入口脚本导入耗时检查（基于 python -X importtime，作为导入性能回归检查）'''
+import os
+import sys
+import argparse
+import subprocess
+
+项目目录 = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 需要检查的入口脚本
+入口模块列表 = ["feishu_QSA_script", "feishu_table_script", "feishu_bitable_process"]
+
+# 这些重量级依赖只允许在真正需要时（函数内部）导入
+禁止预加载模块 = ["pandas", "numpy", "lark_oapi", "openpyxl", "pyexcel", "xlrd", "python_calamine", "requests"]
+
+# 单个入口模块自身的累计导入耗时预算（毫秒）
+默认预算毫秒 = 150
+
+def 解析导入耗时(输出文本):
+    """解析 -X importtime 输出，返回 [(模块名, 自身微秒, 累计微秒), ...]"""
+    结果 = []
+    for 行 in 输出文本.splitlines():
+        if not 行.startswith("import time:") or "self [us]" in 行:
+            continue
+        自身, 累计, 模块 = [片段.strip() for 片段 in 行[len("import time:"):].split("|")]
+        结果.append((模块, int(自身), int(累计)))
+    return 结果
+
+def 测量导入(模块名, 脚本模式=False):
+    """
+    在子进程中测量导入耗时
+    :param 脚本模式: True 时按 `python <脚本>.py` 运行（清空配置环境变量，在 validate_environment 处提前退出）
+    """
+    环境 = {键: 值 for 键, 值 in os.environ.items()
+          if 键 not in ("APP_ID", "APP_SECRET", "FEISHU_APP_ID", "FEISHU_APP_SECRET", "ROW_ID", "ROW_IDS")}
+    if 脚本模式:
+        命令 = [sys.executable, "-X", "importtime", os.path.join(项目目录, f"{模块名}.py")]
+    else:
+        命令 = [sys.executable, "-X", "importtime", "-c", f"import {模块名}"]
+    进程 = subprocess.run(命令, cwd=项目目录, env=环境, capture_output=True, text=True)
+    return 解析导入耗时(进程.stderr)
+
+def 检查模块(模块名, 预算毫秒, 显示前几项=10, 脚本模式=False):
+    """检查单个入口模块，返回问题列表"""
+    记录列表 = 测量导入(模块名, 脚本模式)
+    问题列表 = []
+    已加载 = {模块.strip() for 模块, _, _ in 记录列表}
+    for 重模块 in 禁止预加载模块:
+        if 重模块 in 已加载:
+            问题列表.append(f"{模块名}: 启动时预加载了重量级依赖 {重模块}")
+    总耗时 = sum(自身 for _, 自身, _ in 记录列表) / 1000
+    自身累计 = next((累计 / 1000 for 模块, _, 累计 in 记录列表 if 模块.strip() == 模块名), None)
+    模式 = "脚本运行" if 脚本模式 else "import"
+    print(f"\n📦 {模块名}（{模式}）：全部导入 {总耗时:.1f} ms", end="")
+    if 自身累计 is not None:
+        print(f"，入口模块累计 {自身累计:.1f} ms（预算 {预算毫秒} ms）")
+        if 自身累计 > 预算毫秒:
+            问题列表.append(f"{模块名}: 导入耗时 {自身累计:.1f} ms 超出预算 {预算毫秒} ms")
+    else:
+        print()
+    for 模块, 自身, 累计 in sorted(记录列表, key=lambda 项: 项[1], reverse=True)[:显示前几项]:
+        print(f"   {自身 / 1000:8.1f} ms  {模块.strip()}")
+    return 问题列表
+
+def main():
+    parser = argparse.ArgumentParser(description="检查入口脚本的导入耗时与重量级依赖预加载")
+    parser.add_argument("--budget-ms", type=float, default=默认预算毫秒, help="入口模块累计导入耗时预算（毫秒）")
+    parser.add_argument("--top", type=int, default=10, help="显示自身耗时最高的前N个模块")
+    args = parser.parse_args()
+
+    问题列表 = []
+    for 模块名 in 入口模块列表:
+        问题列表 += 检查模块(模块名, args.budget_ms, args.top)
+    # 缺少环境变量时的提前退出路径（validate_environment 之前不应加载重量级依赖）
+    问题列表 += 检查模块("feishu_bitable_process", args.budget_ms, args.top, 脚本模式=True)
+
+    if 问题列表:
+        print("\n❌ 导入耗时检查未通过:")
+        for 问题 in 问题列表:
+            print(f"  - {问题}")
+        sys.exit(1)
+    print("\n✅ 导入耗时检查通过")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+'''Excel 读取引擎基准：对同一组工作簿分别用各引擎（feishu_excel）解析，统计吞吐量并逐单元格比对结果
+
+未指定工作簿时生成合成数据（QSA审核表 / 单重数据表 / 监测数据表，不注入id属性，openpyxl 可直接读取）
+以第一个可用引擎的结果为基准，其他引擎的单元格值或类型不一致时列出差异并以退出码1结束
+'''
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from generate_workbooks import 生成默认工作簿
+from feishu_excel import 引擎配置, 引擎可用, 识别表格格式, 打开工作簿
+
+def 单元格相等(a, b):
+    """值与类型都相同才算一致（同类型的空值 NaN/NaT/None 视为相等）"""
+    import pandas as pd
+    if type(a) is not type(b):
+        return False
+    if pd.api.types.is_scalar(a) and pd.isna(a) and pd.isna(b):
+        return True
+    return a == b
+
+def 解析全部工作表(路径, 引擎, header):
+    """返回 ({工作表名: (列名列表, 行列表)}, 单元格数)"""
+    结果 = {}
+    单元格数 = 0
+    with 打开工作簿(路径, 引擎=引擎) as 工作簿:
+        if 工作簿.引擎 != 引擎:
+            raise RuntimeError(f"引擎 {引擎} 不可用于该文件（实际使用 {工作簿.引擎}）")
+        for 名称 in 工作簿.工作表名称:
+            df = 工作簿.读取(名称, header=header)
+            结果[名称] = (list(df.columns), df.values.tolist())
+            单元格数 += df.size
+    return 结果, 单元格数
+
+def 比对(基准, 结果, 最多差异=5):
+    """返回差异描述列表（最多 最多差异 条）"""
+    差异 = []
+    if list(基准) != list(结果):
+        return [f"工作表不同: {list(基准)} vs {list(结果)}"]
+    for 名称, (基准列, 基准行) in 基准.items():
+        列, 行列表 = 结果[名称]
+        if len(基准列) != len(列) or not all(map(单元格相等, 基准列, 列)):
+            差异.append(f"[{名称}] 列名不同: {基准列[:8]} vs {列[:8]}")
+        if len(基准行) != len(行列表):
+            差异.append(f"[{名称}] 行数不同: {len(基准行)} vs {len(行列表)}")
+            continue
+        for 行号, (基准值行, 值行) in enumerate(zip(基准行, 行列表)):
+            for 列号, (x, y) in enumerate(zip(基准值行, 值行)):
+                if not 单元格相等(x, y):
+                    差异.append(f"[{名称}] ({行号}, {列号}): {x!r}({type(x).__name__}) vs {y!r}({type(y).__name__})")
+                    if len(差异) >= 最多差异:
+                        return 差异
+    return 差异
+
+def 执行基准(文件列表, 引擎列表, 重复次数=3, header=None):
+    """
+    :return: {文件名: {引擎: {"最小耗时秒", "单元格数", "单元格每秒", "MB每秒", "一致", "差异"} | {"错误": ...}}}
+    """
+    报告 = {}
+    for 路径 in 文件列表:
+        with open(路径, "rb") as f:
+            格式 = 识别表格格式(f.read(8))
+        文件大小 = os.path.getsize(路径)
+        报告[os.path.basename(路径)] = 文件报告 = {}
+        基准结果 = None
+        for 引擎 in 引擎列表:
+            if 格式 not in 引擎配置[引擎][1]:
+                continue
+            try:
+                耗时列表 = []
+                for _ in range(重复次数):
+                    开始 = time.perf_counter()
+                    结果, 单元格数 = 解析全部工作表(路径, 引擎, header)
+                    耗时列表.append(time.perf_counter() - 开始)
+            except Exception as e:
+                文件报告[引擎] = {"错误": f"{type(e).__name__}: {str(e)[:200]}"}
+                continue
+            最小耗时 = min(耗时列表)
+            统计 = {
+                "最小耗时秒": round(最小耗时, 4),
+                "单元格数": 单元格数,
+                "单元格每秒": round(单元格数 / 最小耗时) if 最小耗时 else None,
+                "MB每秒": round(文件大小 / 1048576 / 最小耗时, 2) if 最小耗时 else None,
+            }
+            if 基准结果 is None:
+                基准结果 = 结果
+                统计["一致"] = True
+                统计["基准"] = True
+            else:
+                差异 = 比对(基准结果, 结果)
+                统计["一致"] = not 差异
+                if 差异:
+                    统计["差异"] = 差异
+            文件报告[引擎] = 统计
+    return 报告
+
+def 打印报告(报告):
+    for 文件名, 文件报告 in 报告.items():
+        print(f"\n### {文件名}")
+        for 引擎, 统计 in 文件报告.items():
+            if "错误" in 统计:
+                print(f"  {引擎:<9} ⚠️ 跳过: {统计['错误']}")
+                continue
+            标记 = "基准" if 统计.get("基准") else ("✅ 一致" if 统计["一致"] else "❌ 不一致")
+            print(f"  {引擎:<9} {统计['最小耗时秒']:>8.3f}s  {统计['单元格每秒']:>10} 单元格/s  "
+                  f"{统计['MB每秒']:>7} MB/s  {标记}")
+            for 描述 in 统计.get("差异", []):
+                print(f"      {描述}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Excel 读取引擎吞吐量与结果一致性基准")
+    parser.add_argument("files", nargs="*", help="工作簿路径（未指定时生成合成数据）")
+    parser.add_argument("--engines", nargs="*", default=None,
+                        help=f"参与比较的引擎（默认全部已安装的: {' '.join(引擎配置)}），第一个为基准")
+    parser.add_argument("--repeat", type=int, default=3, help="每个引擎重复解析次数（取最小耗时）")
+    parser.add_argument("--header", choices=["none", "0"], default="none",
+                        help="none=无表头（QSA/单重脚本的读法），0=首行为表头（监测数据脚本的读法）")
+    parser.add_argument("--qsa-rows", type=int, default=200, help="未指定工作簿时：生成的QSA检查表条款数")
+    parser.add_argument("--dz-rows", type=int, default=20, help="未指定工作簿时：生成的单重每组个数")
+    parser.add_argument("--dz-sheets", type=int, default=8, help="未指定工作簿时：生成的单重工作表数")
+    parser.add_argument("--jc-rows", type=int, default=5000, help="未指定工作簿时：生成的监测数据行数")
+    parser.add_argument("--output", help="结果JSON输出路径")
+    args = parser.parse_args()
+
+    引擎列表 = [引擎 for 引擎 in (args.engines or ["openpyxl", "calamine", "xlrd", "pyexcel"]) if 引擎可用(引擎)]
+    if not 引擎列表:
+        print("❌ 没有可用的Excel引擎")
+        return 1
+    print(f"🔧 参与比较的引擎: {引擎列表}")
+
+    临时目录 = None
+    文件列表 = args.files
+    if not 文件列表:
+        临时目录 = tempfile.mkdtemp(prefix="feishu_excel_bench_")
+        print(f"🧪 未指定工作簿，生成合成数据到 {临时目录} ...")
+        生成结果 = 生成默认工作簿(临时目录, args.qsa_rows, args.dz_rows, args.dz_sheets, args.jc_rows, False)
+        文件列表 = 生成结果["qsa"] + 生成结果["dz"] + 生成结果["jc"]
+    try:
+        报告 = 执行基准(文件列表, 引擎列表, args.repeat, None if args.header == "none" else 0)
+    finally:
+        if 临时目录:
+            shutil.rmtree(临时目录, ignore_errors=True)
+    打印报告(报告)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(报告, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已写入 {args.output}")
+    不一致 = any(not 统计.get("一致", True) for 文件报告 in 报告.values() for 统计 in 文件报告.values())
+    return 1 if 不一致 else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
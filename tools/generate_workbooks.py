@@ -0,0 +1,232 @@
+'''合成测试工作簿生成器（QSA审核表 / 单重数据表 / 监测数据表），用于大规模基准测试'''
+import os
+import re
+import sys
+import random
+import shutil
+import argparse
+import zipfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 与脚本中的工厂映射保持一致（工作簿中出现的是工厂全称）
+from feishu_bitable_process import 检查工厂字典
+工厂全称列表 = [全称 for 全称列表 in 检查工厂字典.values() for 全称 in 全称列表]
+
+# 能被 feishu_bitable_process.判断品项 识别的品名，末尾一个用于覆盖“匹配失败跳过”分支
+品名列表 = ["速冻调理九块鸡2.0", "冷冻调味鸡架", "速冻调理烤翅用鸡翅根2.0", "速冻调理辣翅用鸡翅中2.0",
+          "速冻调理鸡腿肉丁2.0", "速冻调理115汉堡用鸡腿肉2.0", "未登记测试品项"]
+
+# 单重工作表的四种布局（见 feishu_table_script.获取单重数据）
+单重工序列表 = ["蒸煮后", "炸后", "一次包装", "原料全检"]
+
+# 单重数据起始行（"第1个"所在行）与时间行、时间列范围
+单重数据起始行 = 9
+单重时间行 = 7
+单重时间起始列 = 7
+单重最大组数 = 25
+
+def 创建工作簿():
+    import openpyxl
+    return openpyxl.Workbook(write_only=True)
+
+def 补齐行(行内容, 列数):
+    return list(行内容) + [None] * (列数 - len(行内容))
+
+def 生成QSA工作簿(路径, 行数=200, 失分比例=0.1, 审核项="QSA", 随机种子=0):
+    """
+    生成QSA审核工作簿：「汇总」表（基础信息与得分）+「检查表」（含"符合级别"列）
+    :param 行数: 检查表条款行数
+    :param 失分比例: 符合级别为 S/P 的条款比例
+    """
+    随机 = random.Random(随机种子)
+    wb = 创建工作簿()
+    审核开始 = datetime(2025, 3, 1) + timedelta(days=随机.randint(0, 200))
+
+    汇总表 = wb.create_sheet("汇总" if 审核项 == "QSA" else "新增章节汇总")
+    汇总表.append([f"{审核项}审核报告"])
+    汇总表.append([])
+    for 标签, 值 in [
+        ("工厂名称：", 随机.choice(工厂全称列表)),
+        ("审核员姓名：", 随机.choice(["张三", "李四", "王五"])),
+        ("审核开始日期：", 审核开始),
+        ("审核结束日期：", 审核开始 + timedelta(days=2)),
+        ("得分", round(随机.uniform(0.6, 1.0), 4)),
+    ]:
+        # 取值列 = 标签列 + 2
+        汇总表.append([None, 标签, None, 值])
+
+    检查表 = wb.create_sheet("检查表")
+    检查表.append(["序号", "章节", "审核条款", "条款标准", "符合级别", "问题描述", "根因分析", "改进计划", "计划完成期限"])
+    for 序号 in range(1, 行数 + 1):
+        if 随机.random() < 失分比例:
+            检查表.append([
+                序号, f"第{序号 // 20 + 1}章", f"{序号 // 20 + 1}.{序号 % 20 + 1}", f"条款标准说明{序号}",
+                随机.choice(["S", "P", "s", "p"]), f"问题描述{序号}", f"根因分析{序号}", f"改进计划{序号}",
+                审核开始 + timedelta(days=随机.randint(7, 60)),
+            ])
+        else:
+            检查表.append([
+                序号, f"第{序号 // 20 + 1}章", f"{序号 // 20 + 1}.{序号 % 20 + 1}", f"条款标准说明{序号}",
+                随机.choice(["A", "B", "N/A"]),
+            ])
+    wb.save(路径)
+    return 路径
+
+def 生成单重工作表(ws, 工序, 每组数列, 组数, 随机, 开始时间):
+    """按 获取单重数据 对应工序的单元格位置写入一个单重工作表"""
+    列数 = 单重时间起始列 + 单重最大组数
+    表头 = [补齐行([], 列数) for _ in range(单重数据起始行)]
+    品名, 工艺单 = 随机.choice(品名列表[:-1]), f"GYD-{随机.randint(1000, 9999)}"
+    标准下限, 标准上限 = 随机.choice([(20, 30), (25, 35), (30, 45)])
+    for 行号, 标签 in enumerate(["品名", "工艺单", "工序", "标准", "每组数列"]):
+        表头[行号][0] = 标签
+    if 工序 == "蒸煮后":
+        # 值在第2列（"工序"标签后第2格）
+        表头[0][2], 表头[1][2], 表头[2][2] = 品名, 工艺单, 工序
+        表头[3][2], 表头[3][3], 表头[4][2] = 标准下限, 标准上限, 每组数列
+        表头[3][4], 表头[5][4] = "白班监控人", "夜班监控人"
+    else:
+        表头[0][1], 表头[1][1], 表头[2][1], 表头[4][1] = 品名, 工艺单, 工序, 每组数列
+        if 工序 == "一次包装":
+            表头[3][2], 表头[3][3] = 标准下限, 标准上限
+            表头[7][3], 表头[8][3] = "白班监控人", "夜班监控人"
+        else:
+            表头[3][1], 表头[3][2] = 标准下限, 标准上限
+            表头[5][2], 表头[5][3] = "白班监控人", "夜班监控人"
+    表头[单重时间行][1] = "检测时间"
+    for 组 in range(组数):
+        表头[单重时间行][单重时间起始列 + 组] = 开始时间 + timedelta(minutes=30 * 组)
+    for 行内容 in 表头:
+        ws.append(行内容)
+    for 片数 in range(每组数列):
+        行内容 = 补齐行([None, f"第{片数 + 1}个"], 列数)
+        for 组 in range(组数):
+            # 少量空值与0值，覆盖“非整数/0不计入”的分支
+            抽样 = 随机.random()
+            if 抽样 < 0.02:
+                continue
+            行内容[2 + 组] = 0 if 抽样 < 0.03 else 随机.randint(标准下限 - 3, 标准上限 + 3)
+        ws.append(行内容)
+
+def 生成单重工作簿(路径, 每组数列=20, 工作表数=4, 组数=单重最大组数, 随机种子=0):
+    """
+    生成单重数据工作簿，工作表依次轮换 蒸煮后/炸后/一次包装/原料全检 四种布局
+    :param 每组数列: 每组单重个数（数据行数）
+    :param 组数: 每个工作表的检测组数（最多25，对应时间行第7~31列）
+    """
+    随机 = random.Random(随机种子)
+    wb = 创建工作簿()
+    开始时间 = datetime(2025, 3, 1, 8, 0, 0)
+    for 序号 in range(工作表数):
+        工序 = 单重工序列表[序号 % len(单重工序列表)]
+        ws = wb.create_sheet(f"{工序}{序号 + 1}")
+        生成单重工作表(ws, 工序, 每组数列, min(组数, 单重最大组数), 随机, 开始时间 + timedelta(days=序号))
+    wb.save(路径)
+    return 路径
+
+def 生成监测数据工作簿(路径, 行数=1000, 随机种子=0):
+    """
+    生成「监测数据」工作簿（列位置与 feishu_bitable_process.处理单行 一致）
+    :param 行数: 数据行数（不含两行表头），支持到百万级（write_only 流式写入）
+    """
+    随机 = random.Random(随机种子)
+    wb = 创建工作簿()
+    ws = wb.create_sheet("监测数据")
+    ws.append(["监测数据导出"] + [None] * 15)
+    ws.append(["序号", "工厂", "工艺品类", "品项", "模块", "工序", "控制组", "控制点", "频次",
+               "检测时间", "检测人", "班次", "备注", "状态", "检测值", "控制标准"])
+    开始时间 = datetime(2025, 3, 1, 8, 0, 0)
+    控制点列表 = [("重量控制", "单枚重量"), ("外观控制", "外观"), ("温度控制", "中心温度"), ("规格控制", "尺寸")]
+    for 序号 in range(1, 行数 + 1):
+        控制组, 控制点 = 随机.choice(控制点列表)
+        # 大部分行满足筛选条件（原料鸡肉/生产过程监测/产品品质检查），其余覆盖过滤分支
+        满足条件 = 随机.random() < 0.8
+        ws.append([
+            序号,
+            随机.choice(工厂全称列表),
+            "原料鸡肉" if 满足条件 else "调理品",
+            随机.choice(品名列表),
+            "生产过程监测" if 满足条件 else "来料检验",
+            "产品品质检查",
+            控制组,
+            控制点,
+            "每2小时",
+            开始时间 + timedelta(minutes=随机.randint(0, 60 * 24 * 30)),
+            "检测员",
+            随机.choice(["白班", "夜班"]),
+            None,
+            "不合格" if 随机.random() < 0.05 else "合格",
+            ",".join(str(随机.randint(20, 40)) for _ in range(随机.randint(1, 5))),
+            "20-38",
+        ])
+    wb.save(路径)
+    return 路径
+
+def 注入工作表id属性(路径):
+    """
+    给工作表XML的 sheetView/sheetFormatPr 加上 id 属性（部分导出工具会写入），
+    openpyxl 读取会报错，用于触发脚本中的ZIP修复逻辑。仅改写 <sheetData> 之前的部分，大文件流式复制
+    """
+    临时路径 = f"{路径}.tmp"
+    with zipfile.ZipFile(路径, "r") as zip_in, zipfile.ZipFile(临时路径, "w", zipfile.ZIP_DEFLATED) as zip_out:
+        for item in zip_in.infolist():
+            if not (item.filename.startswith("xl/worksheets/") and item.filename.endswith(".xml")):
+                zip_out.writestr(item, zip_in.read(item.filename))
+                continue
+            with zip_in.open(item) as 源, zip_out.open(item.filename, "w", force_zip64=True) as 目标:
+                头部 = b""
+                while b"<sheetData" not in 头部:
+                    块 = 源.read(64 * 1024)
+                    if not 块:
+                        break
+                    头部 += 块
+                序号 = iter(range(1, 1000))
+                头部 = re.sub(rb"<(sheetView|sheetFormatPr)(?=[\s/>])",
+                            lambda m: m.group(0) + f' id="{next(序号)}"'.encode(), 头部)
+                目标.write(头部)
+                shutil.copyfileobj(源, 目标, 1024 * 1024)
+    os.replace(临时路径, 路径)
+    return 路径
+
+def 生成默认工作簿(输出目录, QSA行数=200, 单重每组数列=20, 单重工作表数=8, 监测数据行数=5000, 注入id=True, 随机种子=0):
+    """生成基准测试默认使用的三类工作簿，返回 {"qsa": [...], "dz": [...], "jc": [...]}"""
+    os.makedirs(输出目录, exist_ok=True)
+    结果 = {
+        "qsa": [生成QSA工作簿(os.path.join(输出目录, "QSA审核报告.xlsx"), QSA行数, 随机种子=随机种子)],
+        "dz": [生成单重工作簿(os.path.join(输出目录, "单重数据.xlsx"), 单重每组数列, 单重工作表数, 随机种子=随机种子)],
+        "jc": [生成监测数据工作簿(os.path.join(输出目录, "监测数据.xlsx"), 监测数据行数, 随机种子)],
+    }
+    if 注入id:
+        # 监测数据脚本没有ZIP修复逻辑，只对QSA/单重工作簿注入
+        for 路径 in 结果["qsa"] + 结果["dz"]:
+            注入工作表id属性(路径)
+    return 结果
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成测试工作簿")
+    parser.add_argument("layout", choices=["qsa", "dz", "jc"], help="qsa=QSA审核表，dz=单重数据表，jc=监测数据表")
+    parser.add_argument("-o", "--output", required=True, help="输出文件路径（.xlsx）")
+    parser.add_argument("--rows", type=int, default=None,
+                        help="规模：qsa为检查表条款数，dz为每组单重个数，jc为数据行数")
+    parser.add_argument("--sheets", type=int, default=4, help="dz：工作表数量（四种布局轮换）")
+    parser.add_argument("--groups", type=int, default=单重最大组数, help="dz：每个工作表的检测组数（≤25）")
+    parser.add_argument("--fail-rate", type=float, default=0.1, help="qsa：S/P失分条款比例")
+    parser.add_argument("--kind", choices=["QSA", "QSA+"], default="QSA", help="qsa：审核项类型")
+    parser.add_argument("--inject-id", action="store_true", help="给工作表XML注入id属性（触发ZIP修复）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    if args.layout == "qsa":
+        生成QSA工作簿(args.output, args.rows or 200, args.fail_rate, args.kind, args.seed)
+    elif args.layout == "dz":
+        生成单重工作簿(args.output, args.rows or 20, args.sheets, args.groups, args.seed)
+    else:
+        生成监测数据工作簿(args.output, args.rows or 1000, args.seed)
+    if args.inject_id:
+        注入工作表id属性(args.output)
+    print(f"✅ 已生成 {args.output}（{os.path.getsize(args.output) / 1024:.1f} KB）")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+'''负载测试：按设定的到达速率与并发上限回放 repository_dispatch 载荷，每个事件以子进程运行对应脚本（与 Actions 每次触发一次运行一致）
+
+- 载荷文件为 JSON 数组或每行一个JSON：{"event_type": "feishu_QSA_trigger", "client_payload": {"DWBG_TOKEN", "DWBG_TABLE_ID", "ROW_ID", "FJ_ID", ...}}
+  未指定时为三类事件各生成一条载荷；回放前在模拟服务中按载荷的表格与 ROW_ID 预置带合成附件的记录
+- 到达方式：uniform（固定间隔）或 poisson（指数间隔），--rate 0 表示全部同时到达；超过 --concurrency 的事件排队等待
+- 延迟从事件到达算起（含排队），错误为退出码非0或超时；另统计输出中含 ❌ 的运行、模拟服务的限流拒绝次数与子进程RSS峰值
+- --concurrency 可给多个值，依次运行（每个并发级别使用新的模拟服务），用于找出限流或内存成为瓶颈的并发点
+'''
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mock_feishu_server import 模拟飞书服务
+from generate_workbooks import 生成默认工作簿
+from benchmark import 项目目录, 脚本配置, 模拟APP_TOKEN, 模拟来源表, 构建运行环境, 读取指标文件, 获取字段结构配置
+
+# 事件类型 → (脚本名, 合成工作簿类别)，与各工作流的 repository_dispatch types 一致
+事件配置 = {
+    "feishu_QSA_trigger": ("feishu_QSA_script", "qsa"),
+    "feishu_Dzsj_trigger": ("feishu_table_script", "dz"),
+    "feishu_bitable_process": ("feishu_bitable_process", "jc"),
+}
+
+def 读取载荷(路径):
+    """读取录制的载荷（JSON 数组或 JSONL），返回 [{"event_type", "client_payload"}, ...]"""
+    with open(路径, "r", encoding="utf-8") as f:
+        文本 = f.read().strip()
+    if 文本.startswith("["):
+        事件列表 = json.loads(文本)
+    else:
+        事件列表 = [json.loads(行) for 行 in 文本.splitlines() if 行.strip()]
+    for 事件 in 事件列表:
+        if 事件.get("event_type") not in 事件配置:
+            raise ValueError(f"不支持的事件类型: {事件.get('event_type')}，可选: {list(事件配置)}")
+    return 事件列表
+
+def 默认载荷(事件类型列表):
+    return [{
+        "event_type": 事件类型,
+        "client_payload": {
+            "DWBG_TOKEN": 模拟APP_TOKEN,
+            "DWBG_TABLE_ID": 模拟来源表,
+            "ROW_ID": f"recLoad{序号:04d}",
+            **({"FJ_ID": 脚本配置["feishu_QSA_script"][2]["FJ_ID"]} if 事件类型 == "feishu_QSA_trigger" else {}),
+        },
+    } for 序号, 事件类型 in enumerate(事件类型列表)]
+
+def 载荷行ID(载荷):
+    行ID列表 = 载荷.get("ROW_IDS") or []
+    if isinstance(行ID列表, str):
+        行ID列表 = [行ID.strip() for 行ID in 行ID列表.replace("\n", ",").split(",")]
+    if 载荷.get("ROW_ID"):
+        行ID列表 = list(行ID列表) + [载荷["ROW_ID"]]
+    return [str(行ID) for 行ID in dict.fromkeys(行ID列表) if 行ID]
+
+def 预置数据(服务, 事件列表, 工作簿):
+    """按载荷中的表格与行ID预置带附件的记录，并为涉及的表设置字段结构"""
+    for 事件 in 事件列表:
+        脚本名, 类别 = 事件配置[事件["event_type"]]
+        载荷 = 事件["client_payload"]
+        app_token, table_id = 载荷["DWBG_TOKEN"], 载荷["DWBG_TABLE_ID"]
+        附件字段名 = 载荷.get("FJ_ID") or 脚本配置[脚本名][1]
+        for 表, 字段结构 in 获取字段结构配置(脚本名).items():
+            if 表 == 模拟来源表:
+                表 = table_id
+                字段结构 = dict(字段结构, **{附件字段名: 17})
+            已有 = 服务.数据.字段结构.get((app_token, 表), {})
+            服务.数据.设置字段结构(app_token, 表, dict(已有, **字段结构))
+        for 行ID in 载荷行ID(载荷):
+            服务.数据.添加附件记录(服务.基础地址, app_token, table_id, 工作簿[类别], 附件字段名, record_id=行ID)
+
+def 生成到达时间(数量, 速率, 方式, 随机种子=0):
+    """返回相对开始时刻的到达时间（秒）列表"""
+    if not 速率:
+        return [0.0] * 数量
+    随机 = random.Random(随机种子)
+    时间列表 = []
+    当前 = 0.0
+    for _ in range(数量):
+        时间列表.append(当前)
+        当前 += 随机.expovariate(速率) if 方式 == "poisson" else 1 / 速率
+    return 时间列表
+
+def 运行子进程(命令, 环境变量, 超时秒):
+    """运行脚本，返回 (退出码, 输出, RSS峰值MB)；超时返回退出码None；RSS峰值仅在支持 wait4 的平台统计"""
+    with tempfile.TemporaryFile() as 输出文件:
+        进程 = subprocess.Popen(命令, cwd=项目目录, env=环境变量, stdout=输出文件, stderr=subprocess.STDOUT)
+        超时 = threading.Event()
+
+        def 终止():
+            超时.set()
+            进程.kill()
+
+        计时器 = threading.Timer(超时秒, 终止)
+        计时器.start()
+        RSS峰值MB = None
+        try:
+            if hasattr(os, "wait4"):
+                _, 状态, 资源 = os.wait4(进程.pid, 0)
+                进程.returncode = os.waitstatus_to_exitcode(状态)
+                # Linux 的 ru_maxrss 单位为KB，macOS 为字节
+                RSS峰值MB = round(资源.ru_maxrss / (1048576 if sys.platform == "darwin" else 1024), 1)
+            else:
+                进程.wait()
+        finally:
+            计时器.cancel()
+        输出文件.seek(0)
+        输出 = 输出文件.read().decode("utf-8", "replace")
+    return (None if 超时.is_set() else 进程.returncode), 输出, RSS峰值MB
+
+def 执行一次(服务, 事件, 脚本内并发数, 超时秒):
+    脚本名, _ = 事件配置[事件["event_type"]]
+    载荷 = 事件["client_payload"]
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        指标文件 = f.name
+    附加变量 = {"DWBG_TOKEN": 载荷["DWBG_TOKEN"], "DWBG_TABLE_ID": 载荷["DWBG_TABLE_ID"]}
+    if 载荷.get("FJ_ID"):
+        附加变量["FJ_ID"] = 载荷["FJ_ID"]
+    环境变量 = 构建运行环境(服务, 脚本名, 载荷行ID(载荷), 载荷.get("MAX_WORKERS") or 脚本内并发数, 指标文件,
+                      附加变量=附加变量)
+    退出码, 输出, RSS峰值MB = 运行子进程([sys.executable, os.path.join(项目目录, 脚本配置[脚本名][0])],
+                                 环境变量, 超时秒)
+    读取指标文件(指标文件)
+    return 退出码, 输出, RSS峰值MB
+
+def 百分位(数值列表, 百分比):
+    """最近秩法百分位"""
+    if not 数值列表:
+        return None
+    有序 = sorted(数值列表)
+    return 有序[max(0, min(len(有序) - 1, -(-len(有序) * 百分比 // 100) - 1))]
+
+def 汇总(结果列表, 墙钟秒):
+    延迟 = [结果["延迟秒"] for 结果 in 结果列表]
+    排队 = [结果["排队秒"] for 结果 in 结果列表]
+    RSS = [结果["RSS峰值MB"] for 结果 in 结果列表 if 结果["RSS峰值MB"] is not None]
+    错误数 = sum(1 for 结果 in 结果列表 if 结果["退出码"] != 0)
+    return {
+        "请求数": len(结果列表),
+        "错误数": 错误数,
+        "错误率": round(错误数 / len(结果列表), 4) if 结果列表 else 0,
+        "超时数": sum(1 for 结果 in 结果列表 if 结果["退出码"] is None),
+        "含❌输出数": sum(1 for 结果 in 结果列表 if 结果["含错误输出"]),
+        "吞吐量每秒": round(len(结果列表) / 墙钟秒, 3) if 墙钟秒 else None,
+        "延迟p50秒": 百分位(延迟, 50),
+        "延迟p95秒": 百分位(延迟, 95),
+        "延迟p99秒": 百分位(延迟, 99),
+        "排队p95秒": 百分位(排队, 95),
+        "RSS峰值MB": max(RSS) if RSS else None,
+    }
+
+def 执行负载(事件列表, 工作簿, 请求数, 并发数, 速率, 到达方式="uniform", 脚本内并发数=4, 延迟毫秒=0, 限流每秒=0,
+           超时秒=600, 随机种子=0, 显示失败输出=False):
+    """
+    在新的模拟服务上回放 请求数 个事件（循环使用事件列表），最多 并发数 个同时运行
+    :return: {"并发数", "总计": {...}, "按事件": {事件类型: {...}}, "接口调用": {...}}
+    """
+    服务 = 模拟飞书服务(("127.0.0.1", 0), 延迟毫秒, 限流每秒=限流每秒).后台启动()
+    try:
+        预置数据(服务, 事件列表, 工作簿)
+        到达时间 = 生成到达时间(请求数, 速率, 到达方式, 随机种子)
+        结果列表 = []
+        结果锁 = threading.Lock()
+        开始 = time.perf_counter()
+
+        def 任务(序号, 事件):
+            到达 = 开始 + 到达时间[序号]
+            执行开始 = time.perf_counter()
+            try:
+                退出码, 输出, RSS峰值MB = 执行一次(服务, 事件, 脚本内并发数, 超时秒)
+            except Exception as e:
+                退出码, 输出, RSS峰值MB = -1, f"❌ 运行失败: {str(e)}", None
+            完成 = time.perf_counter()
+            if 退出码 != 0 and 显示失败输出:
+                print(f"❌ 第{序号 + 1}个事件（{事件['event_type']}）退出码 {退出码}:\n{输出[-2000:]}")
+            with 结果锁:
+                结果列表.append({
+                    "事件类型": 事件["event_type"],
+                    "退出码": 退出码,
+                    "延迟秒": round(完成 - 到达, 4),
+                    "排队秒": round(执行开始 - 到达, 4),
+                    "RSS峰值MB": RSS峰值MB,
+                    "含错误输出": "❌" in 输出,
+                })
+
+        with ThreadPoolExecutor(max_workers=并发数, thread_name_prefix="负载") as 线程池:
+            for 序号 in range(请求数):
+                等待 = 开始 + 到达时间[序号] - time.perf_counter()
+                if 等待 > 0:
+                    time.sleep(等待)
+                线程池.submit(任务, 序号, 事件列表[序号 % len(事件列表)])
+        墙钟秒 = time.perf_counter() - 开始
+        接口调用 = dict(服务.数据.请求统计)
+    finally:
+        服务.停止()
+    按事件 = {}
+    for 结果 in 结果列表:
+        按事件.setdefault(结果["事件类型"], []).append(结果)
+    return {
+        "并发数": 并发数,
+        "墙钟秒": round(墙钟秒, 3),
+        "总计": 汇总(结果列表, 墙钟秒),
+        "按事件": {事件类型: 汇总(列表, 墙钟秒) for 事件类型, 列表 in 按事件.items()},
+        "接口调用": 接口调用,
+    }
+
+def 打印报告(报告列表):
+    print(f"\n{'并发':>4} {'请求':>5} {'错误率':>7} {'吞吐/s':>8} {'p50(s)':>8} {'p95(s)':>8} {'p99(s)':>8} "
+          f"{'排队p95':>8} {'RSS峰值MB':>10} {'限流拒绝':>8}")
+    for 报告 in 报告列表:
+        总计 = 报告["总计"]
+        print(f"{报告['并发数']:>4} {总计['请求数']:>5} {总计['错误率']:>7.1%} {总计['吞吐量每秒']:>8.3f} "
+              f"{总计['延迟p50秒']:>8.3f} {总计['延迟p95秒']:>8.3f} {总计['延迟p99秒']:>8.3f} "
+              f"{总计['排队p95秒']:>8.3f} {总计['RSS峰值MB'] or '-':>10} {报告['接口调用'].get('限流拒绝', 0):>8}")
+    for 报告 in 报告列表:
+        print(f"\n### 并发 {报告['并发数']}（墙钟 {报告['墙钟秒']:.3f}s）")
+        for 事件类型, 统计 in 报告["按事件"].items():
+            print(f"  {事件类型:<24} 请求 {统计['请求数']:>4}  错误 {统计['错误数']:>3}  含❌输出 {统计['含❌输出数']:>3}  "
+                  f"p50 {统计['延迟p50秒']:.3f}s  p95 {统计['延迟p95秒']:.3f}s  p99 {统计['延迟p99秒']:.3f}s")
+        print(f"  接口调用: {json.dumps(报告['接口调用'], ensure_ascii=False)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="按到达速率与并发上限回放 repository_dispatch 载荷的负载测试")
+    parser.add_argument("--payloads", help="录制的载荷文件（JSON数组或JSONL）；未指定时三类事件各生成一条")
+    parser.add_argument("--events", nargs="*", default=list(事件配置), choices=list(事件配置),
+                        help="未指定载荷文件时参与的事件类型")
+    parser.add_argument("--requests", type=int, default=30, help="回放的事件总数（循环使用载荷）")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4], help="同时运行的脚本数上限，可给多个值依次测试")
+    parser.add_argument("--rate", type=float, default=0, help="事件到达速率（个/秒），0为全部同时到达")
+    parser.add_argument("--arrival", choices=["uniform", "poisson"], default="uniform", help="到达间隔分布")
+    parser.add_argument("--max-workers", type=int, default=4, help="载荷未指定 MAX_WORKERS 时传给脚本的值")
+    parser.add_argument("--latency-ms", type=float, default=0, help="模拟接口延迟（毫秒）")
+    parser.add_argument("--rate-limit", type=float, default=0, help="模拟服务每秒请求上限，0为不限流")
+    parser.add_argument("--qsa-rows", type=int, default=200, help="合成QSA检查表条款数")
+    parser.add_argument("--dz-rows", type=int, default=20, help="合成单重每组个数")
+    parser.add_argument("--dz-sheets", type=int, default=8, help="合成单重工作表数")
+    parser.add_argument("--jc-rows", type=int, default=5000, help="合成监测数据行数")
+    parser.add_argument("--timeout", type=float, default=600, help="单次运行超时（秒）")
+    parser.add_argument("--seed", type=int, default=0, help="poisson 到达的随机种子")
+    parser.add_argument("--output", help="结果JSON输出路径")
+    parser.add_argument("--verbose", action="store_true", help="打印失败运行的输出")
+    args = parser.parse_args()
+
+    事件列表 = 读取载荷(args.payloads) if args.payloads else 默认载荷(args.events)
+    if not 事件列表:
+        print("❌ 没有可回放的载荷")
+        return 1
+    临时目录 = tempfile.mkdtemp(prefix="feishu_load_")
+    try:
+        print(f"🧪 生成合成附件到 {临时目录} ...")
+        工作簿 = 生成默认工作簿(临时目录, args.qsa_rows, args.dz_rows, args.dz_sheets, args.jc_rows)
+        报告列表 = []
+        for 并发数 in args.concurrency:
+            print(f"🚀 并发 {并发数}：回放 {args.requests} 个事件，到达速率 {args.rate or '不限'}/s（{args.arrival}）")
+            报告列表.append(执行负载(事件列表, 工作簿, args.requests, 并发数, args.rate, args.arrival,
+                              args.max_workers, args.latency_ms, args.rate_limit, args.timeout, args.seed,
+                              args.verbose))
+    finally:
+        shutil.rmtree(临时目录, ignore_errors=True)
+    打印报告(报告列表)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(报告列表, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已写入 {args.output}")
+    return 1 if any(报告["总计"]["错误数"] for 报告 in 报告列表) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,498 @@
+'''本地模拟飞书开放平台（用于离线基准测试与Worker联调，仅依赖标准库）'''
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import zlib
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class 模拟飞书数据:
+    """内存中的多维表格、附件与上传素材"""
+
+    def __init__(self):
+        self._锁 = threading.Lock()
+        self.表格 = {}      # (app_token, table_id) -> {record_id: record}
+        self.附件 = {}      # file_token -> (文件名, 字节)
+        self.下载中断次数 = 0  # 接下来的N次附件下载只返回一半内容后断开（用于测试续传）
+        self.上传素材 = {}  # file_token -> {"文件名", "parent_node", "字节"}
+        self.分片上传 = {}  # upload_id -> {"文件名", "parent_node", "大小", "分片大小", "分片数", "分片": {序号: 字节}}
+        self.待失败分片 = set()  # 首次上传即返回失败的分片序号（用于测试重试/续传）
+        self.请求统计 = {}  # 接口名 -> 次数
+        self.字段结构 = {}  # (app_token, table_id) -> {字段名: 字段类型}；设置后写入时校验字段名与取值类型
+
+    def 记录请求(self, 接口名):
+        with self._锁:
+            self.请求统计[接口名] = self.请求统计.get(接口名, 0) + 1
+
+    def 获取表(self, app_token, table_id):
+        with self._锁:
+            return self.表格.setdefault((app_token, table_id), {})
+
+    def 设置字段结构(self, app_token, table_id, 字段结构):
+        """:param 字段结构: {字段名: 字段类型}（1文本 2数字 3单选 4多选 5日期 7复选框 17附件 20公式 ...）"""
+        with self._锁:
+            self.字段结构[(app_token, table_id)] = dict(字段结构)
+
+    def 校验字段(self, app_token, table_id, fields):
+        """按字段结构校验写入的字段，返回 None 或 (错误码, 消息)；未设置字段结构的表不校验"""
+        字段结构 = self.字段结构.get((app_token, table_id))
+        if 字段结构 is None:
+            return None
+        for 字段名, 值 in fields.items():
+            类型 = 字段结构.get(字段名)
+            if 类型 is None:
+                return 1254045, f"FieldNameNotFound: {字段名}"
+            if 类型 in 只读字段类型:
+                return 1254001, f"WrongRequestBody: 只读字段 {字段名}"
+            if 值 is None:
+                continue
+            if 类型 == 2 and (isinstance(值, bool) or not isinstance(值, (int, float))):
+                return 1254061, f"NumberFieldConvFail: {字段名}"
+            if 类型 == 5 and (isinstance(值, bool) or not isinstance(值, int)):
+                return 1254064, f"DatetimeFieldConvFail: {字段名}"
+            if 类型 == 1 and not isinstance(值, (str, list)):
+                return 1254060, f"TextFieldConvFail: {字段名}"
+            if 类型 == 7 and not isinstance(值, bool):
+                return 1254067, f"CheckboxFieldConvFail: {字段名}"
+        return None
+
+    def 新增记录(self, app_token, table_id, fields, record_id=None):
+        record_id = record_id or f"rec{uuid.uuid4().hex[:12]}"
+        记录 = {"record_id": record_id, "fields": dict(fields)}
+        with self._锁:
+            self.表格.setdefault((app_token, table_id), {})[record_id] = 记录
+        return 记录
+
+    def 更新记录(self, app_token, table_id, record_id, fields):
+        with self._锁:
+            表 = self.表格.setdefault((app_token, table_id), {})
+            if record_id not in 表:
+                return None
+            表[record_id]["fields"].update(fields)
+            return 表[record_id]
+
+    def 添加附件(self, 文件名, 内容):
+        file_token = f"box{uuid.uuid4().hex[:16]}"
+        with self._锁:
+            self.附件[file_token] = (文件名, 内容)
+        return file_token
+
+    def 添加附件记录(self, 基础地址, app_token, table_id, 文件列表, 字段名="上传附件", 其他字段=None, record_id=None):
+        """
+        新增一条带附件的记录，返回 record_id
+        :param 文件列表: [本地文件路径, ...] 或 [(文件名, 字节), ...]
+        """
+        附件字段 = []
+        for 文件 in 文件列表:
+            if isinstance(文件, (tuple, list)):
+                文件名, 内容 = 文件
+            else:
+                文件名 = os.path.basename(文件)
+                with open(文件, "rb") as f:
+                    内容 = f.read()
+            file_token = self.添加附件(文件名, 内容)
+            附件字段.append({
+                "file_token": file_token,
+                "name": 文件名,
+                "size": len(内容),
+                "type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                "url": f"{基础地址}/open-apis/drive/v1/medias/{file_token}/download",
+                "tmp_url": f"{基础地址}/open-apis/drive/v1/medias/batch_get_tmp_download_url?file_tokens={file_token}",
+            })
+        fields = dict(其他字段 or {})
+        fields[字段名] = 附件字段
+        return self.新增记录(app_token, table_id, fields, record_id)["record_id"]
+
+# 公式、查找引用、创建/修改时间、创建/修改人、自动编号
+只读字段类型 = {19, 20, 1001, 1002, 1003, 1004, 1005}
+
+class 令牌桶:
+    """简单令牌桶限流（每秒N次，0表示不限流）"""
+
+    def __init__(self, 每秒次数):
+        self.每秒次数 = 每秒次数
+        self.容量 = max(1, 每秒次数)
+        self.剩余 = self.容量
+        self.上次时间 = time.monotonic()
+        self._锁 = threading.Lock()
+
+    def 获取(self):
+        if not self.每秒次数:
+            return True
+        with self._锁:
+            现在 = time.monotonic()
+            self.剩余 = min(self.容量, self.剩余 + (现在 - self.上次时间) * self.每秒次数)
+            self.上次时间 = 现在
+            if self.剩余 >= 1:
+                self.剩余 -= 1
+                return True
+            return False
+
+def 解析multipart(内容类型, 请求体):
+    """解析 multipart/form-data，返回 {字段名: 字节}"""
+    匹配 = re.search(r'boundary="?([^";]+)"?', 内容类型 or "")
+    if not 匹配:
+        return {}
+    分隔符 = ("--" + 匹配.group(1)).encode()
+    结果 = {}
+    for 片段 in 请求体.split(分隔符):
+        if b"\r\n\r\n" not in 片段:
+            continue
+        头部, 数据 = 片段.split(b"\r\n\r\n", 1)
+        名称 = re.search(rb'name="([^"]*)"', 头部)
+        if 名称:
+            结果[名称.group(1).decode("utf-8")] = 数据[:-2] if 数据.endswith(b"\r\n") else 数据
+    return 结果
+
+class 模拟飞书服务(ThreadingHTTPServer):
+    """
+    模拟飞书开放平台HTTP服务
+    :param 延迟毫秒: 每个请求的固定延迟
+    :param 分页大小: records/search 每页最大条数
+    :param 限流每秒: 每秒允许的请求数（超出返回 99991400）
+    :param 分片大小: upload_prepare 返回的 block_size（真实接口为4MB）
+    :param 支持Range: 附件下载是否支持 Range 分段请求（False 时忽略 Range，总是返回完整内容）
+    """
+    daemon_threads = True
+
+    def __init__(self, 地址=("127.0.0.1", 0), 延迟毫秒=0, 分页大小=100, 限流每秒=0, 数据=None, 分片大小=4 * 1024 * 1024,
+                 支持Range=True):
+        super().__init__(地址, 模拟请求处理)
+        self.分片大小 = 分片大小
+        self.支持Range = 支持Range
+        self.延迟毫秒 = 延迟毫秒
+        self.分页大小 = 分页大小
+        self.限流 = 令牌桶(限流每秒)
+        self.数据 = 数据 or 模拟飞书数据()
+
+    @property
+    def 基础地址(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def 后台启动(self):
+        """在后台线程中运行服务，返回自身"""
+        threading.Thread(target=self.serve_forever, name="mock-feishu", daemon=True).start()
+        return self
+
+    def 停止(self):
+        self.shutdown()
+        self.server_close()
+
+class 模拟请求处理(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    路由表 = [
+        ("POST", r"^/open-apis/auth/v3/tenant_access_token/internal/?$", "获取令牌"),
+        ("POST", r"^/open-apis/bitable/v1/apps/([^/]+)/tables/([^/]+)/records/search$", "查询记录"),
+        ("POST", r"^/open-apis/bitable/v1/apps/([^/]+)/tables/([^/]+)/records/batch_create$", "批量新增"),
+        ("POST", r"^/open-apis/bitable/v1/apps/([^/]+)/tables/([^/]+)/records/batch_update$", "批量更新"),
+        ("POST", r"^/open-apis/bitable/v1/apps/([^/]+)/tables/([^/]+)/records$", "新增记录"),
+        ("PUT", r"^/open-apis/bitable/v1/apps/([^/]+)/tables/([^/]+)/records/([^/]+)$", "更新记录"),
+        ("GET", r"^/open-apis/bitable/v1/apps/([^/]+)/tables/([^/]+)/fields$", "列出字段"),
+        ("POST", r"^/open-apis/drive/v1/medias/upload_all$", "上传素材"),
+        ("POST", r"^/open-apis/drive/v1/medias/upload_prepare$", "分片上传准备"),
+        ("POST", r"^/open-apis/drive/v1/medias/upload_part$", "分片上传"),
+        ("POST", r"^/open-apis/drive/v1/medias/upload_finish$", "分片上传完成"),
+        ("GET", r"^/open-apis/drive/v1/medias/([^/]+)/download$", "下载附件"),
+        ("GET", r"^/mock/stats$", "请求统计"),
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    def _返回JSON(self, 数据, 状态码=200):
+        内容 = json.dumps(数据, ensure_ascii=False).encode("utf-8")
+        self.send_response(状态码)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(内容)))
+        self.end_headers()
+        self.wfile.write(内容)
+
+    def _返回字节(self, 内容, 文件名="file", 状态码=200, 附加头=None, 中断=False):
+        self.send_response(状态码)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Disposition", f'attachment; filename="{文件名}"')
+        self.send_header("Content-Length", str(len(内容)))
+        for 名称, 值 in (附加头 or {}).items():
+            self.send_header(名称, 值)
+        self.end_headers()
+        if 中断:
+            # 只发送一半后断开连接，模拟网络中断
+            self.wfile.write(内容[:len(内容) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(内容)
+
+    def _读取请求体(self):
+        长度 = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(长度) if 长度 else b""
+
+    def _读取JSON(self):
+        请求体 = self._读取请求体()
+        return json.loads(请求体) if 请求体 else {}
+
+    def _分发(self, 方法):
+        解析结果 = urlparse(self.path)
+        for 路由方法, 模式, 处理名 in self.路由表:
+            if 路由方法 != 方法:
+                continue
+            匹配 = re.match(模式, 解析结果.path)
+            if not 匹配:
+                continue
+            服务 = self.server
+            服务.数据.记录请求(处理名)
+            if 服务.延迟毫秒:
+                time.sleep(服务.延迟毫秒 / 1000)
+            if 处理名 != "请求统计" and not 服务.限流.获取():
+                服务.数据.记录请求("限流拒绝")
+                self._读取请求体()
+                self._返回JSON({"code": 99991400, "msg": "request trigger frequency limit"}, 429)
+                return
+            getattr(self, f"_处理{处理名}")(*匹配.groups(), 查询参数=parse_qs(解析结果.query))
+            return
+        self._读取请求体()
+        self._返回JSON({"code": 404, "msg": f"mock: 未实现的接口 {方法} {解析结果.path}"}, 404)
+
+    def do_GET(self):
+        self._分发("GET")
+
+    def do_POST(self):
+        self._分发("POST")
+
+    def do_PUT(self):
+        self._分发("PUT")
+
+    # ====================== 接口实现 ======================
+    def _处理获取令牌(self, 查询参数):
+        请求 = self._读取JSON()
+        if not 请求.get("app_id") or not 请求.get("app_secret"):
+            self._返回JSON({"code": 10003, "msg": "invalid param"})
+            return
+        self._返回JSON({"code": 0, "msg": "ok", "tenant_access_token": f"t-mock-{请求['app_id']}", "expire": 7200})
+
+    def _处理查询记录(self, app_token, table_id, 查询参数):
+        请求 = self._读取JSON()
+        页大小 = int(请求.get("page_size") or (查询参数.get("page_size") or [self.server.分页大小])[0])
+        页大小 = min(页大小, self.server.分页大小)
+        页码 = 请求.get("page_token") or (查询参数.get("page_token") or [""])[0]
+        开始 = int(页码) if 页码 else 0
+        记录列表 = list(self.server.数据.获取表(app_token, table_id).values())
+        本页 = 记录列表[开始:开始 + 页大小]
+        还有更多 = 开始 + 页大小 < len(记录列表)
+        self._返回JSON({"code": 0, "msg": "success", "data": {
+            "items": 本页,
+            "has_more": 还有更多,
+            "page_token": str(开始 + 页大小) if 还有更多 else "",
+            "total": len(记录列表),
+        }})
+
+    def _处理列出字段(self, app_token, table_id, 查询参数):
+        字段结构 = self.server.数据.字段结构.get((app_token, table_id))
+        if 字段结构 is None:
+            self._返回JSON({"code": 1254041, "msg": "TableIdNotFound（mock: 未设置字段结构）"})
+            return
+        页大小 = min(int((查询参数.get("page_size") or [20])[0]), 100)
+        开始 = int((查询参数.get("page_token") or ["0"])[0] or 0)
+        字段列表 = [{"field_id": f"fld{序号:08d}", "field_name": 名称, "type": 类型, "is_primary": 序号 == 0}
+                  for 序号, (名称, 类型) in enumerate(字段结构.items())]
+        还有更多 = 开始 + 页大小 < len(字段列表)
+        self._返回JSON({"code": 0, "msg": "success", "data": {
+            "items": 字段列表[开始:开始 + 页大小],
+            "has_more": 还有更多,
+            "page_token": str(开始 + 页大小) if 还有更多 else "",
+            "total": len(字段列表),
+        }})
+
+    def _处理新增记录(self, app_token, table_id, 查询参数):
+        请求 = self._读取JSON()
+        错误 = self.server.数据.校验字段(app_token, table_id, 请求.get("fields") or {})
+        if 错误:
+            self._返回JSON({"code": 错误[0], "msg": 错误[1]})
+            return
+        记录 = self.server.数据.新增记录(app_token, table_id, 请求.get("fields") or {})
+        self._返回JSON({"code": 0, "msg": "success", "data": {"record": 记录}})
+
+    def _处理更新记录(self, app_token, table_id, record_id, 查询参数):
+        请求 = self._读取JSON()
+        错误 = self.server.数据.校验字段(app_token, table_id, 请求.get("fields") or {})
+        if 错误:
+            self._返回JSON({"code": 错误[0], "msg": 错误[1]})
+            return
+        记录 = self.server.数据.更新记录(app_token, table_id, record_id, 请求.get("fields") or {})
+        if 记录 is None:
+            self._返回JSON({"code": 1254043, "msg": "RecordIdNotFound"})
+            return
+        self._返回JSON({"code": 0, "msg": "success", "data": {"record": 记录}})
+
+    def _处理批量新增(self, app_token, table_id, 查询参数):
+        请求 = self._读取JSON()
+        # 与真实接口一致：任一记录的字段有误则整批失败
+        for 项 in 请求.get("records") or []:
+            错误 = self.server.数据.校验字段(app_token, table_id, 项.get("fields") or {})
+            if 错误:
+                self._返回JSON({"code": 错误[0], "msg": 错误[1]})
+                return
+        记录列表 = [self.server.数据.新增记录(app_token, table_id, 项.get("fields") or {})
+                  for 项 in 请求.get("records") or []]
+        self._返回JSON({"code": 0, "msg": "success", "data": {"records": 记录列表}})
+
+    def _处理批量更新(self, app_token, table_id, 查询参数):
+        请求 = self._读取JSON()
+        记录列表 = []
+        for 项 in 请求.get("records") or []:
+            错误 = self.server.数据.校验字段(app_token, table_id, 项.get("fields") or {})
+            if 错误:
+                self._返回JSON({"code": 错误[0], "msg": 错误[1]})
+                return
+        for 项 in 请求.get("records") or []:
+            记录 = self.server.数据.更新记录(app_token, table_id, 项.get("record_id"), 项.get("fields") or {})
+            if 记录 is None:
+                self._返回JSON({"code": 1254043, "msg": "RecordIdNotFound"})
+                return
+            记录列表.append(记录)
+        self._返回JSON({"code": 0, "msg": "success", "data": {"records": 记录列表}})
+
+    def _处理上传素材(self, 查询参数):
+        表单 = 解析multipart(self.headers.get("Content-Type"), self._读取请求体())
+        文件名 = 表单.get("file_name", b"file").decode("utf-8")
+        file_token = f"box{uuid.uuid4().hex[:16]}"
+        with self.server.数据._锁:
+            self.server.数据.上传素材[file_token] = {
+                "文件名": 文件名,
+                "parent_node": 表单.get("parent_node", b"").decode("utf-8"),
+                "字节": 表单.get("file", b""),
+            }
+        self._返回JSON({"code": 0, "msg": "success", "data": {"file_token": file_token}})
+
+    def _处理分片上传准备(self, 查询参数):
+        请求 = self._读取JSON()
+        大小 = int(请求.get("size") or 0)
+        分片大小 = self.server.分片大小
+        upload_id = f"upl{uuid.uuid4().hex[:16]}"
+        分片数 = max(1, -(-大小 // 分片大小))
+        with self.server.数据._锁:
+            self.server.数据.分片上传[upload_id] = {
+                "文件名": 请求.get("file_name") or "file",
+                "parent_node": 请求.get("parent_node") or "",
+                "大小": 大小, "分片大小": 分片大小, "分片数": 分片数, "分片": {},
+            }
+        self._返回JSON({"code": 0, "msg": "success", "data": {
+            "upload_id": upload_id, "block_size": 分片大小, "block_num": 分片数,
+        }})
+
+    def _处理分片上传(self, 查询参数):
+        表单 = 解析multipart(self.headers.get("Content-Type"), self._读取请求体())
+        数据 = self.server.数据
+        会话 = 数据.分片上传.get(表单.get("upload_id", b"").decode("utf-8"))
+        if 会话 is None:
+            self._返回JSON({"code": 1061021, "msg": "upload id expire"})
+            return
+        序号 = int(表单.get("seq", b"-1"))
+        内容 = 表单.get("file", b"")
+        with 数据._锁:
+            if 序号 in 数据.待失败分片:
+                数据.待失败分片.discard(序号)
+                失败 = True
+            else:
+                失败 = False
+        if 失败:
+            self._返回JSON({"code": 1061045, "msg": "can retry"})
+            return
+        if not 0 <= 序号 < 会话["分片数"] or int(表单.get("size", b"-1")) != len(内容):
+            self._返回JSON({"code": 1061002, "msg": "params error"})
+            return
+        校验和 = 表单.get("checksum")
+        if 校验和 is not None and int(校验和) != zlib.adler32(内容):
+            self._返回JSON({"code": 1062008, "msg": "checksum param invalid"})
+            return
+        with 数据._锁:
+            会话["分片"][序号] = 内容
+        self._返回JSON({"code": 0, "msg": "success", "data": {}})
+
+    def _处理分片上传完成(self, 查询参数):
+        请求 = self._读取JSON()
+        数据 = self.server.数据
+        with 数据._锁:
+            会话 = 数据.分片上传.get(请求.get("upload_id"))
+            if 会话 is None or int(请求.get("block_num") or 0) != 会话["分片数"] \
+                    or len(会话["分片"]) != 会话["分片数"]:
+                会话 = None
+            else:
+                数据.分片上传.pop(请求.get("upload_id"))
+        if 会话 is None:
+            self._返回JSON({"code": 1061002, "msg": "params error"})
+            return
+        内容 = b"".join(会话["分片"][序号] for 序号 in range(会话["分片数"]))
+        if len(内容) != 会话["大小"]:
+            self._返回JSON({"code": 1061002, "msg": "size mismatch"})
+            return
+        file_token = f"box{uuid.uuid4().hex[:16]}"
+        with 数据._锁:
+            数据.上传素材[file_token] = {"文件名": 会话["文件名"], "parent_node": 会话["parent_node"], "字节": 内容}
+        self._返回JSON({"code": 0, "msg": "success", "data": {"file_token": file_token}})
+
+    def _处理下载附件(self, file_token, 查询参数):
+        数据 = self.server.数据
+        附件 = 数据.附件.get(file_token)
+        if 附件 is None:
+            self._返回JSON({"code": 1061004, "msg": "file not found"}, 404)
+            return
+        文件名, 内容 = 附件
+        文件名 = 文件名.encode("utf-8").decode("latin-1")
+        with 数据._锁:
+            中断 = 数据.下载中断次数 > 0
+            if 中断:
+                数据.下载中断次数 -= 1
+        范围 = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range") or "")
+        if not self.server.支持Range or not 范围:
+            self._返回字节(内容, 文件名, 中断=中断)
+            return
+        开始 = int(范围.group(1))
+        结束 = min(int(范围.group(2)) if 范围.group(2) else len(内容) - 1, len(内容) - 1)
+        if 开始 >= len(内容) or 开始 > 结束:
+            self._返回字节(b"", 文件名, 416, {"Content-Range": f"bytes */{len(内容)}"})
+            return
+        self._返回字节(内容[开始:结束 + 1], 文件名, 206, {
+            "Content-Range": f"bytes {开始}-{结束}/{len(内容)}", "Accept-Ranges": "bytes",
+        }, 中断=中断)
+
+    def _处理请求统计(self, 查询参数):
+        self._返回JSON({"code": 0, "data": dict(self.server.数据.请求统计)})
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟飞书开放平台")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8686)
+    parser.add_argument("--latency-ms", type=float, default=0, help="每个请求的固定延迟（毫秒）")
+    parser.add_argument("--page-size", type=int, default=100, help="records/search 每页最大条数")
+    parser.add_argument("--rate-limit", type=float, default=0, help="每秒请求上限，0为不限流")
+    parser.add_argument("--block-size", type=int, default=4 * 1024 * 1024, help="分片上传的分片大小（字节）")
+    parser.add_argument("--no-range", action="store_true", help="附件下载不支持 Range 分段请求")
+    parser.add_argument("--app-token", default="bascnMockApp", help="预置附件记录所在的多维表格app_token")
+    parser.add_argument("--table-id", default="tblMockSource", help="预置附件记录所在的table_id")
+    parser.add_argument("--attachment-field", default="上传附件", help="附件字段名")
+    parser.add_argument("--attach", nargs="*", default=[], help="为每个文件预置一条带附件的记录")
+    args = parser.parse_args()
+
+    服务 = 模拟飞书服务((args.host, args.port), args.latency_ms, args.page_size, args.rate_limit,
+                    分片大小=args.block_size, 支持Range=not args.no_range)
+    for 文件 in args.attach:
+        record_id = 服务.数据.添加附件记录(服务.基础地址, args.app_token, args.table_id, [文件], args.attachment_field)
+        print(f"📎 已预置记录 {record_id}: {os.path.basename(文件)}")
+    print(f"🚀 模拟飞书服务已启动: {服务.基础地址}（设置 FEISHU_BASE_URL={服务.基础地址} 即可使用）")
+    try:
+        服务.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        服务.server_close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+'''常驻Worker冒烟测试：启动模拟飞书服务与 feishu_worker.py 子进程，逐个提交三类 repository_dispatch 事件，
+检查事件状态、每个事件单独输出的运行指标与模拟表格中实际写入的数据
+
+- 事件依次提交并等待完成，目标表新增记录按事件区分，按 benchmark 的写入数据检查判断是否正确
+- 同时检查缺少必填字段的事件返回400、未知事件编号返回404
+- 任一检查失败时退出码为1
+'''
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import argparse
+import tempfile
+import subprocess
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mock_feishu_server import 模拟飞书服务
+from generate_workbooks import 生成默认工作簿
+from benchmark import 项目目录, 模拟目标表, 构建运行环境, 统计表记录数, 检查写入结果
+from load_test import 事件配置, 默认载荷, 载荷行ID, 预置数据
+
+def 空闲端口():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def 请求(地址, 方法="GET", 数据=None):
+    """返回 (状态码, JSON)"""
+    内容 = json.dumps(数据).encode("utf-8") if 数据 is not None else None
+    req = urllib.request.Request(地址, data=内容, method=方法, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=10) as 响应:
+            return 响应.status, json.loads(响应.read() or b"{}")
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
+
+def 等待就绪(地址, 进程, 超时秒):
+    截止 = time.monotonic() + 超时秒
+    while time.monotonic() < 截止:
+        if 进程.poll() is not None:
+            raise RuntimeError(f"Worker 启动失败，退出码 {进程.returncode}")
+        try:
+            if 请求(f"{地址}/health")[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("等待 Worker 启动超时")
+
+def 等待事件(地址, 编号, 超时秒):
+    截止 = time.monotonic() + 超时秒
+    while time.monotonic() < 截止:
+        状态码, 状态 = 请求(f"{地址}/events/{编号}")
+        if 状态码 == 200 and "完成时间" in 状态:
+            return 状态
+        time.sleep(0.2)
+    raise RuntimeError(f"等待事件[{编号}]完成超时")
+
+def 执行冒烟测试(工作簿, 事件类型列表, 超时秒=300, 显示输出=False):
+    """返回问题列表（为空表示通过）"""
+    问题列表 = []
+    服务 = 模拟飞书服务(("127.0.0.1", 0)).后台启动()
+    端口 = 空闲端口()
+    地址 = f"http://127.0.0.1:{端口}"
+    进程 = None
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        指标文件 = f.name
+    输出文件 = tempfile.TemporaryFile()
+    try:
+        事件列表 = 默认载荷(事件类型列表)
+        预置数据(服务, 事件列表, 工作簿)
+        环境变量 = 构建运行环境(服务, "feishu_QSA_script", ["unused"], 2, 指标文件, 附加变量={
+            "TARGET_TABLE_ID": 模拟目标表,
+            "WORKER_HOST": "127.0.0.1",
+            "WORKER_PORT": str(端口),
+            "WORKER_THREADS": "2",
+        })
+        进程 = subprocess.Popen([sys.executable, os.path.join(项目目录, "feishu_worker.py")], cwd=项目目录,
+                              env=环境变量, stdout=输出文件, stderr=subprocess.STDOUT)
+        等待就绪(地址, 进程, 超时秒)
+        print(f"🚀 Worker 已就绪: {地址}")
+
+        状态码, _ = 请求(f"{地址}/dispatches", "POST", {"event_type": "feishu_QSA_trigger", "client_payload": {
+            **{键: 值 for 键, 值 in 事件列表[0]["client_payload"].items() if 键 != "FJ_ID"}}})
+        if 状态码 != 400:
+            问题列表.append(f"缺少 FJ_ID 的QSA事件返回 {状态码}，预期 400")
+        if 请求(f"{地址}/events/999999")[0] != 404:
+            问题列表.append("未知事件编号未返回 404")
+
+        for 事件 in 事件列表:
+            脚本名, _ = 事件配置[事件["event_type"]]
+            写入前记录数 = 统计表记录数(服务, 模拟目标表)
+            状态码, 响应 = 请求(f"{地址}/dispatches", "POST", 事件)
+            if 状态码 != 202:
+                问题列表.append(f"{事件['event_type']} 提交返回 {状态码}: {响应}")
+                continue
+            状态 = 等待事件(地址, 响应["事件编号"], 超时秒)
+            前缀 = f"事件[{响应['事件编号']}] {事件['event_type']}"
+            if 状态["状态"] != "成功":
+                问题列表.append(f"{前缀} 状态为 {状态['状态']}: {状态.get('错误')}")
+            指标数据 = 状态.get("指标") or {}
+            if not 指标数据.get("计数"):
+                问题列表.append(f"{前缀} 未输出运行指标")
+            问题列表 += [f"{前缀} {问题}" for 问题 in
+                      检查写入结果(服务, 脚本名, 载荷行ID(事件["client_payload"]), 写入前记录数, 指标数据,
+                               事件["client_payload"].get("FJ_ID"))]
+            print(f"{'✅' if 状态['状态'] == '成功' else '❌'} {前缀}: {json.dumps(指标数据.get('计数'), ensure_ascii=False)}")
+    finally:
+        if 进程 and 进程.poll() is None:
+            进程.send_signal(signal.SIGINT)
+            try:
+                进程.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                进程.kill()
+        服务.停止()
+        if os.path.exists(指标文件):
+            os.remove(指标文件)
+        输出文件.seek(0)
+        输出 = 输出文件.read().decode("utf-8", "replace")
+        输出文件.close()
+    if 显示输出 or 问题列表:
+        print(输出[-6000:])
+    return 问题列表
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻Worker冒烟测试（本地模拟飞书服务）")
+    parser.add_argument("--events", nargs="*",
+                        default=["feishu_Dzsj_trigger", "feishu_Dzsj_trigger", "feishu_QSA_trigger", "feishu_bitable_process"],
+                        help=f"依次提交的事件类型，可选: {list(事件配置)}")
+    parser.add_argument("--timeout", type=float, default=300, help="Worker启动与单个事件的超时（秒）")
+    parser.add_argument("--verbose", action="store_true", help="打印 Worker 完整输出")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="feishu_worker_smoke_") as 临时目录:
+        工作簿 = 生成默认工作簿(临时目录, 50, 10, 2, 200)
+        问题列表 = 执行冒烟测试(工作簿, args.events, args.timeout, args.verbose)
+    for 问题 in 问题列表:
+        print(f"❌ {问题}")
+    print("✅ Worker 冒烟测试通过" if not 问题列表 else f"❌ Worker 冒烟测试失败: {len(问题列表)} 个问题")
+    return 1 if 问题列表 else 0
+
+if __name__ == "__main__":
+    sys.exit(main())